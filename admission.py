@@ -0,0 +1,295 @@
+"""Per-user token buckets and a concurrency gate for expensive requests.
+
+``RateLimiter`` keeps one token bucket per key (the session UPN). A request spends
+as many tokens as its route costs. When the bucket is short, ``take`` reports how
+long until enough tokens have refilled, which becomes ``Retry-After``. Buckets live
+in memory, or in a small SQLite file when several worker processes must share them
+(``FileBucketStore``).
+
+``ConcurrencyGate`` caps the heavy requests in flight in a process. A request that
+finds every slot busy waits in a short, bounded queue. If the queue is full, or the
+wait runs out, it is rejected at once, so the queue cannot grow into a backlog. A
+process that serves one request at a time (wfastcgi) never fills a per-process gate;
+``FileConcurrencyGate`` keeps the slots in the shared SQLite file instead, so the cap
+holds across every process on the host.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LOGGER = logging.getLogger("routine_app.admission")
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def update(self, key, apply):
+        # apply(tokens_or_None, updated_at_or_None) -> (tokens, updated_at, result)
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (None, None))
+            tokens, updated_at, result = apply(tokens, updated_at)
+            self._buckets[key] = (tokens, updated_at)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return result
+
+
+class FileBucketStore:
+    """Buckets in a SQLite file, so every process on the host draws from the same one."""
+
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def update(self, key, apply):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at, result = apply(*(row or (None, None)))
+            conn.execute(
+                "INSERT OR REPLACE INTO bucket (key, tokens, updated_at) VALUES (?, ?, ?)", (key, tokens, updated_at)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+
+class RateLimiter:
+    def __init__(self, rate, burst, store=None, clock=time.time):
+        # rate: tokens added per second; burst: bucket size (and the largest single cost).
+        self.rate = rate
+        self.burst = burst
+        self.store = store or MemoryBucketStore()
+        self._clock = clock
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def take(self, key, cost):
+        """Spend ``cost`` tokens. Return ``(allowed, retry_after_seconds)``."""
+        if not self.enabled or cost <= 0:
+            return True, 0.0
+        cost = min(cost, self.burst)
+        now = self._clock()
+
+        def apply(tokens, updated_at):
+            if tokens is None:
+                tokens = float(self.burst)
+            else:
+                tokens = min(float(self.burst), tokens + max(0.0, now - updated_at) * self.rate)
+            if tokens >= cost:
+                return tokens - cost, now, (True, 0.0)
+            return tokens, now, (False, (cost - tokens) / self.rate)
+
+        try:
+            return self.store.update(key, apply)
+        except sqlite3.Error as exc:
+            # A broken shared file must not take the API down with it.
+            LOGGER.warning("rate limit store unavailable, request admitted: %s", exc)
+            return True, 0.0
+
+
+class ConcurrencyGate:
+    def __init__(self, limit, max_queue, queue_timeout):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+
+    @property
+    def enabled(self):
+        return self.limit > 0
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self):
+        """Take a slot. Return ``(acquired, reason)``; reason is ``queue_full`` or ``queue_timeout``."""
+        if not self.enabled:
+            return True, None
+        with self._condition:
+            if self._in_flight < self.limit and not self._waiting:
+                self._in_flight += 1
+                return True, None
+            if self._waiting >= self.max_queue:
+                return False, "queue_full"
+            self._waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self._in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        if self._in_flight < self.limit:
+                            break
+                        return False, "queue_timeout"
+                self._in_flight += 1
+                return True, None
+            finally:
+                self._waiting -= 1
+
+    def release(self):
+        if not self.enabled:
+            return
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+
+class FileConcurrencyGate:
+    """``ConcurrencyGate`` with its slots as rows in a SQLite file shared by the host.
+
+    A row is a running or waiting request, keyed by pid and thread. Waiters poll the
+    file rather than being woken, and the oldest waiter takes the next free slot. Rows
+    older than ``lease_seconds`` belong to a worker that died mid-request and are
+    dropped, so a crash cannot pin a slot for good.
+    """
+
+    def __init__(
+        self, path, limit, max_queue, queue_timeout, lease_seconds=120.0, poll_interval=0.05, timeout=1.0, clock=time.time
+    ):
+        # clock stamps the rows and ages the leases; it must agree across processes.
+        self.path = path
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._clock = clock
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS heavy_slot (holder TEXT PRIMARY KEY, running INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+
+    @property
+    def enabled(self):
+        return self.limit > 0
+
+    @property
+    def in_flight(self):
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM heavy_slot WHERE running = 1").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def _holder(self):
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    def _transaction(self, step):
+        # step(conn, now) runs inside BEGIN IMMEDIATE after expired rows are dropped.
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self._clock()
+            conn.execute("DELETE FROM heavy_slot WHERE updated_at < ?", (now - self.lease_seconds,))
+            result = step(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def acquire(self):
+        """Take a slot. Return ``(acquired, reason)``; reason is ``queue_full`` or ``queue_timeout``."""
+        if not self.enabled:
+            return True, None
+        holder = self._holder()
+
+        def enter(conn, now):
+            running, waiting = conn.execute(
+                "SELECT COALESCE(SUM(running), 0), COUNT(*) - COALESCE(SUM(running), 0) FROM heavy_slot"
+            ).fetchone()
+            if running < self.limit and not waiting:
+                conn.execute("INSERT OR REPLACE INTO heavy_slot VALUES (?, 1, ?)", (holder, now))
+                return "acquired"
+            if waiting >= self.max_queue:
+                return "queue_full"
+            conn.execute("INSERT OR REPLACE INTO heavy_slot VALUES (?, 0, ?)", (holder, now))
+            return "waiting"
+
+        def take_turn(conn, now):
+            running = conn.execute("SELECT COUNT(*) FROM heavy_slot WHERE running = 1").fetchone()[0]
+            first = conn.execute(
+                "SELECT holder FROM heavy_slot WHERE running = 0 ORDER BY updated_at, holder LIMIT 1"
+            ).fetchone()
+            if running < self.limit and first and first[0] == holder:
+                conn.execute("UPDATE heavy_slot SET running = 1, updated_at = ? WHERE holder = ?", (now, holder))
+                return True
+            return False
+
+        state = None
+        try:
+            state = self._transaction(enter)
+            if state != "waiting":
+                return state == "acquired", (None if state == "acquired" else state)
+            deadline = time.monotonic() + self.queue_timeout
+            while True:
+                if self._transaction(take_turn):
+                    return True, None
+                if time.monotonic() >= deadline:
+                    self._connect().execute("DELETE FROM heavy_slot WHERE holder = ?", (holder,))
+                    return False, "queue_timeout"
+                time.sleep(self.poll_interval)
+        except sqlite3.Error as exc:
+            if state == "waiting":
+                # Admitted without a slot; a waiting row left behind would hold a queue
+                # place until its lease ran out.
+                try:
+                    self._connect().execute("DELETE FROM heavy_slot WHERE holder = ?", (holder,))
+                except sqlite3.Error:
+                    pass
+            # Same stance as the rate limiter: a broken file admits instead of failing.
+            LOGGER.warning("concurrency gate file unavailable, request admitted: %s", exc)
+            return True, None
+
+    def release(self):
+        if not self.enabled:
+            return
+        try:
+            self._connect().execute("DELETE FROM heavy_slot WHERE holder = ?", (self._holder(),))
+        except sqlite3.Error as exc:
+            LOGGER.warning("concurrency gate slot not released (lease will expire): %s", exc)
+
+
+def retry_after_header(seconds):
+    return str(max(1, math.ceil(seconds)))
@@ -1,19 +1,41 @@
 from datetime import date, datetime, timedelta, timezone
 import calendar
+import functools
+import hashlib
+import operator
 import os
+import random
+import re
+import sqlite3
 import sys
 import json
+import threading
+import time
+import uuid
 import urllib.request
 import urllib.error
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import MappingProxyType
 
 from dotenv import load_dotenv
 import logging
 import msal
-import pyodbc
-from flask import Flask, jsonify, request, send_from_directory, session, redirect, url_for
-
-from db_config import get_connection_string
+from flask import Flask, copy_current_request_context, g, has_request_context, jsonify, request, session, redirect, url_for
+
+from admission import ConcurrencyGate, FileBucketStore, FileConcurrencyGate, MemoryBucketStore, RateLimiter, retry_after_header
+from app_logging import configure_logging, sampled
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, SnapshotStore
+import compression
+from events import RESYNC, ChangeEventBus
+from json_provider import RoutineJSONProvider
+import storage
+from metrics import MetricsRegistry
+from profiling import RequestProfiler
+from query_builder import QueryShapes
+from slow_query import SlowQueryLog
+from storage import DB_ERRORS
 
 BASE_DIR = Path(__file__).resolve().parent
 base_dir = BASE_DIR
@@ -44,21 +66,243 @@ _ROUTINE_CHILD_HAS_TITLE_COLUMN = None
 _ROUTINE_CHILD_HAS_STATUS_COLUMN = None
 _ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN = None
 _ROUTINE_CHILD_HAS_TASK_KIND_COLUMN = None
+_CHANGE_EVENT_TABLE_EXISTS = None
+_ARCHIVE_TABLES_EXIST = None
+_ROW_VERSIONS_EXIST = None
+_ARCHIVE_CHILD_COLUMNS = None
+_IDEMPOTENCY_TABLE_EXISTS = None
+_ARCHIVE_DUE_DATE_RANGE = {"expires": 0.0, "range": None}
+_DATABASE_ROW_VERSIONING = None
+READ_ISOLATION_MODE = os.environ.get("ROUTINE_DB_READ_ISOLATION", "auto").strip().lower()
+READ_REPLICA_ENABLED = storage.read_replica_configured()
+READ_REPLICA_MAX_LAG_SECONDS = float(os.environ.get("ROUTINE_DB_READ_MAX_LAG_SECONDS", "10"))
+READ_REPLICA_LAG_CHECK_SECONDS = float(os.environ.get("ROUTINE_DB_READ_LAG_CHECK_SECONDS", "5"))
+READ_REPLICA_RETRY_SECONDS = float(os.environ.get("ROUTINE_DB_READ_RETRY_SECONDS", "30"))
+READ_REPLICA_STICKY_SECONDS = float(os.environ.get("ROUTINE_DB_READ_STICKY_SECONDS", "5"))
+_READ_REPLICA = {"checked_at": float("-inf"), "state": "unmeasured", "down_until": 0.0, "marks": deque()}
+_READ_REPLICA_LOCK = threading.Lock()
+# Per-thread: the current DB operation, which server it read from, and whether it must use the primary.
+_READ_ROUTE = threading.local()
+_RETRY_BUDGET_LOCK = threading.Lock()
+LOCK_WAIT_METRICS_ENABLED = os.environ.get("ROUTINE_DB_LOCK_WAIT_METRICS", "0") == "1"
+DB_RETRY_MAX_ATTEMPTS = max(1, int(os.environ.get("ROUTINE_DB_RETRY_MAX_ATTEMPTS", "3")))
+DB_RETRY_REQUEST_BUDGET = max(0, int(os.environ.get("ROUTINE_DB_RETRY_REQUEST_BUDGET", "4")))
+DB_RETRY_BASE_DELAY = float(os.environ.get("ROUTINE_DB_RETRY_BASE_DELAY", "0.1"))
+DB_RETRY_MAX_DELAY = float(os.environ.get("ROUTINE_DB_RETRY_MAX_DELAY", "2.0"))
+# Connection failures, timeouts and serialization failures (deadlock victims).
+RETRYABLE_SQLSTATES = {"08001", "08S01", "08S02", "08007", "HYT00", "HYT01", "40001"}
+# 1205 deadlock victim, 3960 snapshot update conflict, 233/10053/10054/10060 transport
+# resets; the 10928+ codes are Azure SQL throttling/failover errors.
+RETRYABLE_NATIVE_CODES = {
+    1205,
+    3960,
+    233,
+    10053,
+    10054,
+    10060,
+    10928,
+    10929,
+    40197,
+    40501,
+    40613,
+    49918,
+    49919,
+    49920,
+}
+_NATIVE_CODE_PATTERN = re.compile(r"\((\d{3,5})\)")
+DB_TIMING_ENABLED = os.environ.get("ROUTINE_DB_TIMING", "1") == "1"
+METRICS_DIR = os.environ.get("ROUTINE_METRICS_DIR", str(BASE_DIR / "metrics")).strip()
+METRICS_TOKEN = os.environ.get("ROUTINE_METRICS_TOKEN", "").strip()
+METRICS = MetricsRegistry(METRICS_DIR or None)
+METRICS.describe("routine_http_request_duration_seconds", "histogram", "HTTP request latency by endpoint.")
+METRICS.describe("routine_db_operation_duration_seconds", "histogram", "DB helper latency by query shape.")
+METRICS.describe("routine_db_lock_wait_seconds", "histogram", "Lock wait per list query (ROUTINE_DB_LOCK_WAIT_METRICS=1).")
+METRICS.describe("routine_db_retries_total", "counter", "DB retry events by outcome.")
+METRICS.describe("routine_db_connections_in_use", "gauge", "Open DB connections in this process.")
+METRICS.describe("routine_db_reads_total", "counter", "GET helper reads by target server and routing reason.")
+METRICS.describe("routine_slack_api_calls_total", "counter", "Slack Web API calls by method.")
+METRICS.describe("routine_slack_api_failures_total", "counter", "Failed Slack Web API calls by method.")
+METRICS.describe("routine_http_response_bytes_total", "counter", "Response body bytes sent by endpoint and encoding.")
+METRICS.describe(
+    "routine_http_response_uncompressed_bytes_total",
+    "counter",
+    "Response body bytes before compression by endpoint.",
+)
+METRICS.describe("routine_sse_clients", "gauge", "Open /events streams in this process.")
+METRICS.describe("routine_cache_requests_total", "counter", "In-process cache lookups by cache and result.")
+METRICS.describe("routine_admission_rejections_total", "counter", "Requests rejected with 429 by endpoint and reason.")
+METRICS.describe("routine_admission_queue_wait_seconds", "histogram", "Time heavy requests waited for a slot.")
+METRICS.describe("routine_heavy_requests_in_flight", "gauge", "Heavy requests holding a slot, started by this process.")
+METRICS.describe("routine_query_budget_exhausted_total", "counter", "Requests answered 503 because their DB time budget ran out.")
+METRICS.describe("routine_idempotency_requests_total", "counter", "POST /routines with an Idempotency-Key by result.")
+METRICS.describe("routine_account_breaker_state", "gauge", "Account DB breaker: 0 closed, 1 half-open, 2 open.")
+METRICS.describe("routine_account_breaker_transitions_total", "counter", "Account DB breaker state changes by new state.")
+METRICS.describe("routine_account_stale_served_total", "counter", "Account lookups answered from the last good snapshot.")
+METRICS.describe(
+    "routine_account_stale_age_seconds",
+    "histogram",
+    "Age of account snapshots served while the account DB was unavailable.",
+    buckets=(60, 300, 900, 3600, 4 * 3600, 24 * 3600, 7 * 24 * 3600),
+)
+METRICS.describe(
+    "routine_generated_child_rows",
+    "histogram",
+    "Child rows generated per _build_entries call.",
+    buckets=(1, 4, 12, 24, 48, 96, 240, 480, 1200),
+)
+QUERY_SHAPES = QueryShapes()
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("ROUTINE_SLOW_QUERY_MS", "500"))
+SLOW_QUERIES = SlowQueryLog(
+    os.environ.get("ROUTINE_SLOW_QUERY_LOG", str(BASE_DIR / "logs" / "slow_query.log")),
+    SLOW_QUERY_THRESHOLD_MS if SLOW_QUERY_THRESHOLD_MS > 0 else None,
+)
+ADMIN_UPNS = {
+    upn.strip().split("@", 1)[0].lower()
+    for upn in os.environ.get("ROUTINE_ADMIN_UPNS", "").split(",")
+    if upn.strip()
+}
+PROFILER = RequestProfiler(
+    os.environ.get("ROUTINE_PROFILE_DIR", str(BASE_DIR / "profiles")),
+    keep=int(os.environ.get("ROUTINE_PROFILE_KEEP", "50")),
+    sample_rate=float(os.environ.get("ROUTINE_PROFILE_SAMPLE_RATE", "0")),
+)
+CHANGES_OVERLAP_SECONDS = float(os.environ.get("ROUTINE_CHANGES_OVERLAP_SECONDS", "5"))
+# The token is the primary's clock, but the lists it follows may come from a replica
+# up to READ_REPLICA_MAX_LAG_SECONDS behind, and it can fall one lag check further
+# behind before that is noticed. Reach back over that too, or such rows are never sent.
+CHANGES_REPLICA_LOOKBACK_SECONDS = (
+    READ_REPLICA_MAX_LAG_SECONDS + READ_REPLICA_LAG_CHECK_SECONDS if READ_REPLICA_ENABLED else 0.0
+)
+CHANGES_LOOKBACK_SECONDS = CHANGES_OVERLAP_SECONDS + CHANGES_REPLICA_LOOKBACK_SECONDS
+CHANGES_MAX_ROWS = int(os.environ.get("ROUTINE_CHANGES_MAX_ROWS", "500"))
+ARCHIVE_RANGE_TTL_SECONDS = float(os.environ.get("ROUTINE_ARCHIVE_RANGE_TTL_SECONDS", "300"))
+# Each open stream holds a worker for its whole life, so SSE is only for threaded hosts.
+EVENTS_ENABLED = os.environ.get("ROUTINE_EVENTS_ENABLED", "0") == "1"
+CHANGES_POLL_SECONDS = float(os.environ.get("ROUTINE_CHANGES_POLL_SECONDS", "30"))
+EVENTS_POLL_SECONDS = float(os.environ.get("ROUTINE_EVENTS_POLL_SECONDS", "1"))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("ROUTINE_EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_MAX_STREAM_SECONDS = float(os.environ.get("ROUTINE_EVENTS_MAX_STREAM_SECONDS", "120"))
+EVENTS_OVERLAP_SECONDS = float(os.environ.get("ROUTINE_EVENTS_OVERLAP_SECONDS", "10"))
+EVENTS_RETENTION_HOURS = float(os.environ.get("ROUTINE_EVENTS_RETENTION_HOURS", "24"))
+EVENTS = ChangeEventBus(
+    lambda after_id: _fetch_change_events(after_id),
+    interval=EVENTS_POLL_SECONDS,
+    max_clients=int(os.environ.get("ROUTINE_EVENTS_MAX_CLIENTS", "20")),
+)
+_EVENTS_PURGED_AT = {"monotonic": 0.0}
+IDEMPOTENCY_TTL_HOURS = float(os.environ.get("ROUTINE_IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 100
+_IDEMPOTENCY_PURGED_AT = {"monotonic": 0.0}
+_ACCOUNT_BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _account_breaker_changed(previous, state):
+    METRICS.set_gauge("routine_account_breaker_state", _ACCOUNT_BREAKER_STATE_VALUES[state])
+    METRICS.inc("routine_account_breaker_transitions_total", {"state": state})
+    logging.getLogger(__name__).warning("account db breaker %s -> %s", previous, state)
+
+
+ACCOUNT_BREAKER = CircuitBreaker(
+    failure_threshold=int(os.environ.get("ROUTINE_ACCOUNT_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.environ.get("ROUTINE_ACCOUNT_BREAKER_RESET_SECONDS", "30")),
+    on_change=_account_breaker_changed,
+)
+METRICS.set_gauge("routine_account_breaker_state", _ACCOUNT_BREAKER_STATE_VALUES[ACCOUNT_BREAKER.state])
+ACCOUNT_SNAPSHOTS = SnapshotStore(int(os.environ.get("ROUTINE_ACCOUNT_SNAPSHOT_MAX_ENTRIES", "5000")))
+# Token cost per request; list costs scale with page_size above
+# RATE_LIMIT_BASE_PAGE_SIZE, creation with the span in years.
+RATE_LIMIT_COSTS = {
+    "get_routines_route": 1.0,
+    "parent_tasks_route": 1.0,
+    "bootstrap_route": 2.0,
+    "changes_route": 0.5,
+    "post_routines_route": 5.0,
+}
+for _item in os.environ.get("ROUTINE_RATE_LIMIT_COSTS", "").split(","):
+    if "=" in _item:
+        _endpoint, _cost = _item.split("=", 1)
+        RATE_LIMIT_COSTS[_endpoint.strip()] = float(_cost)
+# index.html asks for 100 rows per page; a page that size costs the base price.
+RATE_LIMIT_BASE_PAGE_SIZE = int(os.environ.get("ROUTINE_RATE_LIMIT_BASE_PAGE_SIZE", "100"))
+HEAVY_ENDPOINTS = frozenset({"get_routines_route", "parent_tasks_route", "bootstrap_route", "post_routines_route"})
+RATE_LIMIT_FILE = os.environ.get("ROUTINE_RATE_LIMIT_FILE", "").strip()
+
+
+def _rate_limit_store():
+    if not RATE_LIMIT_FILE:
+        return MemoryBucketStore()
+    try:
+        return FileBucketStore(RATE_LIMIT_FILE)
+    except (OSError, sqlite3.Error):
+        logging.getLogger(__name__).warning("cannot open %s; rate limits stay per process", RATE_LIMIT_FILE)
+        return MemoryBucketStore()
+
+
+RATE_LIMITER = RateLimiter(
+    rate=float(os.environ.get("ROUTINE_RATE_LIMIT_PER_SECOND", "2")),
+    burst=float(os.environ.get("ROUTINE_RATE_LIMIT_BURST", "40")),
+    store=_rate_limit_store(),
+)
+
+
+def _heavy_gate():
+    # A wfastcgi process serves one request at a time, so only a gate kept in the
+    # shared file can cap heavy requests across processes.
+    settings = {
+        "limit": int(os.environ.get("ROUTINE_HEAVY_CONCURRENCY", "8")),
+        "max_queue": int(os.environ.get("ROUTINE_HEAVY_QUEUE", "16")),
+        "queue_timeout": float(os.environ.get("ROUTINE_HEAVY_QUEUE_SECONDS", "2")),
+    }
+    if RATE_LIMIT_FILE:
+        try:
+            return FileConcurrencyGate(RATE_LIMIT_FILE, **settings)
+        except (OSError, sqlite3.Error):
+            logging.getLogger(__name__).warning("cannot open %s; heavy slots stay per process", RATE_LIMIT_FILE)
+    return ConcurrencyGate(**settings)
+
+
+HEAVY_GATE = _heavy_gate()
+# Wall-clock budget (seconds) for all DB work of one request, by endpoint. Endpoints
+# not listed only get the per-statement QUERY_TIMEOUT_SECONDS.
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("ROUTINE_QUERY_TIMEOUT_SECONDS", "20"))
+QUERY_BUDGETS = {
+    "get_routines_route": 10.0,
+    "parent_tasks_route": 10.0,
+    "bootstrap_route": 15.0,
+    "changes_route": 5.0,
+    "post_routines_route": 30.0,
+    "current_user_route": 5.0,
+    "departments_route": 5.0,
+    "employees_route": 5.0,
+}
+for _item in os.environ.get("ROUTINE_QUERY_BUDGETS", "").split(","):
+    if "=" in _item:
+        _endpoint, _seconds = _item.split("=", 1)
+        QUERY_BUDGETS[_endpoint.strip()] = float(_seconds)
+QUERY_BUDGET_RETRY_AFTER = os.environ.get("ROUTINE_QUERY_BUDGET_RETRY_AFTER", "5")
+BOOTSTRAP_WORKERS = int(os.environ.get("ROUTINE_BOOTSTRAP_WORKERS", "4"))
+BOOTSTRAP_SECTIONS = ("current_user", "employees", "parents", "routines")
+_BOOTSTRAP_POOL = None
+_BOOTSTRAP_POOL_LOCK = threading.Lock()
 JST = timezone(timedelta(hours=9))
 
 
 def _routine_child_has_task_kind_column():
     global _ROUTINE_CHILD_HAS_TASK_KIND_COLUMN
     if _ROUTINE_CHILD_HAS_TASK_KIND_COLUMN is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
         return _ROUTINE_CHILD_HAS_TASK_KIND_COLUMN
     query = "SELECT COL_LENGTH('dbo.routine_task_child', 'task_kind')"
-    try:
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query)
             row = cursor.fetchone()
-            _ROUTINE_CHILD_HAS_TASK_KIND_COLUMN = bool(row and row[0] is not None)
-    except pyodbc.Error:
+            return bool(row and row[0] is not None)
+    try:
+        _ROUTINE_CHILD_HAS_TASK_KIND_COLUMN = _with_db_retry("routine_child_has_task_kind_column", _run)
+    except DB_ERRORS:
         _ROUTINE_CHILD_HAS_TASK_KIND_COLUMN = False
     return _ROUTINE_CHILD_HAS_TASK_KIND_COLUMN
 
@@ -66,22 +310,414 @@ def _routine_child_has_task_kind_column():
 def _now_jst_iso():
     return datetime.now(JST).isoformat(timespec="seconds")
 
-def _get_db_connection():
-    return pyodbc.connect(get_connection_string())
+def _request_db_timing():
+    if not DB_TIMING_ENABLED or not has_request_context():
+        return None
+    timing = g.get("db_timing")
+    if timing is None:
+        timing = {"queries": 0, "db_ms": 0.0, "connects": 0, "connect_ms": 0.0, "rows": 0, "map_ms": 0.0}
+        g.db_timing = timing
+    return timing
+
+
+def _add_db_timing(key, elapsed, count_key=None, count=1):
+    timing = _request_db_timing()
+    if timing is None:
+        return
+    timing[key] += elapsed * 1000
+    if count_key:
+        timing[count_key] += count
+
+
+class _InstrumentedCursor:
+    def __init__(self, cursor, conn):
+        self._cursor = cursor
+        self._conn = conn
+        # [sql, params, many, elapsed seconds, rows] of the statement being consumed.
+        self._statement = None
+
+    def _begin(self, sql, params, many):
+        self.finish_statement()
+        self._statement = [sql, params, many, 0.0, 0]
+
+    def _arm_timeout(self):
+        # The connect-time timeout was the whole remaining budget; re-arm it with what
+        # is left now, so the request's last statement cannot outlive its deadline.
+        label = getattr(_READ_ROUTE, "operation", None) or "statement"
+        self._cursor = storage.cursor_with_timeout(self._conn, self._cursor, _statement_timeout(label))
+
+    def _track(self, elapsed, rows=0):
+        if self._statement is not None:
+            self._statement[3] += elapsed
+            self._statement[4] += rows
+
+    def finish_statement(self):
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            sql, params, many, elapsed, rows = statement
+            SLOW_QUERIES.record(sql, params, elapsed * 1000, rows, many=many)
+
+    def execute(self, sql, *params):
+        self._arm_timeout()
+        self._begin(sql, params[0] if len(params) == 1 and isinstance(params[0], (list, tuple)) else params, False)
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(sql, *params)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._track(elapsed)
+            _add_db_timing("db_ms", elapsed, "queries")
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._arm_timeout()
+        self._begin(sql, seq_of_params, True)
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._track(elapsed, len(seq_of_params))
+            _add_db_timing("db_ms", elapsed, "queries")
+        self.finish_statement()
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        elapsed = time.perf_counter() - started
+        self._track(elapsed, 1 if row is not None else 0)
+        _add_db_timing("db_ms", elapsed, "rows", 1 if row is not None else 0)
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        elapsed = time.perf_counter() - started
+        self._track(elapsed, len(rows))
+        _add_db_timing("db_ms", elapsed, "rows", len(rows))
+        self.finish_statement()
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+
+class _InstrumentedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursors = []
+
+    def cursor(self):
+        cursor = _InstrumentedCursor(self._conn.cursor(), self._conn)
+        self._cursors.append(cursor)
+        return cursor
+
+    def __enter__(self):
+        self._conn.__enter__()
+        METRICS.add_gauge("routine_db_connections_in_use", 1)
+        return self
+
+    def __exit__(self, *exc_info):
+        METRICS.add_gauge("routine_db_connections_in_use", -1)
+        for cursor in self._cursors:
+            cursor.finish_statement()
+        return self._conn.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class QueryBudgetExceeded(Exception):
+    """The request's DB time budget ran out; answered with 503 and Retry-After.
+
+    Deliberately not a RuntimeError or a DB error, so the helpers' and routes'
+    handlers let it through to the app-level error handler.
+    """
+
+    def __init__(self, operation):
+        super().__init__(f"query budget exhausted during {operation}")
+        self.operation = operation
+
+
+def _statement_timeout(label="connect"):
+    # Bootstrap sections run on pool threads with a copied request context; the
+    # deadline lives in the shared WSGI environ so they draw from the same budget.
+    deadline = request.environ.get("routine.query_deadline") if has_request_context() else None
+    if deadline is None:
+        return QUERY_TIMEOUT_SECONDS or None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise QueryBudgetExceeded(label)
+    return min(remaining, QUERY_TIMEOUT_SECONDS) if QUERY_TIMEOUT_SECONDS else remaining
+
+
+def _get_db_connection(replica=False):
+    connect = functools.partial(
+        storage.connect_read_replica if replica else storage.connect, timeout=_statement_timeout()
+    )
+    if _request_db_timing() is None:
+        return _InstrumentedConnection(connect())
+    started = time.perf_counter()
+    conn = connect()
+    _add_db_timing("connect_ms", time.perf_counter() - started, "connects")
+    return _InstrumentedConnection(conn)
+
+
+def _format_server_timing(timing, total_ms=None):
+    parts = [
+        f'db;dur={timing["db_ms"]:.1f};desc="{timing["queries"]} queries, {timing["rows"]} rows"',
+        f'connect;dur={timing["connect_ms"]:.1f};desc="{timing["connects"]} connects"',
+        f'map;dur={timing["map_ms"]:.1f}',
+    ]
+    if total_ms is not None:
+        parts.append(f"app;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+def _db_error_is_retryable(exc):
+    if storage.is_transient_error(exc):
+        return True
+    sqlstate = exc.args[0] if exc.args else ""
+    if sqlstate in RETRYABLE_SQLSTATES:
+        return True
+    message = " ".join(str(arg) for arg in exc.args[1:])
+    return any(int(code) in RETRYABLE_NATIVE_CODES for code in _NATIVE_CODE_PATTERN.findall(message))
+
+
+def _take_retry_budget():
+    if not has_request_context():
+        return True
+    # Kept in the WSGI environ, not g: bootstrap sections run on pool threads whose
+    # copied request context has a g of its own, and they share one budget.
+    with _RETRY_BUDGET_LOCK:
+        used = request.environ.get("routine.db_retries", 0)
+        if used >= DB_RETRY_REQUEST_BUDGET:
+            return False
+        request.environ["routine.db_retries"] = used + 1
+    return True
+
+
+def _with_db_retry(label, operation):
+    # Every attempt must run in its own connection/transaction so a failed attempt
+    # is rolled back before the next one starts.
+    attempt = 1
+    started = time.perf_counter()
+    outer_route = (
+        getattr(_READ_ROUTE, "target", None),
+        getattr(_READ_ROUTE, "force_primary", False),
+        getattr(_READ_ROUTE, "operation", None),
+    )
+    force_primary = outer_route[1]
+    _READ_ROUTE.operation = label
+    try:
+        while True:
+            _READ_ROUTE.target = None
+            _READ_ROUTE.force_primary = force_primary
+            try:
+                result = operation()
+            except DB_ERRORS as exc:
+                if storage.is_timeout_error(exc) and _READ_ROUTE.target != "replica":
+                    # The driver already cancelled the statement. Running it again would
+                    # hold the worker for another timeout, so the budget ends here.
+                    raise QueryBudgetExceeded(label) from exc
+                if _READ_ROUTE.target == "replica":
+                    # Replica trouble never fails a read: the next attempt goes to the primary.
+                    if _db_error_is_retryable(exc):
+                        _mark_read_replica_down(exc)
+                    force_primary = True
+                    continue
+                if not _db_error_is_retryable(exc) or attempt >= DB_RETRY_MAX_ATTEMPTS:
+                    if attempt > 1:
+                        METRICS.inc("routine_db_retries_total", {"operation": label, "outcome": "gave_up"})
+                    raise
+                if not _take_retry_budget():
+                    METRICS.inc("routine_db_retries_total", {"operation": label, "outcome": "budget_exhausted"})
+                    raise
+                delay = random.uniform(0, min(DB_RETRY_MAX_DELAY, DB_RETRY_BASE_DELAY * (2 ** (attempt - 1))))
+                METRICS.inc("routine_db_retries_total", {"operation": label, "outcome": "retried"})
+                logging.getLogger(__name__).warning(
+                    "retrying db call=%s attempt=%s delay=%.3fs error=%s", label, attempt, delay, exc.args[:1]
+                )
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if attempt > 1:
+                METRICS.inc("routine_db_retries_total", {"operation": label, "outcome": "recovered"})
+            METRICS.observe(
+                "routine_db_operation_duration_seconds", time.perf_counter() - started, {"operation": label}
+            )
+            return result
+    finally:
+        _READ_ROUTE.target, _READ_ROUTE.force_primary, _READ_ROUTE.operation = outer_route
+
+
+def _database_row_versioning():
+    global _DATABASE_ROW_VERSIONING
+    if _DATABASE_ROW_VERSIONING is not None:
+        return _DATABASE_ROW_VERSIONING
+    query = """
+        SELECT snapshot_isolation_state, is_read_committed_snapshot_on
+        FROM sys.databases
+        WHERE database_id = DB_ID()
+    """
+    def _run():
+        versioning = {"read_committed_snapshot": False, "snapshot": False}
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            row = cursor.fetchone()
+            if row:
+                versioning["snapshot"] = row[0] == 1
+                versioning["read_committed_snapshot"] = bool(row[1])
+        return versioning
+    try:
+        versioning = _with_db_retry("database_row_versioning", _run)
+    except DB_ERRORS:
+        # Not cached: one transient failure must not turn SNAPSHOT reads off for good.
+        logging.getLogger(__name__).warning("could not detect row versioning; this read uses default isolation")
+        return {"read_committed_snapshot": False, "snapshot": False}
+    if not versioning["read_committed_snapshot"] and not versioning["snapshot"]:
+        logging.getLogger(__name__).warning(
+            "neither READ_COMMITTED_SNAPSHOT nor ALLOW_SNAPSHOT_ISOLATION is enabled; "
+            "list reads can block behind writers"
+        )
+    _DATABASE_ROW_VERSIONING = versioning
+    return _DATABASE_ROW_VERSIONING
+
+
+def _read_replica_state():
+    """``ok`` if the replica has every change the primary had READ_REPLICA_MAX_LAG_SECONDS
+    ago, ``stale`` if not, ``unmeasured`` if the lag cannot be measured.
+
+    Compares the routine_change_event high-water mark on both sides every
+    READ_REPLICA_LAG_CHECK_SECONDS. Without that table there is no bound on the lag, so
+    reads stay on the primary.
+    """
+    now = time.monotonic()
+    if now - _READ_REPLICA["checked_at"] < READ_REPLICA_LAG_CHECK_SECONDS:
+        return _READ_REPLICA["state"]
+    with _READ_REPLICA_LOCK:
+        if now - _READ_REPLICA["checked_at"] < READ_REPLICA_LAG_CHECK_SECONDS:
+            return _READ_REPLICA["state"]
+        _READ_REPLICA["checked_at"] = now
+        if not _change_event_table_exists():
+            _READ_REPLICA["state"] = "unmeasured"
+            return _READ_REPLICA["state"]
+        query = "SELECT COALESCE(MAX(event_id), 0) FROM dbo.routine_change_event"
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            marks = _READ_REPLICA["marks"]
+            marks.append((now, cursor.fetchone()[0]))
+        with _get_db_connection(replica=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            replica_mark = cursor.fetchone()[0]
+        # The oldest primary mark inside the lag window (at worst the one just taken):
+        # a replica that has it is at most READ_REPLICA_MAX_LAG_SECONDS behind, however
+        # long ago the previous check ran.
+        while marks[0][0] < now - READ_REPLICA_MAX_LAG_SECONDS:
+            marks.popleft()
+        _READ_REPLICA["state"] = "ok" if replica_mark >= marks[0][1] else "stale"
+        return _READ_REPLICA["state"]
+
+
+def _mark_read_replica_down(exc):
+    _READ_REPLICA["down_until"] = time.monotonic() + READ_REPLICA_RETRY_SECONDS
+    logging.getLogger(__name__).warning(
+        "read replica unavailable for %ss: %s", READ_REPLICA_RETRY_SECONDS, exc.args[:1] if exc.args else exc
+    )
+
+
+def _read_target(allow_replica=True):
+    if not READ_REPLICA_ENABLED:
+        return "primary", "unconfigured"
+    if not allow_replica:
+        return "primary", "primary_only"
+    if getattr(_READ_ROUTE, "force_primary", False):
+        return "primary", "fallback"
+    if has_request_context() and session.get("read_primary_until", 0) > time.time():
+        return "primary", "sticky"
+    if time.monotonic() < _READ_REPLICA["down_until"]:
+        return "primary", "replica_down"
+    try:
+        state = _read_replica_state()
+    except DB_ERRORS as exc:
+        _mark_read_replica_down(exc)
+        return "primary", "replica_down"
+    return ("replica", state) if state == "ok" else ("primary", state)
+
+
+def _get_read_connection(allow_replica=True):
+    # GET helpers read from the replica when one is configured, it is reachable and
+    # fresh enough, and this session has not written in the last few seconds.
+    target, reason = _read_target(allow_replica)
+    if READ_REPLICA_ENABLED:
+        METRICS.inc("routine_db_reads_total", {"target": target, "reason": reason})
+    if target == "replica":
+        try:
+            conn = _get_db_connection(replica=True)
+        except DB_ERRORS as exc:
+            _mark_read_replica_down(exc)
+            METRICS.inc("routine_db_reads_total", {"target": "primary", "reason": "fallback"})
+        else:
+            _READ_ROUTE.target = "replica"
+            return conn
+    # RCSI already gives versioned reads; otherwise ask for SNAPSHOT when allowed.
+    # Writers keep using _get_db_connection and their current isolation.
+    conn = _get_db_connection()
+    if READ_ISOLATION_MODE == "off":
+        return conn
+    versioning = _database_row_versioning()
+    if versioning["snapshot"] and not versioning["read_committed_snapshot"]:
+        conn.cursor().execute("SET TRANSACTION ISOLATION LEVEL SNAPSHOT")
+    return conn
+
+
+def _record_lock_wait(label, cursor):
+    if not LOCK_WAIT_METRICS_ENABLED:
+        return
+    try:
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(wait_time_ms), 0)
+            FROM sys.dm_exec_session_wait_stats
+            WHERE session_id = @@SPID
+              AND wait_type LIKE 'LCK[_]%'
+            """
+        )
+        row = cursor.fetchone()
+    except DB_ERRORS:
+        return
+    wait_ms = int(row[0]) if row and row[0] is not None else 0
+    METRICS.observe("routine_db_lock_wait_seconds", wait_ms / 1000, {"operation": label})
+    if wait_ms:
+        logging.getLogger(__name__).info("lock wait query=%s wait_ms=%s", label, wait_ms)
 
 
 def _routine_child_has_assignee_column():
     global _ROUTINE_CHILD_HAS_ASSIGNEE_COLUMN
     if _ROUTINE_CHILD_HAS_ASSIGNEE_COLUMN is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
         return _ROUTINE_CHILD_HAS_ASSIGNEE_COLUMN
     query = "SELECT COL_LENGTH('dbo.routine_task_child', 'assignee')"
-    try:
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query)
             row = cursor.fetchone()
-            _ROUTINE_CHILD_HAS_ASSIGNEE_COLUMN = bool(row and row[0] is not None)
-    except pyodbc.Error:
+            return bool(row and row[0] is not None)
+    try:
+        _ROUTINE_CHILD_HAS_ASSIGNEE_COLUMN = _with_db_retry("routine_child_has_assignee_column", _run)
+    except DB_ERRORS:
         _ROUTINE_CHILD_HAS_ASSIGNEE_COLUMN = False
     return _ROUTINE_CHILD_HAS_ASSIGNEE_COLUMN
 
@@ -89,15 +725,19 @@ def _routine_child_has_assignee_column():
 def _routine_child_has_title_column():
     global _ROUTINE_CHILD_HAS_TITLE_COLUMN
     if _ROUTINE_CHILD_HAS_TITLE_COLUMN is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
         return _ROUTINE_CHILD_HAS_TITLE_COLUMN
     query = "SELECT COL_LENGTH('dbo.routine_task_child', 'title')"
-    try:
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query)
             row = cursor.fetchone()
-            _ROUTINE_CHILD_HAS_TITLE_COLUMN = bool(row and row[0] is not None)
-    except pyodbc.Error:
+            return bool(row and row[0] is not None)
+    try:
+        _ROUTINE_CHILD_HAS_TITLE_COLUMN = _with_db_retry("routine_child_has_title_column", _run)
+    except DB_ERRORS:
         _ROUTINE_CHILD_HAS_TITLE_COLUMN = False
     return _ROUTINE_CHILD_HAS_TITLE_COLUMN
 
@@ -105,31 +745,264 @@ def _routine_child_has_title_column():
 def _routine_child_has_status_column():
     global _ROUTINE_CHILD_HAS_STATUS_COLUMN
     if _ROUTINE_CHILD_HAS_STATUS_COLUMN is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
         return _ROUTINE_CHILD_HAS_STATUS_COLUMN
     query = "SELECT COL_LENGTH('dbo.routine_task_child', 'status')"
-    try:
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query)
             row = cursor.fetchone()
-            _ROUTINE_CHILD_HAS_STATUS_COLUMN = bool(row and row[0] is not None)
-    except pyodbc.Error:
+            return bool(row and row[0] is not None)
+    try:
+        _ROUTINE_CHILD_HAS_STATUS_COLUMN = _with_db_retry("routine_child_has_status_column", _run)
+    except DB_ERRORS:
         _ROUTINE_CHILD_HAS_STATUS_COLUMN = False
     return _ROUTINE_CHILD_HAS_STATUS_COLUMN
 
 
+def _change_event_table_exists():
+    global _CHANGE_EVENT_TABLE_EXISTS
+    if _CHANGE_EVENT_TABLE_EXISTS is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
+        return _CHANGE_EVENT_TABLE_EXISTS
+    query = "SELECT COL_LENGTH('dbo.routine_change_event', 'event_id')"
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            row = cursor.fetchone()
+            return bool(row and row[0] is not None)
+    try:
+        _CHANGE_EVENT_TABLE_EXISTS = _with_db_retry("change_event_table_exists", _run)
+    except DB_ERRORS:
+        # Not cached: a transient failure must not switch events and the lag check off for good.
+        logging.getLogger(__name__).warning("could not probe dbo.routine_change_event; treated as missing for now")
+        return False
+    return _CHANGE_EVENT_TABLE_EXISTS
+
+
+def _archive_tables_exist():
+    global _ARCHIVE_TABLES_EXIST
+    if _ARCHIVE_TABLES_EXIST is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
+        return _ARCHIVE_TABLES_EXIST
+    query = "SELECT COL_LENGTH('dbo.routine_task_child_archive', 'record_no'), COL_LENGTH('dbo.routine_task_archive', 'task_no')"
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            row = cursor.fetchone()
+            return bool(row and row[0] is not None and row[1] is not None)
+    try:
+        _ARCHIVE_TABLES_EXIST = _with_db_retry("archive_tables_exist", _run)
+    except DB_ERRORS:
+        # Not cached, like the other probes that gate correctness.
+        return False
+    return _ARCHIVE_TABLES_EXIST
+
+
+def _row_versions_exist():
+    """Whether both hot tables have the ROWVERSION column the change feed reads by."""
+    global _ROW_VERSIONS_EXIST
+    if _ROW_VERSIONS_EXIST is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
+        return _ROW_VERSIONS_EXIST
+    query = "SELECT COL_LENGTH('dbo.routine_task', 'row_version'), COL_LENGTH('dbo.routine_task_child', 'row_version')"
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            row = cursor.fetchone()
+            return bool(row and row[0] is not None and row[1] is not None)
+    try:
+        _ROW_VERSIONS_EXIST = _with_db_retry("row_versions_exist", _run)
+    except DB_ERRORS:
+        return False
+    if not _ROW_VERSIONS_EXIST:
+        logging.getLogger(__name__).warning(
+            "routine_task/routine_task_child lack row_version; the change feed falls back to updated_at "
+            "and can miss rows of transactions open longer than %.1fs (see routine_tasks.sql)",
+            CHANGES_OVERLAP_SECONDS,
+        )
+    return _ROW_VERSIONS_EXIST
+
+
+def _archive_child_columns():
+    """Optional child columns present in routine_task_child_archive itself.
+
+    The archive may predate columns added to the hot table later, so its branch of
+    the list query must not assume the hot table's columns.
+    """
+    global _ARCHIVE_CHILD_COLUMNS
+    if _ARCHIVE_CHILD_COLUMNS is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
+        return _ARCHIVE_CHILD_COLUMNS
+    query = "SELECT " + ", ".join(
+        f"COL_LENGTH('dbo.routine_task_child_archive', '{column}')" for column in ChildColumns._fields
+    )
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            row = cursor.fetchone()
+            return ChildColumns(*(value is not None for value in row))
+    try:
+        _ARCHIVE_CHILD_COLUMNS = _with_db_retry("archive_child_columns", _run)
+    except DB_ERRORS:
+        return ChildColumns(False, False, False, False, False)
+    return _ARCHIVE_CHILD_COLUMNS
+
+
+def _archive_due_date_range():
+    """(min, max) due_date in the child archive, or None when it is empty; cached."""
+    if time.monotonic() < _ARCHIVE_DUE_DATE_RANGE["expires"]:
+        METRICS.inc("routine_cache_requests_total", {"cache": "archive_range", "result": "hit"})
+        return _ARCHIVE_DUE_DATE_RANGE["range"]
+    METRICS.inc("routine_cache_requests_total", {"cache": "archive_range", "result": "miss"})
+    def _run():
+        with _get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MIN(due_date), MAX(due_date) FROM dbo.routine_task_child_archive")
+            return cursor.fetchone()
+    try:
+        row = _with_db_retry("archive_due_date_range", _run)
+    except DB_ERRORS as exc:
+        raise RuntimeError("Failed to read the archive range") from exc
+    bounds = None
+    if row and row[0] is not None:
+        bounds = tuple(value if isinstance(value, date) else date.fromisoformat(str(value)[:10]) for value in row)
+    _ARCHIVE_DUE_DATE_RANGE.update(expires=time.monotonic() + ARCHIVE_RANGE_TTL_SECONDS, range=bounds)
+    return bounds
+
+
+def _archive_window_needed(year=None, month=None):
+    if not _archive_tables_exist():
+        return False
+    bounds = _archive_due_date_range()
+    if bounds is None:
+        return False
+    if not year:
+        return True
+    year = int(year)
+    if month:
+        month = int(month)
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1)
+    else:
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    return bounds[0] < end and bounds[1] >= start
+
+
+def _idempotency_table_exists():
+    global _IDEMPOTENCY_TABLE_EXISTS
+    if _IDEMPOTENCY_TABLE_EXISTS is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
+        return _IDEMPOTENCY_TABLE_EXISTS
+    query = "SELECT COL_LENGTH('dbo.routine_idempotency_key', 'idempotency_key')"
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            row = cursor.fetchone()
+            return bool(row and row[0] is not None)
+    try:
+        _IDEMPOTENCY_TABLE_EXISTS = _with_db_retry("idempotency_table_exists", _run)
+    except DB_ERRORS:
+        _IDEMPOTENCY_TABLE_EXISTS = False
+    return _IDEMPOTENCY_TABLE_EXISTS
+
+
+def _record_change(cursor, kind, task_no, record_no=None):
+    if not _change_event_table_exists():
+        return
+    cursor.execute(
+        "INSERT INTO dbo.routine_change_event (kind, task_no, record_no) VALUES (?, ?, ?)",
+        [kind, task_no, record_no],
+    )
+
+
+def _record_child_change(cursor, kind, record_no):
+    if not _change_event_table_exists():
+        return
+    cursor.execute(
+        """
+        INSERT INTO dbo.routine_change_event (kind, task_no, record_no)
+        SELECT ?, task_no, record_no FROM dbo.routine_task_child WHERE record_no = ?
+        """,
+        [kind, record_no],
+    )
+
+
+def _fetch_change_events(after_id, limit=500):
+    """Change events after ``after_id``, plus any committed in the last few seconds.
+
+    IDENTITY values are handed out before commit, so a lower id can become visible
+    after a higher one; re-reading a short window by created_at catches those. With
+    ``after_id=None`` only the current high-water mark is returned, as ``(id, None)``.
+    """
+    if not _change_event_table_exists():
+        return []
+    def _run():
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            if after_id is None:
+                cursor.execute("SELECT COALESCE(MAX(event_id), 0) FROM dbo.routine_change_event")
+                return [(cursor.fetchone()[0], None)]
+            # created_at is the server's clock; the app host's clock may drift from it.
+            cursor.execute("SELECT SYSUTCDATETIME()")
+            now = cursor.fetchone()[0]
+            if isinstance(now, str):
+                now = datetime.fromisoformat(now)
+            if time.monotonic() - _EVENTS_PURGED_AT["monotonic"] > 600:
+                _EVENTS_PURGED_AT["monotonic"] = time.monotonic()
+                cursor.execute(
+                    "DELETE FROM dbo.routine_change_event WHERE created_at < ?",
+                    [now - timedelta(hours=EVENTS_RETENTION_HOURS)],
+                )
+                conn.commit()
+            cursor.execute(
+                """
+                SELECT event_id, kind, task_no, record_no
+                FROM dbo.routine_change_event
+                WHERE event_id > ? OR created_at > ?
+                ORDER BY event_id
+                OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+                """,
+                [after_id, now - timedelta(seconds=EVENTS_OVERLAP_SECONDS), 0, limit],
+            )
+            return [
+                (event_id, {"kind": kind, "task_no": task_no, "record_no": record_no})
+                for event_id, kind, task_no, record_no in cursor.fetchall()
+            ]
+    try:
+        return _with_db_retry("fetch_change_events", _run)
+    except DB_ERRORS as exc:
+        raise RuntimeError("Failed to fetch change events") from exc
+
+
 def _routine_child_has_planned_date_column():
     global _ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN
     if _ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN is not None:
+        METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "hit"})
         return _ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN
     query = "SELECT COL_LENGTH('dbo.routine_task_child', 'planned_date')"
-    try:
+    METRICS.inc("routine_cache_requests_total", {"cache": "schema_probe", "result": "miss"})
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query)
             row = cursor.fetchone()
-            _ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN = bool(row and row[0] is not None)
-    except pyodbc.Error:
+            return bool(row and row[0] is not None)
+    try:
+        _ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN = _with_db_retry("routine_child_has_planned_date_column", _run)
+    except DB_ERRORS:
         _ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN = False
     return _ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN
 
@@ -166,6 +1039,43 @@ def _qualified_table(table_name):
     return table_name
 
 
+def _account_query(label, key, operation):
+    """Run an account-DB read behind ACCOUNT_BREAKER.
+
+    While the breaker is open, or when the read fails, the last good result for
+    (label, key) is returned instead. Without one, RuntimeError is raised at once
+    rather than after another connect timeout.
+    """
+    snapshot_key = (label, key)
+    error = None
+    if ACCOUNT_BREAKER.allow():
+        try:
+            result = _with_db_retry(label, operation)
+        except QueryBudgetExceeded as exc:
+            if not isinstance(exc.__cause__, DB_ERRORS):
+                # The request spent its budget elsewhere before this lookup reached the
+                # account DB; that says nothing about the account DB's health.
+                raise
+            ACCOUNT_BREAKER.record_failure()
+            error = exc
+        except DB_ERRORS as exc:
+            ACCOUNT_BREAKER.record_failure()
+            error = exc
+        else:
+            ACCOUNT_BREAKER.record_success()
+            ACCOUNT_SNAPSHOTS.put(snapshot_key, result)
+            return result
+    snapshot = ACCOUNT_SNAPSHOTS.get(snapshot_key)
+    if snapshot is None:
+        if isinstance(error, QueryBudgetExceeded):
+            raise error
+        raise RuntimeError(f"Account database unavailable ({label})") from error
+    value, age = snapshot
+    METRICS.inc("routine_account_stale_served_total", {"lookup": label})
+    METRICS.observe("routine_account_stale_age_seconds", age, {"lookup": label})
+    return value
+
+
 def _fetch_employee_profile(upn):
     upn_short = _normalize_upn(upn)
     if not upn_short:
@@ -184,16 +1094,13 @@ def _fetch_employee_profile(upn):
         LEFT JOIN {department_table} d ON e.DepartmentCD = d.DepartmentCD
         WHERE UPPER(e.AD) = UPPER(?)
     """
-    try:
-        with _get_db_connection() as conn:
+    def _run():
+        with _get_read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, [upn_short])
             row = cursor.fetchone()
             logging.getLogger(__name__).debug(
-                "fetched employee profile row=%s columns=%s for upn=%s",
-                row,
-                [column[0] for column in cursor.description] if cursor.description else None,
-                upn_short,
+                "fetched employee profile upn=%s found=%s", upn_short, row is not None, extra=sampled()
             )
             if not row:
                 return {
@@ -206,7 +1113,9 @@ def _fetch_employee_profile(upn):
                 }
             columns = [column[0] for column in cursor.description]
             return dict(zip(columns, row))
-    except pyodbc.Error as exc:
+    try:
+        return _account_query("fetch_employee_profile", upn_short.upper(), _run)
+    except RuntimeError as exc:
         raise RuntimeError("Failed to fetch employee profile") from exc
 
 
@@ -219,8 +1128,8 @@ def _fetch_employee_by_name(name):
         FROM {employee_table} e
         WHERE e.EmployeeName = ?
     """
-    try:
-        with _get_db_connection() as conn:
+    def _run():
+        with _get_read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, [name])
             row = cursor.fetchone()
@@ -228,7 +1137,9 @@ def _fetch_employee_by_name(name):
                 return None
             columns = [column[0] for column in cursor.description]
             return dict(zip(columns, row))
-    except pyodbc.Error:
+    try:
+        return _account_query("fetch_employee_by_name", name, _run)
+    except RuntimeError:
         return None
 
 
@@ -240,13 +1151,15 @@ def _fetch_departments():
         WHERE DeleteDt IS NULL
         ORDER BY DepartmentCD
     """
-    try:
-        with _get_db_connection() as conn:
+    def _run():
+        with _get_read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query)
             columns = [column[0] for column in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
-    except pyodbc.Error as exc:
+    try:
+        return _account_query("fetch_departments", None, _run)
+    except RuntimeError as exc:
         raise RuntimeError("Failed to fetch departments") from exc
 
 
@@ -366,9 +1279,8 @@ def _format_assignees(value):
     entries = _parse_assignees(value)
     return "; ".join(entries) if entries else None
 
-def _normalize_status(value):
-    normalized = (str(value).strip() if value is not None else "") or STATUS_PENDING
-    mapping = {
+_STATUS_ALIASES = MappingProxyType(
+    {
         "\u672a\u5bfe\u5fdc": STATUS_PENDING,
         STATUS_PENDING: STATUS_PENDING,
         "pending": STATUS_PENDING,
@@ -380,7 +1292,12 @@ def _normalize_status(value):
         "completed": STATUS_DONE,
         "done": STATUS_DONE,
     }
-    return mapping.get(normalized, normalized)
+)
+
+
+def _normalize_status(value):
+    normalized = (str(value).strip() if value is not None else "") or STATUS_PENDING
+    return _STATUS_ALIASES.get(normalized, normalized)
 
 
 def _half_year_from_quarter(quarter_value):
@@ -408,7 +1325,7 @@ def _validate_task_kind_assignees(task_kind, assignee_value):
 
 def _fetch_parent_task_kind(task_no):
     query = "SELECT task_kind FROM dbo.routine_task WHERE task_no = ?"
-    try:
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, [task_no])
@@ -416,7 +1333,9 @@ def _fetch_parent_task_kind(task_no):
             if not row:
                 return None
             return _normalize_task_kind(row[0])
-    except pyodbc.Error as exc:
+    try:
+        return _with_db_retry("fetch_parent_task_kind", _run)
+    except DB_ERRORS as exc:
         raise RuntimeError("Failed to fetch parent task kind") from exc
 
 
@@ -501,6 +1420,7 @@ def _build_entries(data, registrant, department_cd=None):
             "summary": summary_value,
         }
         child_entry = _create_child(1, due_date)
+        METRICS.observe("routine_generated_child_rows", 1, {"frequency": normalized_freq})
         return parent_entry, [child_entry]
 
     start_year, start_month = _parse_ym(data.get("start_month"))
@@ -594,6 +1514,7 @@ def _build_entries(data, registrant, department_cd=None):
         for due_date in _due_dates_for_month(normalized_freq, year, month, week_num):
             entries.append(_create_child(seq, due_date))
             seq += 1
+    METRICS.observe("routine_generated_child_rows", len(entries), {"frequency": normalized_freq})
     return parent_entry, entries
 
 
@@ -753,7 +1674,111 @@ def _routine_child_columns():
     return columns
 
 
-def _insert_entries(parent_entry, child_entries):
+@QUERY_SHAPES.shape("insert_child")
+def _child_insert_sql(columns):
+    placeholders = ", ".join("?" for _ in columns)
+    return f"INSERT INTO dbo.routine_task_child ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+@QUERY_SHAPES.shape("update_parent")
+def _parent_update_sql(columns):
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    return f"""
+        UPDATE dbo.routine_task
+        SET {assignments}, updated_at = SYSUTCDATETIME()
+        WHERE task_no = ?
+    """
+
+
+@QUERY_SHAPES.shape("update_child")
+def _child_update_sql(columns):
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    return f"""
+        UPDATE dbo.routine_task_child
+        SET {assignments}, updated_at = SYSUTCDATETIME()
+        WHERE record_no = ?
+    """
+
+
+def _request_fingerprint(data):
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _fetch_idempotency_record(upn, key):
+    # Always the primary: a retry must see the row its first attempt just committed.
+    query = """
+        SELECT request_hash, task_no, status_code, response_body
+        FROM dbo.routine_idempotency_key
+        WHERE upn = ? AND idempotency_key = ? AND expires_at > ?
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    def _run():
+        with _get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, [upn, key, now])
+            row = cursor.fetchone()
+            if not row:
+                return None
+            columns = [column[0] for column in cursor.description]
+            return dict(zip(columns, row))
+    try:
+        return _with_db_retry("fetch_idempotency_key", _run)
+    except DB_ERRORS as exc:
+        raise RuntimeError("Failed to read the idempotency key") from exc
+
+
+def _record_idempotency_key(cursor, task_no, idempotency):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if time.monotonic() - _IDEMPOTENCY_PURGED_AT["monotonic"] > 600:
+        _IDEMPOTENCY_PURGED_AT["monotonic"] = time.monotonic()
+        cursor.execute("DELETE FROM dbo.routine_idempotency_key WHERE expires_at < ?", [now])
+    # Any earlier row for this key has expired (a live one was replayed instead).
+    cursor.execute(
+        "DELETE FROM dbo.routine_idempotency_key WHERE upn = ? AND idempotency_key = ? AND expires_at <= ?",
+        [idempotency["upn"], idempotency["key"], now],
+    )
+    cursor.execute(
+        """
+        INSERT INTO dbo.routine_idempotency_key
+            (upn, idempotency_key, request_hash, task_no, status_code, response_body, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            idempotency["upn"],
+            idempotency["key"],
+            idempotency["request_hash"],
+            task_no,
+            idempotency["status_code"],
+            idempotency["response_body"],
+            now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        ],
+    )
+
+
+def _idempotent_replay(idempotency):
+    """The stored response for this key, a 422 for a different body, or None."""
+    record = _fetch_idempotency_record(idempotency["upn"], idempotency["key"])
+    if record is None:
+        return None
+    if record["request_hash"].strip() != idempotency["request_hash"]:
+        METRICS.inc("routine_idempotency_requests_total", {"result": "conflict"})
+        return jsonify({"message": "Idempotency-Key was already used for a different request"}), 422
+    METRICS.inc("routine_idempotency_requests_total", {"result": "replayed"})
+    response = jsonify(json.loads(record["response_body"]))
+    response.status_code = record["status_code"]
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+class _CommitUnacknowledged(Exception):
+    """COMMIT was sent but failed; the insert may or may not have landed.
+
+    Not a DB error, so ``_with_db_retry`` does not run the insert again.
+    """
+
+
+def _insert_entries(parent_entry, child_entries, idempotency=None):
     parent_columns = [
         "frequency",
         "half_year",
@@ -776,15 +1801,13 @@ def _insert_entries(parent_entry, child_entries):
     child_columns = _routine_child_columns()
     parent_placeholders = ", ".join("?" for _ in parent_columns)
     parent_columns_sql = ", ".join(parent_columns)
-    child_placeholders = ", ".join("?" for _ in child_columns)
-    child_columns_sql = ", ".join(child_columns)
     parent_query = (
         f"INSERT INTO dbo.routine_task ({parent_columns_sql}) "
         f"OUTPUT INSERTED.task_no "
         f"VALUES ({parent_placeholders})"
     )
-    child_query = f"INSERT INTO dbo.routine_task_child ({child_columns_sql}) VALUES ({child_placeholders})"
-    try:
+    child_query = _child_insert_sql(tuple(child_columns))
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(parent_query, [parent_entry[col] for col in parent_columns])
@@ -793,6 +1816,8 @@ def _insert_entries(parent_entry, child_entries):
                 raise RuntimeError("Failed to retrieve parent task ID")
             parent_id = parent_row[0]
             if child_entries:
+                if storage.backend_name() == "sqlserver":
+                    cursor.fast_executemany = True
                 for seq, entry in enumerate(child_entries, start=1):
                     entry["task_no"] = parent_id
                     entry.setdefault("routine_no", seq)
@@ -803,15 +1828,43 @@ def _insert_entries(parent_entry, child_entries):
                         for entry in child_entries
                     ],
                 )
-            conn.commit()
-    except pyodbc.Error as exc:
+            _record_change(cursor, "created", parent_id)
+            if idempotency is not None:
+                # Same transaction: a duplicate key rolls the whole insert back.
+                _record_idempotency_key(cursor, parent_id, idempotency)
+            try:
+                conn.commit()
+            except DB_ERRORS as exc:
+                raise _CommitUnacknowledged() from exc
+            EVENTS.wake()
+            return parent_id
+    try:
+        return _with_db_retry("insert_entries", _run)
+    except DB_ERRORS as exc:
         raise RuntimeError(f"Failed to insert tasks into the database: {exc}") from exc
-    return parent_id
+    except _CommitUnacknowledged as exc:
+        # The idempotency row commits with the insert, so it tells whether the lost
+        # COMMIT landed. Without it a retry could insert the routines twice.
+        record = None
+        if idempotency is not None:
+            try:
+                record = _fetch_idempotency_record(idempotency["upn"], idempotency["key"])
+            except RuntimeError:
+                logging.getLogger(__name__).warning("could not check an unacknowledged insert")
+        METRICS.inc(
+            "routine_db_retries_total",
+            {"operation": "insert_entries", "outcome": "commit_landed" if record else "commit_unknown"},
+        )
+        if record is not None:
+            EVENTS.wake()
+            return record["task_no"]
+        raise RuntimeError(f"Failed to insert tasks into the database: {exc.__cause__}") from exc.__cause__
 
 
 def _slack_api(method, payload):
     if not SLACK_BOT_TOKEN:
         return {"ok": False, "error": "missing_bot_token"}
+    METRICS.inc("routine_slack_api_calls_total", {"method": method})
     url = f"https://slack.com/api/{method}"
     body = json.dumps(payload).encode("utf-8")
     req = urllib.request.Request(
@@ -826,9 +1879,13 @@ def _slack_api(method, payload):
     try:
         with urllib.request.urlopen(req, timeout=10) as resp:
             raw = resp.read().decode("utf-8")
-            return json.loads(raw)
+            result = json.loads(raw)
     except (urllib.error.URLError, json.JSONDecodeError):
+        METRICS.inc("routine_slack_api_failures_total", {"method": method})
         return {"ok": False, "error": "request_failed"}
+    if not result.get("ok"):
+        METRICS.inc("routine_slack_api_failures_total", {"method": method})
+    return result
 
 
 def _slack_channel_for_target(target):
@@ -912,112 +1969,168 @@ def _notify_slack_on_create(parent_id, parent_entry, child_entries):
                 _slack_api("chat.postMessage", {"channel": channel, "text": message})
 
 
-def _fetch_tasks(page=1, page_size=DEFAULT_PAGE_SIZE, filters=None):
-    page = max(1, page)
-    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
-    offset = (page - 1) * page_size
-    limit = page_size + 1
-    filters = filters or {}
-    include_completed = bool(filters.get("include_completed"))
-    has_status_col = _routine_child_has_status_column()
-    status_expr = "c.status" if has_status_col else "p.status"
-    if include_completed:
-        conds = [
-            "(p.is_deleted = 0 OR p.status = ?)",
-            f"(c.is_deleted = 0 OR COALESCE({status_expr}, '') = ? OR p.status = ?)",
-            "(p.deleted_at IS NULL OR p.deleted_at > SYSUTCDATETIME() OR p.status = ?)",
-            f"(c.deleted_at IS NULL OR c.deleted_at > SYSUTCDATETIME() OR COALESCE({status_expr}, '') = ? OR p.status = ?)",
-        ]
-        params = [
-            STATUS_DONE,
-            STATUS_DONE,
-            STATUS_DONE,
-            STATUS_DONE,
-            STATUS_DONE,
-            STATUS_DONE,
-        ]
-    else:
-        conds = [
-            "p.is_deleted = 0",
-            "c.is_deleted = 0",
-            "(p.deleted_at IS NULL OR p.deleted_at > SYSUTCDATETIME())",
-            "(c.deleted_at IS NULL OR c.deleted_at > SYSUTCDATETIME())",
-            f"COALESCE({status_expr}, '') <> ?",
-        ]
-        params = [STATUS_DONE]
-    task_kind = filters.get("task_kind")
-    if task_kind:
-        normalized_kind = _normalize_task_kind(task_kind)
-        if _routine_child_has_task_kind_column():
-            conds.append("COALESCE(c.task_kind, p.task_kind) = ?")
+_TASK_ROW_DERIVED_COLUMNS = frozenset(
+    {
+        "half_year",
+        "status",
+        "parent_year",
+        "parent_quarter",
+        "parent_month",
+        "parent_week_num",
+        "parent_status",
+        "child_summary",
+        "parent_summary",
+    }
+)
+_PARENT_ROW_DERIVED_COLUMNS = frozenset({"status"})
+
+
+def _column_reader(index, name):
+    position = index.get(name)
+    if position is None:
+        return lambda row: None
+    return operator.itemgetter(position)
+
+
+def _row_status(value):
+    # Most rows already hold a canonical value; skip the str()/strip() round trip.
+    status = _STATUS_ALIASES.get(value) if isinstance(value, str) else None
+    return status or _normalize_status(value)
+
+
+@functools.lru_cache(maxsize=4096)
+def _due_date_fields(due_date_value):
+    month = due_date_value.month
+    return (
+        due_date_value.year,
+        str((month - 1) // 3 + 1),
+        1 if month <= 6 else 2,
+        month,
+        ((due_date_value.day - 1) // 7) + 1,
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def _assignee_parts(value):
+    return tuple(_parse_assignees(value))
+
+
+def _row_assignees(value):
+    return list(_assignee_parts(value)) if isinstance(value, str) else _parse_assignees(value)
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_task_row_mapper(columns):
+    index = {name: position for position, name in enumerate(columns)}
+    passthrough = tuple(
+        (name, position) for name, position in index.items() if name not in _TASK_ROW_DERIVED_COLUMNS
+    )
+    due_date_of = _column_reader(index, "due_date")
+    half_year_of = _column_reader(index, "half_year")
+    parent_year_of = _column_reader(index, "parent_year")
+    parent_quarter_of = _column_reader(index, "parent_quarter")
+    parent_month_of = _column_reader(index, "parent_month")
+    parent_week_num_of = _column_reader(index, "parent_week_num")
+    status_of = _column_reader(index, "status")
+    parent_status_of = _column_reader(index, "parent_status")
+    child_summary_of = _column_reader(index, "child_summary")
+    parent_summary_of = _column_reader(index, "parent_summary")
+    assignee_of = _column_reader(index, "assignee")
+
+    def map_row(row):
+        record = {name: row[position] for name, position in passthrough}
+        due_date_value = due_date_of(row)
+        if due_date_value:
+            (
+                record["year"],
+                record["quarter"],
+                record["half_year"],
+                record["month"],
+                record["week_num"],
+            ) = _due_date_fields(due_date_value)
         else:
-            conds.append("p.task_kind = ?")
-        params.append(normalized_kind)
-    task_no = filters.get("task_no")
-    if task_no is not None and str(task_no).strip():
-        conds.append("c.task_no = ?")
-        params.append(int(task_no))
-    child_assignee_where_sql = "c.assignee" if _routine_child_has_assignee_column() else "p.assignee"
-    child_title_where_sql = "c.title" if _routine_child_has_title_column() else "p.title"
-    assignee = filters.get("assignee")
-    if assignee:
-        conds.append(
-            f"(COALESCE({child_assignee_where_sql}, p.assignee, '') LIKE ? OR COALESCE(p.registrant, '') LIKE ?)"
-        )
-        like_value = f"%{assignee}%"
-        params.extend([like_value, like_value])
-    title = filters.get("title")
-    if title:
-        conds.append(f"COALESCE({child_title_where_sql}, p.title, '') LIKE ?")
-        params.append(f"%{title}%")
-    year = filters.get("year")
-    month = filters.get("month")
-    include_past_incomplete = bool(filters.get("include_past_incomplete", True))
-    if year and month:
-        year_num = int(year)
-        month_num = int(month)
-        filter_month_start = date(year_num, month_num, 1)
-        if include_past_incomplete:
-            if has_status_col:
-                past_incomplete_sql = """
-                    c.due_date < ?
-                    AND COALESCE(c.status, '') <> ?
-                    AND COALESCE(p.status, '') <> ?
-                """
-                past_incomplete_params = [filter_month_start, STATUS_DONE, STATUS_DONE]
-            else:
-                past_incomplete_sql = "c.due_date < ? AND COALESCE(p.status, '') <> ?"
-                past_incomplete_params = [filter_month_start, STATUS_DONE]
-            conds.append(
-                f"""
-                (
-                    (YEAR(c.due_date) = ? AND MONTH(c.due_date) = ?)
-                    OR
-                    ({past_incomplete_sql})
-                )
-                """
-            )
-            params.extend([year_num, month_num, *past_incomplete_params])
+            record["year"] = parent_year_of(row)
+            quarter = record["quarter"] = parent_quarter_of(row)
+            half_year = half_year_of(row)
+            record["half_year"] = half_year if half_year is not None else _half_year_from_quarter(quarter)
+            record["month"] = parent_month_of(row)
+            record["week_num"] = parent_week_num_of(row)
+        record["summary"] = child_summary_of(row) or parent_summary_of(row)
+        if _row_status(parent_status_of(row)) == STATUS_DONE:
+            record["status"] = STATUS_DONE
         else:
-            conds.append("YEAR(c.due_date) = ? AND MONTH(c.due_date) = ?")
-            params.extend([year_num, month_num])
-    elif year:
-        conds.append("YEAR(c.due_date) = ?")
-        params.append(int(year))
-    elif month:
-        conds.append("MONTH(c.due_date) = ?")
-        params.append(int(month))
-    child_assignee_sql = "c.assignee" if _routine_child_has_assignee_column() else "p.assignee"
-    child_title_sql = "c.title" if _routine_child_has_title_column() else "p.title"
-    child_status_sql = "c.status" if has_status_col else "NULL"
-    child_planned_date_sql = "c.planned_date" if _routine_child_has_planned_date_column() else "c.due_date"
-    child_task_kind_sql = "COALESCE(c.task_kind, p.task_kind)" if _routine_child_has_task_kind_column() else "p.task_kind"
-    try:
-        with _get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                f"""
-                SELECT
+            record["status"] = _row_status(status_of(row))
+        record["assignees"] = _row_assignees(assignee_of(row))
+        return record
+
+    return map_row
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_parent_row_mapper(columns):
+    index = {name: position for position, name in enumerate(columns)}
+    passthrough = tuple(
+        (name, position) for name, position in index.items() if name not in _PARENT_ROW_DERIVED_COLUMNS
+    )
+    status_of = _column_reader(index, "status")
+    assignee_of = _column_reader(index, "assignee")
+
+    def map_row(row):
+        record = {name: row[position] for name, position in passthrough}
+        record["status"] = _row_status(status_of(row))
+        record["assignees"] = _row_assignees(assignee_of(row))
+        return record
+
+    return map_row
+
+
+def _map_task_rows(columns, rows):
+    return list(map(_compile_task_row_mapper(tuple(columns)), rows))
+
+
+def _map_parent_rows(columns, rows):
+    return list(map(_compile_parent_row_mapper(tuple(columns)), rows))
+
+
+# Archived children join the parent from whichever table holds it now.
+_ARCHIVE_PARENT_COLUMNS_SQL = """task_no, frequency, half_year, start_month, end_month, [year], quarter, [month],
+                    week_num, assignee, task_kind, registrant, status, title, attachment_link, summary,
+                    is_deleted, deleted_at"""
+_ARCHIVE_PARENT_SQL = f"""
+                    SELECT {_ARCHIVE_PARENT_COLUMNS_SQL} FROM dbo.routine_task
+                    UNION ALL
+                    SELECT {_ARCHIVE_PARENT_COLUMNS_SQL} FROM dbo.routine_task_archive
+                """
+
+
+ChildColumns = namedtuple("ChildColumns", "assignee title status planned_date task_kind")
+TaskQueryShape = namedtuple(
+    "TaskQueryShape",
+    "columns include_completed include_archive archive_columns task_kind task_no assignee title date_window",
+)
+ParentQueryShape = namedtuple(
+    "ParentQueryShape", "title assignee registrant start_from end_to department task_kind"
+)
+
+
+def _child_columns():
+    return ChildColumns(
+        _routine_child_has_assignee_column(),
+        _routine_child_has_title_column(),
+        _routine_child_has_status_column(),
+        _routine_child_has_planned_date_column(),
+        _routine_child_has_task_kind_column(),
+    )
+
+
+def _task_select_columns_sql(columns=None):
+    columns = columns or _child_columns()
+    child_assignee_sql = "c.assignee" if columns.assignee else "p.assignee"
+    child_title_sql = "c.title" if columns.title else "p.title"
+    child_status_sql = "c.status" if columns.status else "NULL"
+    child_planned_date_sql = "c.planned_date" if columns.planned_date else "c.due_date"
+    child_task_kind_sql = "COALESCE(c.task_kind, p.task_kind)" if columns.task_kind else "p.task_kind"
+    return f"""
                     c.record_no,
                     c.task_no,
                     c.routine_no,
@@ -1039,99 +2152,213 @@ def _fetch_tasks(page=1, page_size=DEFAULT_PAGE_SIZE, filters=None):
                     {child_title_sql} AS title,
                     p.attachment_link,
                     p.summary AS parent_summary,
-                    c.summary AS child_summary
-                FROM dbo.routine_task_child c
-                INNER JOIN dbo.routine_task p ON c.task_no = p.task_no
-                WHERE {" AND ".join(conds)}
-                ORDER BY c.due_date ASC, c.task_no ASC, c.routine_no ASC
-                OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
-                """,
-                params + [offset, limit],
+                    c.summary AS child_summary"""
+
+
+def _due_date_window(year, month):
+    """[start, end) for a year or year+month filter, as a seekable due_date range."""
+    year = int(year)
+    if month:
+        month = int(month)
+        return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def _task_query_shape(filters, include_archive=False):
+    year = filters.get("year")
+    month = filters.get("month")
+    if year and month:
+        date_window = "year_month_past" if filters.get("include_past_incomplete", True) else "year_month"
+    elif year:
+        date_window = "year"
+    elif month:
+        date_window = "month"
+    else:
+        date_window = ""
+    task_no = filters.get("task_no")
+    include_completed = bool(filters.get("include_completed"))
+    return TaskQueryShape(
+        columns=_child_columns(),
+        include_completed=include_completed,
+        include_archive=include_completed and include_archive,
+        archive_columns=_archive_child_columns() if include_completed and include_archive else None,
+        task_kind=bool(filters.get("task_kind")),
+        task_no=task_no is not None and bool(str(task_no).strip()),
+        assignee=bool(filters.get("assignee")),
+        title=bool(filters.get("title")),
+        date_window=date_window,
+    )
+
+
+@QUERY_SHAPES.shape("fetch_tasks")
+def _task_query_sql(shape):
+    """SQL for one page of ``_fetch_tasks``; parameters come from ``_task_query_params``.
+
+    Active rows (``c.is_deleted = 0``) and completed rows (``c.is_deleted = 1``)
+    are separate branches, each with an equality on ``is_deleted`` and a
+    ``due_date`` range the (is_deleted, due_date) index can seek on. With
+    ``include_completed`` the branches (and the archive, when asked for) are
+    combined with UNION ALL and ordered and paged once.
+    """
+    columns = shape.columns
+    status_expr = "c.status" if columns.status else "p.status"
+    child_done_sql = f"COALESCE({status_expr}, '') = ?"
+
+    def filter_conds(columns):
+        # Filters shared by every branch, in the order _task_query_params binds them.
+        conds = []
+        if shape.task_kind:
+            conds.append("COALESCE(c.task_kind, p.task_kind) = ?" if columns.task_kind else "p.task_kind = ?")
+        if shape.task_no:
+            conds.append("c.task_no = ?")
+        if shape.assignee:
+            child_assignee_where_sql = "c.assignee" if columns.assignee else "p.assignee"
+            conds.append(
+                f"(COALESCE({child_assignee_where_sql}, p.assignee, '') LIKE ? OR COALESCE(p.registrant, '') LIKE ?)"
+            )
+        if shape.title:
+            child_title_where_sql = "c.title" if columns.title else "p.title"
+            conds.append(f"COALESCE({child_title_where_sql}, p.title, '') LIKE ?")
+        return conds
+
+    conds = filter_conds(columns)
+    # Completed rows only ever match the date window itself; the "past incomplete"
+    # extension of the month view applies to active rows only.
+    window_conds = []
+    if shape.date_window in ("year", "year_month", "year_month_past"):
+        window_conds.append("c.due_date >= ? AND c.due_date < ?")
+    elif shape.date_window == "month":
+        window_conds.append("MONTH(c.due_date) = ?")
+    active_date_conds = window_conds
+    if shape.date_window == "year_month_past":
+        # (in the month) OR (before it and not done) == before the month end AND (in it OR not done)
+        if columns.status:
+            not_done_sql = "(COALESCE(c.status, '') <> ? AND COALESCE(p.status, '') <> ?)"
+        else:
+            not_done_sql = "COALESCE(p.status, '') <> ?"
+        active_date_conds = [f"c.due_date < ? AND (c.due_date >= ? OR {not_done_sql})"]
+
+    live_sql = "p.is_deleted = 0 AND (p.deleted_at IS NULL OR p.deleted_at > SYSUTCDATETIME())"
+    child_live_sql = "(c.deleted_at IS NULL OR c.deleted_at > SYSUTCDATETIME())"
+    select_columns_sql = _task_select_columns_sql(columns)
+
+    def branch(where, child_table="dbo.routine_task_child", parent_table="dbo.routine_task", select_sql=None):
+        return f"""
+            SELECT {select_sql or select_columns_sql}
+            FROM {child_table} c
+            INNER JOIN {parent_table} p ON c.task_no = p.task_no
+            WHERE {" AND ".join(where)}"""
+
+    if not shape.include_completed:
+        where = ["c.is_deleted = 0", live_sql, child_live_sql, f"COALESCE({status_expr}, '') <> ?"]
+        return (
+            branch(where + conds + active_date_conds)
+            + """
+            ORDER BY c.due_date ASC, c.task_no ASC, c.routine_no ASC
+            OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"""
+        )
+
+    # Active branch: live children, plus those of a parent completed as a whole.
+    active_where = [
+        "c.is_deleted = 0",
+        f"(p.status = ? OR ({live_sql} AND ({child_live_sql} OR {child_done_sql})))",
+    ]
+    # Completed branch: completed children, unless their parent is gone without being done.
+    completed_where = [f"(p.status = ? OR ({live_sql} AND {child_done_sql}))", *conds, *window_conds]
+    branches = [branch(active_where + conds + active_date_conds), branch(["c.is_deleted = 1", *completed_where])]
+    if shape.include_archive:
+        # The archive only holds rows with is_deleted = 1, so it takes the completed branch's
+        # predicates, written against the archive's own columns.
+        archive_columns = shape.archive_columns
+        archive_status_expr = "c.status" if archive_columns.status else "p.status"
+        archive_where = [
+            f"(p.status = ? OR ({live_sql} AND COALESCE({archive_status_expr}, '') = ?))",
+            *filter_conds(archive_columns),
+            *window_conds,
+        ]
+        branches.append(
+            branch(
+                archive_where,
+                "dbo.routine_task_child_archive",
+                f"({_ARCHIVE_PARENT_SQL})",
+                _task_select_columns_sql(archive_columns),
             )
+        )
+    union_sql = "\nUNION ALL".join(branches)
+    return f"""
+        SELECT *
+        FROM ({union_sql}
+        ) t
+        ORDER BY t.due_date ASC, t.task_no ASC, t.routine_no ASC
+        OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"""
+
+
+def _task_query_params(filters, shape, offset, limit):
+    params = []
+    if shape.task_kind:
+        params.append(_normalize_task_kind(filters.get("task_kind")))
+    if shape.task_no:
+        params.append(int(filters.get("task_no")))
+    if shape.assignee:
+        like_value = f"%{filters.get('assignee')}%"
+        params.extend([like_value, like_value])
+    if shape.title:
+        params.append(f"%{filters.get('title')}%")
+    window_params = []
+    if shape.date_window == "month":
+        window_params = [int(filters.get("month"))]
+    elif shape.date_window:
+        window_params = list(_due_date_window(filters.get("year"), filters.get("month")))
+    active_date_params = window_params
+    if shape.date_window == "year_month_past":
+        window_start, window_end = window_params
+        active_date_params = [window_end, window_start, STATUS_DONE]
+        if shape.columns.status:
+            active_date_params.append(STATUS_DONE)
+    if not shape.include_completed:
+        return [STATUS_DONE, *params, *active_date_params, offset, limit]
+    completed_params = [STATUS_DONE, STATUS_DONE, *params, *window_params]
+    branch_params = [STATUS_DONE, STATUS_DONE, *params, *active_date_params, *completed_params]
+    if shape.include_archive:
+        branch_params += completed_params
+    return [*branch_params, offset, limit]
+
+
+def _build_task_query(filters, offset, limit, include_archive=False):
+    shape = _task_query_shape(filters, include_archive)
+    return _task_query_sql(shape), _task_query_params(filters, shape, offset, limit)
+
+
+def _fetch_tasks(page=1, page_size=DEFAULT_PAGE_SIZE, filters=None):
+    page = max(1, page)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    offset = (page - 1) * page_size
+    limit = page_size + 1
+    filters = filters or {}
+    include_archive = bool(filters.get("include_completed")) and _archive_window_needed(
+        filters.get("year"), filters.get("month")
+    )
+    query, query_params = _build_task_query(filters, offset, limit, include_archive)
+    def _run():
+        with _get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, query_params)
             columns = [column[0] for column in cursor.description]
             rows = cursor.fetchall()
+            _record_lock_wait("fetch_tasks", cursor)
             has_next = len(rows) > page_size
             rows = rows[:page_size]
-            tasks = []
-            for row in rows:
-                record = dict(zip(columns, row))
-                due_date_value = record.get("due_date")
-                planned_date_value = record.get("planned_date")
-                if due_date_value:
-                    record["due_date"] = due_date_value.isoformat()
-                    parsed_due = due_date_value
-                    record["year"] = parsed_due.year
-                    record["quarter"] = str((parsed_due.month - 1) // 3 + 1)
-                    record["half_year"] = 1 if parsed_due.month <= 6 else 2
-                    record["month"] = parsed_due.month
-                    record["week_num"] = ((parsed_due.day - 1) // 7) + 1
-                else:
-                    record["year"] = record.get("parent_year")
-                    record["quarter"] = record.get("parent_quarter")
-                    if record.get("half_year") is None:
-                        record["half_year"] = _half_year_from_quarter(record.get("parent_quarter"))
-                    record["month"] = record.get("parent_month")
-                    record["week_num"] = record.get("parent_week_num")
-                if planned_date_value:
-                    record["planned_date"] = planned_date_value.isoformat()
-                record["summary"] = record.get("child_summary") or record.get("parent_summary")
-                parent_status = _normalize_status(record.get("parent_status"))
-                child_status = _normalize_status(record.get("status"))
-                record["status"] = STATUS_DONE if parent_status == STATUS_DONE else child_status
-                for cleanup_key in (
-                    "parent_year",
-                    "parent_quarter",
-                    "parent_month",
-                    "parent_week_num",
-                    "parent_status",
-                    "child_summary",
-                    "parent_summary",
-                ):
-                    record.pop(cleanup_key, None)
-                record["assignees"] = _parse_assignees(record.get("assignee"))
-                tasks.append(record)
+            map_started = time.perf_counter()
+            tasks = _map_task_rows(columns, rows)
+            _add_db_timing("map_ms", time.perf_counter() - map_started)
             return tasks, has_next
-    except pyodbc.Error as exc:
+    try:
+        return _with_db_retry("fetch_tasks", _run)
+    except DB_ERRORS as exc:
         raise RuntimeError(f"Failed to fetch routines from the database: {exc}") from exc
 
 
-def _fetch_parent_tasks(filters, page=1, page_size=DEFAULT_PAGE_SIZE):
-    conds = ["is_deleted = 0"]
-    params = []
-    title = filters.get("title")
-    if title:
-        conds.append("title LIKE ?")
-        params.append(f"%{title}%")
-    assignee = filters.get("assignee")
-    if assignee:
-        conds.append("assignee LIKE ?")
-        params.append(f"%{assignee}%")
-    registrant = filters.get("registrant")
-    if registrant:
-        conds.append("registrant LIKE ?")
-        params.append(f"%{registrant}%")
-    start_from = filters.get("start_from")
-    if start_from:
-        conds.append("start_month >= ?")
-        params.append(start_from)
-    end_to = filters.get("end_to")
-    if end_to:
-        conds.append("end_month <= ?")
-        params.append(end_to)
-    department_cd = filters.get("department")
-    if department_cd:
-        conds.append("department_cd = ?")
-        params.append(department_cd)
-    task_kind = _normalize_task_kind(filters.get("task_kind"))
-    if filters.get("task_kind"):
-        conds.append("task_kind = ?")
-        params.append(task_kind)
-    page = max(1, page)
-    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
-    offset = (page - 1) * page_size
-    fetch_limit = page_size + 1
-    query = f"""
-        SELECT
+_PARENT_SELECT_COLUMNS_SQL = """
             task_no,
             frequency,
             half_year,
@@ -1148,34 +2375,184 @@ def _fetch_parent_tasks(filters, page=1, page_size=DEFAULT_PAGE_SIZE):
             registrant,
             status,
             title,
-            summary
+            summary"""
+
+
+@QUERY_SHAPES.shape("fetch_parent_tasks")
+def _parent_query_sql(shape):
+    conds = ["is_deleted = 0"]
+    if shape.title:
+        conds.append("title LIKE ?")
+    if shape.assignee:
+        conds.append("assignee LIKE ?")
+    if shape.registrant:
+        conds.append("registrant LIKE ?")
+    if shape.start_from:
+        conds.append("start_month >= ?")
+    if shape.end_to:
+        conds.append("end_month <= ?")
+    if shape.department:
+        conds.append("department_cd = ?")
+    if shape.task_kind:
+        conds.append("task_kind = ?")
+    return f"""
+        SELECT {_PARENT_SELECT_COLUMNS_SQL}
         FROM dbo.routine_task p
         WHERE {" AND ".join(conds)}
         ORDER BY start_month DESC, task_no DESC
         OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
     """
-    try:
-        with _get_db_connection() as conn:
+
+
+def _fetch_parent_tasks(filters, page=1, page_size=DEFAULT_PAGE_SIZE):
+    shape = ParentQueryShape(
+        title=bool(filters.get("title")),
+        assignee=bool(filters.get("assignee")),
+        registrant=bool(filters.get("registrant")),
+        start_from=bool(filters.get("start_from")),
+        end_to=bool(filters.get("end_to")),
+        department=bool(filters.get("department")),
+        task_kind=bool(filters.get("task_kind")),
+    )
+    params = []
+    if shape.title:
+        params.append(f"%{filters['title']}%")
+    if shape.assignee:
+        params.append(f"%{filters['assignee']}%")
+    if shape.registrant:
+        params.append(f"%{filters['registrant']}%")
+    if shape.start_from:
+        params.append(filters["start_from"])
+    if shape.end_to:
+        params.append(filters["end_to"])
+    if shape.department:
+        params.append(filters["department"])
+    if shape.task_kind:
+        params.append(_normalize_task_kind(filters["task_kind"]))
+    page = max(1, page)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    offset = (page - 1) * page_size
+    fetch_limit = page_size + 1
+    query = _parent_query_sql(shape)
+    def _run():
+        with _get_read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params + [offset, fetch_limit])
             columns = [column[0] for column in cursor.description]
             rows = cursor.fetchall()
+            _record_lock_wait("fetch_parent_tasks", cursor)
             has_next = len(rows) > page_size
             rows = rows[:page_size]
-            parents = []
-            for row in rows:
-                parent = dict(zip(columns, row))
-                due_date_value = parent.get("due_date")
-                if due_date_value:
-                    parent["due_date"] = due_date_value.isoformat()
-                parent["status"] = _normalize_status(parent.get("status"))
-                parent["assignees"] = _parse_assignees(parent.get("assignee"))
-                parents.append(parent)
+            map_started = time.perf_counter()
+            parents = _map_parent_rows(columns, rows)
+            _add_db_timing("map_ms", time.perf_counter() - map_started)
             return parents, has_next
-    except pyodbc.Error as exc:
+    try:
+        return _with_db_retry("fetch_parent_tasks", _run)
+    except DB_ERRORS as exc:
         raise RuntimeError("Failed to fetch parent tasks") from exc
 
 
+def _encode_changes_token(value, row_version=None):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    token = value.strftime("%Y%m%dT%H%M%S%f")
+    return token if row_version is None else f"{token}.{int(row_version)}"
+
+
+def _decode_changes_token(token):
+    """(database clock, MIN_ACTIVE_ROWVERSION or None) of a token from _encode_changes_token."""
+    try:
+        stamp, _, row_version = token.partition(".")
+        return datetime.strptime(stamp, "%Y%m%dT%H%M%S%f"), int(row_version) if row_version else None
+    except (AttributeError, TypeError, ValueError) as exc:
+        raise ValueError("invalid change token") from exc
+
+
+def _changes_since_sql(alias, since):
+    """WHERE condition and parameters for rows of ``alias`` changed after a decoded token."""
+    stamp, row_version = since
+    if row_version is None or not _row_versions_exist():
+        # updated_at is stamped when the statement runs, not at commit, so only the
+        # overlap covers transactions that were still open when the token was issued.
+        return f"{alias}.updated_at > ?", [stamp - timedelta(seconds=CHANGES_LOOKBACK_SECONDS)]
+    # Every transaction still open when the token was issued writes row versions at or
+    # above it, however long it runs; clients apply the rows read twice idempotently.
+    condition = f"{alias}.row_version >= CAST(CAST(? AS BIGINT) AS BINARY(8))"
+    params = [row_version]
+    if CHANGES_REPLICA_LOOKBACK_SECONDS:
+        condition = f"({condition} OR {alias}.updated_at > ?)"
+        params.append(stamp - timedelta(seconds=CHANGES_REPLICA_LOOKBACK_SECONDS))
+    return condition, params
+
+
+def _fetch_changes(since_token=None):
+    since = _decode_changes_token(since_token) if since_token else None
+    token_query = (
+        "SELECT SYSUTCDATETIME(), CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT)"
+        if _row_versions_exist()
+        else "SELECT SYSUTCDATETIME(), NULL"
+    )
+    parent_query = child_query = parent_params = child_params = None
+    if since is not None:
+        parent_since_sql, parent_params = _changes_since_sql("p", since)
+        child_since_sql, child_since_params = _changes_since_sql("c", since)
+        changed_parent_sql, changed_parent_params = _changes_since_sql("u", since)
+        child_params = child_since_params + changed_parent_params
+        parent_query = f"""
+            SELECT {_PARENT_SELECT_COLUMNS_SQL},
+                is_deleted
+            FROM dbo.routine_task p
+            WHERE {parent_since_sql}
+            ORDER BY updated_at, task_no
+            OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+        """
+        child_query = f"""
+            SELECT {_task_select_columns_sql()},
+                c.is_deleted AS is_deleted,
+                p.is_deleted AS parent_is_deleted
+            FROM dbo.routine_task_child c
+            INNER JOIN dbo.routine_task p ON c.task_no = p.task_no
+            WHERE {child_since_sql}
+               OR c.task_no IN (SELECT u.task_no FROM dbo.routine_task u WHERE {changed_parent_sql})
+            ORDER BY c.record_no
+            OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+        """
+    def _run():
+        # The token is the primary's clock; a lagging replica could skip rows committed before it.
+        with _get_read_connection(allow_replica=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute(token_query)
+            stamp, row_version = cursor.fetchone()
+            changes = {"token": _encode_changes_token(stamp, row_version), "parents": [], "routines": []}
+            changes["truncated"] = False
+            if since is None:
+                return changes
+            cursor.execute(parent_query, parent_params + [0, CHANGES_MAX_ROWS + 1])
+            columns = [column[0] for column in cursor.description]
+            parent_rows = cursor.fetchall()
+            cursor.execute(child_query, child_params + [0, CHANGES_MAX_ROWS + 1])
+            child_columns = [column[0] for column in cursor.description]
+            child_rows = cursor.fetchall()
+            _record_lock_wait("fetch_changes", cursor)
+            if len(parent_rows) > CHANGES_MAX_ROWS or len(child_rows) > CHANGES_MAX_ROWS:
+                changes["truncated"] = True
+                return changes
+            map_started = time.perf_counter()
+            for parent in _map_parent_rows(columns, parent_rows):
+                parent["is_deleted"] = bool(parent["is_deleted"])
+                changes["parents"].append(parent)
+            for routine in _map_task_rows(child_columns, child_rows):
+                routine["is_deleted"] = bool(routine["is_deleted"] or routine.pop("parent_is_deleted"))
+                changes["routines"].append(routine)
+            _add_db_timing("map_ms", time.perf_counter() - map_started)
+            return changes
+    try:
+        return _with_db_retry("fetch_changes", _run)
+    except DB_ERRORS as exc:
+        raise RuntimeError("Failed to fetch changes") from exc
+
+
 def _update_parent(task_no, data):
     allowed = [
         "frequency",
@@ -1213,16 +2590,16 @@ def _update_parent(task_no, data):
                 task_kind_for_validation = value
             if key == "status":
                 value = _normalize_status(value)
-            updates.append(f"{key} = ?")
+            updates.append(key)
             params.append(value)
     if "quarter" in data and data.get("quarter") is not None:
         derived_half_year = _half_year_from_quarter(data.get("quarter"))
     if derived_half_year is not None:
-        updates.append("half_year = ?")
+        updates.append("half_year")
         params.append(derived_half_year)
     if "assignee" in data and data.get("assignee") is not None and "task_kind" not in data:
         task_kind_for_validation = _fetch_parent_task_kind(task_no) or "個人"
-        updates.append("task_kind = ?")
+        updates.append("task_kind")
         params.append(task_kind_for_validation)
     if assignee_for_validation is not None:
         task_kind_to_check = task_kind_for_validation or _fetch_parent_task_kind(task_no) or "個人"
@@ -1230,11 +2607,7 @@ def _update_parent(task_no, data):
     if not updates:
         return
     params.append(task_no)
-    query = f"""
-        UPDATE dbo.routine_task
-        SET {', '.join(updates)}, updated_at = SYSUTCDATETIME()
-        WHERE task_no = ?
-    """
+    query = _parent_update_sql(tuple(updates))
     current_parent_query = """
         SELECT
             frequency,
@@ -1251,7 +2624,7 @@ def _update_parent(task_no, data):
         WHERE task_no = ?
           AND is_deleted = 0
     """
-    try:
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(current_parent_query, [task_no])
@@ -1315,27 +2688,40 @@ def _update_parent(task_no, data):
                 )
             cursor.execute(query, params)
             if extension_entries:
-                cursor.execute(
-                    "SELECT COALESCE(MAX(routine_no), 0) FROM dbo.routine_task_child WHERE task_no = ?",
-                    [task_no],
-                )
+                # archive.py also moves completed children of live parents, so their
+                # routine_no values are taken too.
+                if _archive_tables_exist():
+                    cursor.execute(
+                        """
+                        SELECT COALESCE(MAX(routine_no), 0) FROM (
+                            SELECT routine_no FROM dbo.routine_task_child WHERE task_no = ?
+                            UNION ALL
+                            SELECT routine_no FROM dbo.routine_task_child_archive WHERE task_no = ?
+                        ) AS taken
+                        """,
+                        [task_no, task_no],
+                    )
+                else:
+                    cursor.execute(
+                        "SELECT COALESCE(MAX(routine_no), 0) FROM dbo.routine_task_child WHERE task_no = ?",
+                        [task_no],
+                    )
                 max_row = cursor.fetchone()
                 next_routine_no = (max_row[0] if max_row and max_row[0] is not None else 0) + 1
                 child_columns = _routine_child_columns()
-                child_placeholders = ", ".join("?" for _ in child_columns)
-                child_columns_sql = ", ".join(child_columns)
-                child_query = (
-                    f"INSERT INTO dbo.routine_task_child ({child_columns_sql}) "
-                    f"VALUES ({child_placeholders})"
-                )
+                child_query = _child_insert_sql(tuple(child_columns))
                 payload_rows = []
                 for entry in extension_entries:
                     row_payload = {"task_no": task_no, "routine_no": next_routine_no, **entry}
                     payload_rows.append([row_payload[col] for col in child_columns])
                     next_routine_no += 1
                 cursor.executemany(child_query, payload_rows)
+            _record_change(cursor, "parent_updated", task_no)
             conn.commit()
-    except pyodbc.Error as exc:
+            EVENTS.wake()
+    try:
+        return _with_db_retry("update_parent", _run)
+    except DB_ERRORS as exc:
         raise RuntimeError("Failed to update parent task") from exc
 
 
@@ -1344,24 +2730,30 @@ def _complete_task(task_no):
         UPDATE dbo.routine_task
         SET is_deleted = 1,
             deleted_at = SYSUTCDATETIME(),
-            status = ?
+            status = ?,
+            updated_at = SYSUTCDATETIME()
         WHERE task_no = ?
           AND is_deleted = 0
     """
     child_query = """
         UPDATE dbo.routine_task_child
         SET is_deleted = 1,
-            deleted_at = SYSUTCDATETIME()
+            deleted_at = SYSUTCDATETIME(),
+            updated_at = SYSUTCDATETIME()
         WHERE task_no = ?
           AND is_deleted = 0
     """
-    try:
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(parent_query, [STATUS_DONE, task_no])
             cursor.execute(child_query, [task_no])
+            _record_change(cursor, "parent_completed", task_no)
             conn.commit()
-    except pyodbc.Error as exc:
+            EVENTS.wake()
+    try:
+        return _with_db_retry("complete_task", _run)
+    except DB_ERRORS as exc:
         raise RuntimeError("Failed to complete routine task") from exc
 
 
@@ -1421,22 +2813,22 @@ def _update_child(record_no, data):
                 value = _normalize_status(value)
             if key == "task_kind":
                 value = _normalize_task_kind(value) if value else None
-            updates.append(f"{key} = ?")
+            updates.append(key)
             params.append(value)
     if not updates:
         return
     params.append(record_no)
-    query = f"""
-        UPDATE dbo.routine_task_child
-        SET {', '.join(updates)}, updated_at = SYSUTCDATETIME()
-        WHERE record_no = ?
-    """
-    try:
+    query = _child_update_sql(tuple(updates))
+    def _run():
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
+            _record_child_change(cursor, "child_updated", record_no)
             conn.commit()
-    except pyodbc.Error as exc:
+            EVENTS.wake()
+    try:
+        return _with_db_retry("update_child", _run)
+    except DB_ERRORS as exc:
         raise RuntimeError("Failed to update routine task") from exc
 
 
@@ -1445,17 +2837,29 @@ def _complete_routine(record_no):
         UPDATE dbo.routine_task_child
         SET is_deleted = 1,
             deleted_at = SYSUTCDATETIME(),
-            status = ?
+            status = ?,
+            updated_at = SYSUTCDATETIME()
         OUTPUT INSERTED.task_no
         WHERE record_no = ?
           AND is_deleted = 0
     """
-    try:
+    attempts = []
+
+    def _run():
+        attempts.append(record_no)
         with _get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, [STATUS_DONE, record_no])
             row = cursor.fetchone()
             if not row:
+                if len(attempts) > 1:
+                    # A previous attempt may have committed before the connection dropped.
+                    cursor.execute(
+                        "SELECT 1 FROM dbo.routine_task_child WHERE record_no = ? AND is_deleted = 1",
+                        [record_no],
+                    )
+                    if cursor.fetchone():
+                        return
                 raise RuntimeError("Routine already completed or not found")
             task_no = row[0]
             cursor.execute(
@@ -1463,54 +2867,85 @@ def _complete_routine(record_no):
                 [task_no],
             )
             remaining = cursor.fetchone()[0]
+            _record_change(cursor, "child_completed", task_no, record_no)
             if remaining == 0:
                 cursor.execute(
                     """
                     UPDATE dbo.routine_task
                     SET is_deleted = 1,
                         deleted_at = SYSUTCDATETIME(),
-                        status = ?
+                        status = ?,
+                        updated_at = SYSUTCDATETIME()
                     WHERE task_no = ?
                       AND is_deleted = 0
                     """,
                     [STATUS_DONE, task_no],
                 )
+                _record_change(cursor, "parent_completed", task_no)
             conn.commit()
-    except pyodbc.Error as exc:
+            EVENTS.wake()
+    try:
+        return _with_db_retry("complete_routine", _run)
+    except DB_ERRORS as exc:
         raise RuntimeError("Failed to complete routine") from exc
 
 
-def _fetch_department_users(department_cd, only_employees=False):
+def _fetch_department_directory(department_cd):
+    """Return (employees, employees_only) for a department from a single query."""
     if not department_cd:
-        return []
+        return [], []
     employee_table = _qualified_table("Employee")
-    filters = [
-        "DepartmentCD = ?",
-        "RetirementDate IS NULL",
-        "LastWorkDate IS NULL",
-    ]
-    params = [department_cd]
-    if only_employees:
-        filters.append("EmployeeType = 0")
     query = f"""
         SELECT
             UserID,
             EmployeeName,
             AD,
-            DepartmentCD
+            DepartmentCD,
+            EmployeeType
         FROM {employee_table}
-        WHERE {" AND ".join(filters)}
+        WHERE DepartmentCD = ? AND RetirementDate IS NULL AND LastWorkDate IS NULL
         ORDER BY EmployeeName
     """
-    try:
-        with _get_db_connection() as conn:
+    def _run():
+        with _get_read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(query, params)
-            columns = [column[0] for column in cursor.description]
-            rows = cursor.fetchall()
-            return [dict(zip(columns, row)) for row in rows]
-    except pyodbc.Error as exc:
+            cursor.execute(query, [department_cd])
+            return cursor.fetchall()
+    try:
+        rows = _account_query("fetch_department_users", department_cd, _run)
+    except RuntimeError as exc:
         raise RuntimeError("Failed to fetch department users") from exc
+    employees = []
+    employees_only = []
+    for user_id, employee_name, ad, row_department_cd, employee_type in rows:
+        employee = {"UserID": user_id, "EmployeeName": employee_name, "AD": ad, "DepartmentCD": row_department_cd}
+        employees.append(employee)
+        if employee_type == 0:
+            employees_only.append(employee)
+    return employees, employees_only
+
+
+def _submit_in_request_context(func, *args):
+    global _BOOTSTRAP_POOL
+    if _BOOTSTRAP_POOL is None:
+        with _BOOTSTRAP_POOL_LOCK:
+            if _BOOTSTRAP_POOL is None:
+                _BOOTSTRAP_POOL = ThreadPoolExecutor(max_workers=BOOTSTRAP_WORKERS, thread_name_prefix="bootstrap")
+
+    @copy_current_request_context
+    def call():
+        return func(*args), g.get("db_timing")
+
+    return _BOOTSTRAP_POOL.submit(call)
+
+
+def _request_context_result(future):
+    result, timing = future.result()
+    request_timing = _request_db_timing()
+    if timing and request_timing is not None:
+        for key, value in timing.items():
+            request_timing[key] += value
+    return result
 
 
 def _extract_user():
@@ -1518,15 +2953,162 @@ def _extract_user():
     return context.get("name") or ""
 
 
+def _rate_limit_key():
+    upn = _session_upn()
+    return f"upn:{upn}" if upn else f"ip:{request.remote_addr}"
+
+
+def _request_cost(endpoint):
+    cost = RATE_LIMIT_COSTS.get(endpoint, 0.0)
+    if not cost:
+        return 0.0
+    if endpoint == "post_routines_route":
+        data = request.get_json(silent=True) or {}
+        try:
+            start_year, start_month = _parse_ym(data.get("start_month"))
+            end_year, end_month = _parse_ym(data.get("end_month"))
+        except (AttributeError, ValueError):
+            return cost
+        months = (end_year - start_year) * 12 + end_month - start_month + 1
+        return cost * max(1, (months + 11) // 12)
+    try:
+        page_size = int(request.args.get("page_size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return cost
+    return cost * max(1.0, min(page_size, MAX_PAGE_SIZE) / RATE_LIMIT_BASE_PAGE_SIZE)
+
+
+def _admission_rejected(reason, retry_after):
+    METRICS.inc("routine_admission_rejections_total", {"endpoint": request.endpoint, "reason": reason})
+    response = jsonify({"message": "Too many requests; retry later"})
+    response.status_code = 429
+    response.headers["Retry-After"] = retry_after_header(retry_after)
+    return response
+
+
+def _session_upn():
+    claims = session.get("user") or {}
+    upn = _normalize_upn(claims.get("preferred_username") or claims.get("upn") or claims.get("email"))
+    return upn.lower() if upn else None
+
+
+def _is_admin():
+    upn = _session_upn()
+    return bool(upn) and upn in ADMIN_UPNS
+
+
 def create_app():
+    configure_logging()
     app = Flask(__name__, static_folder=None)
-    app.logger.setLevel(logging.DEBUG)
-    logging.basicConfig(level=logging.DEBUG)
+    app.json = RoutineJSONProvider(app)
     app.config["SECRET_KEY"] = os.environ.get("FLASK_SECRET_KEY", "change-me")
+    if READ_REPLICA_ENABLED:
+        app.logger.info(
+            "change feed looks back %.1fs for the replica: max lag %.1fs + lag check %.1fs (+ %.1fs overlap without row_version)",
+            CHANGES_REPLICA_LOOKBACK_SECONDS,
+            READ_REPLICA_MAX_LAG_SECONDS,
+            READ_REPLICA_LAG_CHECK_SECONDS,
+            CHANGES_OVERLAP_SECONDS,
+        )
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.request_id = (request.headers.get("X-Request-ID") or "").strip()[:64] or uuid.uuid4().hex[:16]
+        # Log records read it from the environ, which bootstrap pool threads share.
+        request.environ["routine.request_id"] = g.request_id
+
+    @app.after_request
+    def stop_profiling(response):
+        # Registered first so it runs after every other after_request hook.
+        profile_session = g.pop("profile_session", None)
+        if profile_session is not None:
+            info = profile_session.stop(
+                {
+                    "method": request.method,
+                    "path": request.full_path.rstrip("?"),
+                    "endpoint": request.endpoint,
+                    "status": response.status_code,
+                    "request_id": g.get("request_id"),
+                }
+            )
+            response.headers["X-Routine-Profile"] = info["name"]
+        return response
+
+    @app.teardown_request
+    def discard_profiling(exc):
+        profile_session = g.pop("profile_session", None)
+        if profile_session is not None:
+            profile_session.stop({"method": request.method, "path": request.path, "error": repr(exc)})
+
+    @app.after_request
+    def compress_response(response):
+        if response.is_streamed or response.direct_passthrough:
+            return response
+        encoding = response.headers.get("Content-Encoding", "identity")
+        uncompressed = g.pop("uncompressed_bytes", None)
+        if (
+            encoding == "identity"
+            and response.mimetype in compression.COMPRESSIBLE_MIMETYPES
+            and 200 <= response.status_code < 300
+            and request.accept_encodings["gzip"]
+        ):
+            body = response.get_data()
+            if len(body) >= compression.COMPRESS_MIN_BYTES:
+                uncompressed = len(body)
+                response.set_data(compression.gzip_body(body))
+                response.headers["Content-Encoding"] = encoding = "gzip"
+                response.vary.add("Accept-Encoding")
+                etag, weak = response.get_etag()
+                if etag and not weak:
+                    response.set_etag(etag, weak=True)
+        labels = {"endpoint": request.endpoint or "unmatched"}
+        sent = response.calculate_content_length() or 0
+        if response.status_code == 304:
+            uncompressed = 0
+        METRICS.inc("routine_http_response_bytes_total", {**labels, "encoding": encoding}, sent)
+        METRICS.inc("routine_http_response_uncompressed_bytes_total", labels, uncompressed or sent)
+        return response
 
     @app.after_request
     def allow_cors(response):
         response.headers["Access-Control-Allow-Origin"] = "*"
+        if g.get("request_id"):
+            response.headers["X-Request-ID"] = g.request_id
+        return response
+
+    @app.after_request
+    def pin_reads_after_write(response):
+        # Read-your-writes: a session that just wrote reads from the primary for a while.
+        if READ_REPLICA_ENABLED and request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+            session["read_primary_until"] = time.time() + READ_REPLICA_STICKY_SECONDS
+        return response
+
+    @app.after_request
+    def emit_db_timing(response):
+        started = g.get("request_started")
+        total_ms = (time.perf_counter() - started) * 1000 if started else None
+        if total_ms is not None:
+            METRICS.observe(
+                "routine_http_request_duration_seconds",
+                total_ms / 1000,
+                {"endpoint": request.endpoint or "unmatched", "method": request.method},
+            )
+        timing = g.get("db_timing")
+        if not timing:
+            return response
+        response.headers["Server-Timing"] = _format_server_timing(timing, total_ms)
+        app.logger.info(
+            "db_timing",
+            extra={
+                "fields": {
+                    "method": request.method,
+                    "status": response.status_code,
+                    "total_ms": round(total_ms, 1) if total_ms is not None else None,
+                    **{key: round(value, 1) if isinstance(value, float) else value for key, value in timing.items()},
+                }
+            },
+        )
         return response
 
     @app.before_request
@@ -1537,6 +3119,7 @@ def create_app():
             "logout",
             "not_found",
             "static",
+            "metrics_route",
         }
         if request.endpoint in public_endpoints:
             return
@@ -1553,6 +3136,52 @@ def create_app():
             return
         return redirect(url_for("login"))
 
+    @app.before_request
+    def start_query_budget():
+        budget = QUERY_BUDGETS.get(request.endpoint)
+        if budget:
+            request.environ["routine.query_deadline"] = time.monotonic() + budget
+
+    @app.errorhandler(QueryBudgetExceeded)
+    def query_budget_exceeded(exc):
+        METRICS.inc(
+            "routine_query_budget_exhausted_total", {"endpoint": request.endpoint or "", "operation": exc.operation}
+        )
+        app.logger.warning("query budget exhausted endpoint=%s operation=%s", request.endpoint, exc.operation)
+        response = jsonify({"message": "The database is busy; please retry shortly"})
+        response.status_code = 503
+        response.headers["Retry-After"] = QUERY_BUDGET_RETRY_AFTER
+        return response
+
+    @app.before_request
+    def admit_request():
+        # After require_login, so the bucket is keyed by the signed-in UPN.
+        cost = _request_cost(request.endpoint)
+        if cost:
+            allowed, retry_after = RATE_LIMITER.take(_rate_limit_key(), cost)
+            if not allowed:
+                return _admission_rejected("rate_limit", retry_after)
+        if request.endpoint in HEAVY_ENDPOINTS and HEAVY_GATE.enabled:
+            started = time.perf_counter()
+            acquired, reason = HEAVY_GATE.acquire()
+            METRICS.observe("routine_admission_queue_wait_seconds", time.perf_counter() - started)
+            if not acquired:
+                return _admission_rejected(reason, HEAVY_GATE.queue_timeout)
+            g.heavy_slot = True
+            METRICS.add_gauge("routine_heavy_requests_in_flight", 1)
+
+    @app.teardown_request
+    def release_heavy_slot(exc):
+        if g.pop("heavy_slot", False):
+            HEAVY_GATE.release()
+            METRICS.add_gauge("routine_heavy_requests_in_flight", -1)
+
+    @app.before_request
+    def start_profiling():
+        requested = request.headers.get("X-Routine-Profile") == "1" or request.args.get("_profile") == "1"
+        if (requested and _is_admin()) or PROFILER.should_sample():
+            g.profile_session = PROFILER.start()
+
     @app.route("/login")
     @app.route("/routine_app/login")
     def login():
@@ -1608,6 +3237,34 @@ def create_app():
         return redirect(url_for("login"))
 
 
+    def _routine_filters(args):
+        return {
+            "task_kind": args.get("task_kind"),
+            "year": args.get("year"),
+            "month": args.get("month"),
+            "assignee": args.get("assignee"),
+            "title": args.get("title"),
+            "task_no": args.get("task_no"),
+            "include_past_incomplete": args.get("include_past_incomplete", "1") != "0",
+            "include_completed": args.get("include_completed", "0") == "1",
+        }
+
+    def _parent_filters(args, prefix=""):
+        return {
+            key: args.get(prefix + key)
+            for key in ("title", "assignee", "registrant", "start_from", "end_to", "task_kind")
+        }
+
+    def _build_parents_payload(page, page_size, filters):
+        parents, has_next = _fetch_parent_tasks(filters, page, page_size)
+        pagination = {
+            "page": page,
+            "page_size": page_size,
+            "has_prev": page > 1,
+            "has_next": has_next,
+        }
+        return {"parents": parents, "pagination": pagination}
+
     def _build_routines_payload(page=1, page_size=DEFAULT_PAGE_SIZE, filters=None):
         routines, has_next = _fetch_tasks(page=page, page_size=page_size, filters=filters)
         pagination = {
@@ -1625,6 +3282,23 @@ def create_app():
 
     def _handle_create():
         data = request.get_json(silent=True) or {}
+        idempotency = None
+        idempotency_key = (request.headers.get("Idempotency-Key") or "").strip()
+        if idempotency_key:
+            if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                return jsonify({"message": f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"}), 400
+            if _idempotency_table_exists():
+                idempotency = {"upn": _session_upn() or "", "key": idempotency_key, "request_hash": _request_fingerprint(data)}
+                replay = _idempotent_replay(idempotency)
+                if replay is not None:
+                    return replay
+        elif _idempotency_table_exists():
+            # A key of our own, so a lost COMMIT acknowledgement can still be resolved.
+            idempotency = {
+                "upn": _session_upn() or "",
+                "key": f"server:{uuid.uuid4().hex}",
+                "request_hash": _request_fingerprint(data),
+            }
         frequency = (data.get("frequency") or "").strip()
         if not frequency:
             return jsonify({"message": "frequency is required"}), 400
@@ -1636,30 +3310,27 @@ def create_app():
         registrant = _extract_user() or "system"
         user_context = _current_user_context()
         parent_entry, entries = _build_entries(data, registrant, user_context.get("department_cd"))
-        parent_id = _insert_entries(parent_entry, entries)
+        body = {"message": "逋ｻ骭ｲ縺励∪縺励◆", "task_count": len(entries)}
+        if idempotency is not None:
+            idempotency.update(status_code=201, response_body=json.dumps(body, ensure_ascii=False))
+        try:
+            parent_id = _insert_entries(parent_entry, entries, idempotency)
+        except RuntimeError:
+            # A concurrent request with the same key committed first; answer with its result.
+            replay = _idempotent_replay(idempotency) if idempotency is not None else None
+            if replay is None:
+                raise
+            return replay
+        if idempotency_key and idempotency is not None:
+            METRICS.inc("routine_idempotency_requests_total", {"result": "new"})
         _notify_slack_on_create(parent_id, parent_entry, entries)
-        return jsonify({"message": "逋ｻ骭ｲ縺励∪縺励◆", "task_count": len(entries)}), 201
+        return jsonify(body), 201
     @app.route("/api.py/parents", methods=["GET"])
     @app.route("/routine_app/api.py/parents", methods=["GET"])
     def parent_tasks_route():
         try:
-            filters = {
-                "title": request.args.get("title"),
-                "assignee": request.args.get("assignee"),
-                "registrant": request.args.get("registrant"),
-                "start_from": request.args.get("start_from"),
-                "end_to": request.args.get("end_to"),
-                "task_kind": request.args.get("task_kind"),
-            }
             page, page_size = _parse_pagination_params(request.args, DEFAULT_PAGE_SIZE)
-            parents, has_next = _fetch_parent_tasks(filters, page, page_size)
-            pagination = {
-                "page": page,
-                "page_size": page_size,
-                "has_prev": page > 1,
-                "has_next": has_next,
-            }
-            return jsonify({"parents": parents, "pagination": pagination})
+            return jsonify(_build_parents_payload(page, page_size, _parent_filters(request.args)))
         except RuntimeError as exc:
             app.logger.exception("Parent fetch failed")
             return jsonify({"message": str(exc)}), 500
@@ -1718,17 +3389,7 @@ def create_app():
     def get_routines_route():
         try:
             page, page_size = _parse_pagination_params(request.args, DEFAULT_PAGE_SIZE)
-            filters = {
-                "task_kind": request.args.get("task_kind"),
-                "year": request.args.get("year"),
-                "month": request.args.get("month"),
-                "assignee": request.args.get("assignee"),
-                "title": request.args.get("title"),
-                "task_no": request.args.get("task_no"),
-                "include_past_incomplete": request.args.get("include_past_incomplete", "1") != "0",
-                "include_completed": request.args.get("include_completed", "0") == "1",
-            }
-            return jsonify(_build_routines_payload(page, page_size, filters=filters))
+            return jsonify(_build_routines_payload(page, page_size, filters=_routine_filters(request.args)))
         except ValueError as exc:
             return jsonify({"message": str(exc)}), 400
         except RuntimeError as exc:
@@ -1745,7 +3406,7 @@ def create_app():
         except RuntimeError as exc:
             app.logger.exception("DB write error")
             return jsonify({"message": str(exc)}), 500
-        except pyodbc.Error:
+        except DB_ERRORS:
             app.logger.exception("DB write error")
             return jsonify({"message": "DB縺ｸ縺ｮ逋ｻ骭ｲ縺ｫ螟ｱ謨励＠縺ｾ縺励◆"}), 500
 
@@ -1777,13 +3438,167 @@ def create_app():
                 or user_context.get("department_cd")
                 or FALLBACK_DEPARTMENT_CD
             )
-            employees = _fetch_department_users(department_cd, only_employees=False)
-            employees_only = _fetch_department_users(department_cd, only_employees=True)
+            employees, employees_only = _fetch_department_directory(department_cd)
             return jsonify({"employees": employees, "employees_only": employees_only})
         except RuntimeError as exc:
             app.logger.exception("Employee fetch failed")
             return jsonify({"message": str(exc)}), 500
 
+    @app.route("/api.py/bootstrap", methods=["GET"])
+    @app.route("/routine_app/api.py/bootstrap", methods=["GET"])
+    def bootstrap_route():
+        requested = request.args.get("sections")
+        sections = set(requested.split(",")) if requested else set(BOOTSTRAP_SECTIONS)
+        try:
+            futures = {}
+            if "routines" in sections:
+                page, page_size = _parse_pagination_params(request.args, DEFAULT_PAGE_SIZE)
+                futures["routines"] = _submit_in_request_context(
+                    _build_routines_payload, page, page_size, _routine_filters(request.args)
+                )
+            if "parents" in sections:
+                page, page_size = _parse_pagination_params(
+                    {
+                        "page": request.args.get("parents_page", 1),
+                        "page_size": request.args.get("parents_page_size", DEFAULT_PAGE_SIZE),
+                    },
+                    DEFAULT_PAGE_SIZE,
+                )
+                futures["parents"] = _submit_in_request_context(
+                    _build_parents_payload, page, page_size, _parent_filters(request.args, "parents_")
+                )
+            payload = {}
+            department_cd = request.args.get("department")
+            if "current_user" in sections or ("employees" in sections and not department_cd):
+                # The department of the signed-in user decides which employees are listed.
+                user_context = _current_user_context()
+                if "current_user" in sections:
+                    payload["current_user"] = user_context
+                department_cd = department_cd or user_context.get("department_cd")
+            if "employees" in sections:
+                employees, employees_only = _fetch_department_directory(department_cd or FALLBACK_DEPARTMENT_CD)
+                payload["employees"] = {"employees": employees, "employees_only": employees_only}
+            for name, future in futures.items():
+                payload[name] = _request_context_result(future)
+            payload["features"] = {"events": EVENTS_ENABLED, "changes_poll_seconds": CHANGES_POLL_SECONDS}
+            return jsonify(payload)
+        except ValueError as exc:
+            return jsonify({"message": str(exc)}), 400
+        except RuntimeError as exc:
+            app.logger.exception("Bootstrap failed")
+            return jsonify({"message": str(exc)}), 500
+
+    @app.route("/api.py/changes", methods=["GET"])
+    @app.route("/routine_app/api.py/changes", methods=["GET"])
+    def changes_route():
+        try:
+            return jsonify(_fetch_changes(request.args.get("since")))
+        except ValueError as exc:
+            return jsonify({"message": str(exc)}), 400
+        except RuntimeError as exc:
+            app.logger.exception("Change feed failed")
+            return jsonify({"message": str(exc)}), 500
+
+    @app.route("/api.py/events", methods=["GET"])
+    @app.route("/routine_app/api.py/events", methods=["GET"])
+    def events_route():
+        if not EVENTS_ENABLED:
+            return jsonify({"message": "event stream disabled"}), 404
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        subscription = EVENTS.subscribe()
+        if subscription is None:
+            return jsonify({"message": "too many event streams"}), 503, {"Retry-After": "30"}
+        METRICS.add_gauge("routine_sse_clients", 1)
+        backlog = []
+        try:
+            if last_event_id and last_event_id.isdigit():
+                backlog = _fetch_change_events(int(last_event_id))
+        except RuntimeError:
+            app.logger.exception("Event backlog failed")
+
+        def frame(event_id, payload):
+            return f"id: {event_id}\nevent: change\ndata: {app.json.dumps(payload)}\n\n"
+
+        def generate():
+            sent = set()
+            deadline = time.monotonic() + EVENTS_MAX_STREAM_SECONDS
+            try:
+                yield f"retry: {int(EVENTS_POLL_SECONDS * 2000) + 1000}\n\n"
+                for event_id, payload in backlog:
+                    sent.add(event_id)
+                    yield frame(event_id, payload)
+                while time.monotonic() < deadline:
+                    event = subscription.get(EVENTS_HEARTBEAT_SECONDS)
+                    if event is None:
+                        yield ": heartbeat\n\n"
+                    elif event is RESYNC:
+                        yield "event: resync\ndata: {}\n\n"
+                    elif event[0] not in sent:
+                        yield frame(*event)
+            finally:
+                EVENTS.unsubscribe(subscription)
+                METRICS.add_gauge("routine_sse_clients", -1)
+
+        return app.response_class(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.route("/api.py/metrics", methods=["GET"])
+    @app.route("/routine_app/api.py/metrics", methods=["GET"])
+    def metrics_route():
+        # Series carry endpoint names, pids and error rates; never serve them anonymously.
+        if METRICS_TOKEN:
+            if request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+                return jsonify({"message": "unauthorized"}), 401
+        elif not _is_admin():
+            return jsonify({"message": "forbidden"}), 403
+        return app.response_class(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/api.py/admin/slow-queries", methods=["GET"])
+    @app.route("/routine_app/api.py/admin/slow-queries", methods=["GET"])
+    def slow_queries_route():
+        if not _is_admin():
+            return jsonify({"message": "forbidden"}), 403
+        try:
+            limit = max(1, min(int(request.args.get("limit", 20)), 200))
+        except (TypeError, ValueError):
+            limit = 20
+        return jsonify(
+            {
+                "threshold_ms": SLOW_QUERIES.threshold_ms,
+                "fingerprints": SLOW_QUERIES.top_fingerprints(limit),
+            }
+        )
+
+    @app.route("/api.py/admin/query-shapes", methods=["GET"])
+    @app.route("/routine_app/api.py/admin/query-shapes", methods=["GET"])
+    def query_shapes_route():
+        if not _is_admin():
+            return jsonify({"message": "forbidden"}), 403
+        shapes = QUERY_SHAPES.shapes(request.args.get("name") or None)
+        if request.args.get("sql") != "1":
+            shapes = [{key: value for key, value in shape.items() if key != "sql"} for shape in shapes]
+        return jsonify({"pid": os.getpid(), "count": len(shapes), "shapes": shapes})
+
+    @app.route("/api.py/admin/profiles", methods=["GET"])
+    @app.route("/routine_app/api.py/admin/profiles", methods=["GET"])
+    def profiles_route():
+        if not _is_admin():
+            return jsonify({"message": "forbidden"}), 403
+        try:
+            limit = max(1, min(int(request.args.get("limit", 20)), 200))
+        except (TypeError, ValueError):
+            limit = 20
+        return jsonify(
+            {
+                "directory": PROFILER.directory,
+                "sample_rate": PROFILER.sample_rate,
+                "profiles": PROFILER.recent(limit),
+            }
+        )
+
     @app.errorhandler(404)
     def not_found(e):
         return (
@@ -1804,11 +3619,17 @@ def create_app():
     @app.route("/routine_app/")
     @app.route("/routine_app/index.html")
     def serve_index():
-        response = send_from_directory(base_dir, "index.html")
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        return response
+        asset = compression.load_static_asset(str(base_dir / "index.html"))
+        encoding, body = asset.select(request.accept_encodings)
+        response = app.response_class(body, mimetype="text/html")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.set_etag(f"{asset.etag}-{encoding}")
+        # Cached copies must be revalidated; an unchanged file costs a 304.
+        response.headers["Cache-Control"] = "no-cache"
+        g.uncompressed_bytes = len(asset.variants["identity"])
+        return response.make_conditional(request)
 
     return app
 
@@ -0,0 +1,162 @@
+"""Non-blocking structured logging for the routine API.
+
+Request threads only put records on a bounded in-memory queue; a single listener
+thread formats them as JSON lines and writes them to stderr (captured by wfastcgi)
+and, optionally, a rotating file. When the queue is full the record is dropped
+instead of blocking the request. ``route_to_file`` sends one logger's records to a
+file of their own through the same queue and thread.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+LOG_LEVEL = os.environ.get("ROUTINE_LOG_LEVEL", "INFO").strip().upper() or "INFO"
+LOG_FORMAT = os.environ.get("ROUTINE_LOG_FORMAT", "json").strip().lower()
+LOG_FILE = os.environ.get("ROUTINE_LOG_FILE", "").strip()
+LOG_QUEUE_SIZE = int(os.environ.get("ROUTINE_LOG_QUEUE_SIZE", "10000"))
+DEBUG_SAMPLE_RATE = float(os.environ.get("ROUTINE_LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+_LISTENER = None
+_DROPPED = {"count": 0}
+_ROUTED_LOGGERS = set()
+
+
+def sampled(rate=None):
+    """``extra`` for chatty call sites: keep roughly ``rate`` of the records."""
+    return {"sample_rate": DEBUG_SAMPLE_RATE if rate is None else rate}
+
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        if has_request_context():
+            # The environ copy also reaches bootstrap pool threads, whose g is their own.
+            record.request_id = g.get("request_id") or request.environ.get("routine.request_id")
+            record.path = request.path
+        else:
+            record.request_id = None
+            record.path = None
+        return True
+
+
+class _RoutedFilter(logging.Filter):
+    """Keeps the records of routed loggers out of the shared handlers."""
+
+    def filter(self, record):
+        return record.name not in _ROUTED_LOGGERS
+
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        return rate is None or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+            payload["path"] = getattr(record, "path", None)
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only resolve what cannot cross threads (args, tracebacks); formatting to
+        # JSON happens on the listener thread.
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        prepared = logging.makeLogRecord(record.__dict__)
+        prepared.msg = message
+        prepared.args = None
+        prepared.exc_info = None
+        prepared.exc_text = exc_text
+        return prepared
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DROPPED["count"] += 1
+
+
+def dropped_records():
+    return _DROPPED["count"]
+
+
+def configure_logging():
+    global _LISTENER
+    if _LISTENER is not None:
+        return _LISTENER
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+    )
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if LOG_FILE:
+        os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
+        handlers.append(
+            logging.handlers.RotatingFileHandler(
+                LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"
+            )
+        )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(_RoutedFilter())
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+    _LISTENER = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _LISTENER.start()
+    atexit.register(_LISTENER.stop)
+    return _LISTENER
+
+
+def route_to_file(logger_name, path, max_bytes, backup_count):
+    """Write the INFO and higher records of ``logger_name`` to ``path`` only, unformatted.
+
+    The file is rotated by the listener thread, so request threads never touch it.
+    Returns the handler, or None when the file cannot be opened.
+    """
+    listener = configure_logging()
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+    except OSError:
+        return None
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.addFilter(lambda record: record.name == logger_name)
+    _ROUTED_LOGGERS.add(logger_name)
+    # The listener thread reads the tuple on every record; swapping it is atomic.
+    listener.handlers = listener.handlers + (handler,)
+    logging.getLogger(logger_name).setLevel(logging.INFO)
+    return handler
@@ -0,0 +1,149 @@
+"""Move long-completed routines out of the hot tables.
+
+Completed rows (``is_deleted = 1``) whose ``deleted_at`` is older than the
+retention window are copied to ``routine_task_child_archive`` /
+``routine_task_archive`` and deleted from the hot tables, one batch per
+transaction. A parent moves only once none of its children are left in
+``routine_task_child``. Every batch commits on its own, so an interrupted run
+loses nothing and the next run simply continues with the rows still eligible.
+
+Usage:
+    python archive.py [--months 12] [--batch-size 500] [--pause 0.2] [--dry-run]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime, timezone
+
+import storage
+from storage import DB_ERRORS
+
+LOGGER = logging.getLogger("routine_app.archive")
+MAX_BATCH_SIZE = 1000  # keeps the IN (...) list well under SQL Server's 2100 parameters
+# Hot-only columns: ROWVERSION cannot be inserted, and only the change feed reads it.
+HOT_ONLY_COLUMNS = {"row_version"}
+
+_CHILD_ELIGIBLE_SQL = """
+    FROM dbo.routine_task_child
+    WHERE is_deleted = 1
+      AND deleted_at < ?
+"""
+_PARENT_ELIGIBLE_SQL = """
+    FROM dbo.routine_task p
+    WHERE p.is_deleted = 1
+      AND p.deleted_at < ?
+      AND NOT EXISTS (SELECT 1 FROM dbo.routine_task_child c WHERE c.task_no = p.task_no)
+"""
+
+
+def archive_cutoff(months, now=None):
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    month_index = now.year * 12 + (now.month - 1) - months
+    year, month = divmod(month_index, 12)
+    return now.replace(year=year, month=month + 1, day=min(now.day, 28))
+
+
+def _table_columns(cursor, table):
+    cursor.execute(f"SELECT * FROM dbo.{table} WHERE 1 = 0")
+    return [column[0] for column in cursor.description]
+
+
+def _archive_columns(cursor, table):
+    """Columns to copy: those of the hot table, which the archive must all have."""
+    hot_columns = [column for column in _table_columns(cursor, table) if column.lower() not in HOT_ONLY_COLUMNS]
+    archive_columns = {column.lower() for column in _table_columns(cursor, f"{table}_archive")}
+    missing = [column for column in hot_columns if column.lower() not in archive_columns]
+    if missing:
+        # Copying the rest would silently drop these values on the move.
+        raise RuntimeError(
+            f"dbo.{table}_archive lacks {', '.join(missing)}; add the columns (see routine_tasks.sql) and rerun"
+        )
+    return hot_columns
+
+
+def _move_batch(conn, table, key, eligible_sql, cutoff, batch_size):
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT {key} {eligible_sql} ORDER BY {key} OFFSET ? ROWS FETCH NEXT ? ROWS ONLY",
+        [cutoff, 0, batch_size],
+    )
+    keys = [row[0] for row in cursor.fetchall()]
+    if not keys:
+        return 0
+    columns_sql = ", ".join(f"[{column}]" for column in _archive_columns(cursor, table))
+    placeholders = ", ".join("?" for _ in keys)
+    cursor.execute(
+        f"""
+        INSERT INTO dbo.{table}_archive ({columns_sql}, archived_at)
+        SELECT {columns_sql}, SYSUTCDATETIME()
+        FROM dbo.{table}
+        WHERE {key} IN ({placeholders})
+        """,
+        keys,
+    )
+    cursor.execute(f"DELETE FROM dbo.{table} WHERE {key} IN ({placeholders})", keys)
+    conn.commit()
+    return len(keys)
+
+
+def count_eligible(cutoff):
+    with storage.connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) {_CHILD_ELIGIBLE_SQL}", [cutoff])
+        children = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COUNT(*) {_PARENT_ELIGIBLE_SQL}", [cutoff])
+        parents = cursor.fetchone()[0]
+    return {"children": children, "parents": parents}
+
+
+def run_archive(months=12, batch_size=500, pause=0.2, max_batches=None):
+    """Archive in batches until nothing is eligible; returns the moved row counts."""
+    cutoff = archive_cutoff(months)
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    moved = {"children": 0, "parents": 0}
+    batches = 0
+    # Children first: parents only become eligible once their children are gone.
+    for label, table, key, eligible_sql in (
+        ("children", "routine_task_child", "record_no", _CHILD_ELIGIBLE_SQL),
+        ("parents", "routine_task", "task_no", _PARENT_ELIGIBLE_SQL),
+    ):
+        while max_batches is None or batches < max_batches:
+            with storage.connect() as conn:
+                count = _move_batch(conn, table, key, eligible_sql, cutoff, batch_size)
+            if not count:
+                break
+            batches += 1
+            moved[label] += count
+            LOGGER.info("archived %s %s (total %s)", count, label, moved[label])
+            if pause:
+                time.sleep(pause)
+    return moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=12, help="archive rows completed more than this many months ago")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.2, help="seconds to sleep between batches")
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="only count the eligible rows")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        if args.dry_run:
+            print(count_eligible(archive_cutoff(args.months)))
+        else:
+            print(run_archive(args.months, args.batch_size, args.pause, args.max_batches))
+    except DB_ERRORS as exc:
+        LOGGER.error("archive stopped: %s; rerun to continue", exc)
+        return 1
+    except RuntimeError as exc:
+        LOGGER.error("archive not started: %s", exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Circuit breaker and last-known-good snapshots for a slow or failing dependency.
+
+``CircuitBreaker`` opens after ``failure_threshold`` consecutive failures. While
+open, ``allow`` returns False at once, so callers skip the dependency instead of
+waiting for its timeout. After ``reset_timeout`` seconds, one caller is let through
+as a half-open probe. Its success closes the breaker, and its failure opens it
+again. ``SnapshotStore`` keeps the last good result per key, so callers can serve
+it, along with its age, while the breaker is open.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, on_change=None, clock=time.monotonic):
+        # on_change(old_state, new_state) runs under the breaker's lock; keep it cheap.
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._on_change = on_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+
+    @property
+    def state(self):
+        return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            now = self._clock()
+            if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+                self._probe_started = now
+                return True
+            # A probe that never reported back (the caller died) must not pin the breaker.
+            if self._state == HALF_OPEN and now - self._probe_started >= self.reset_timeout:
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                if self._state != OPEN:
+                    self._transition(OPEN)
+
+    def _transition(self, state):
+        previous, self._state = self._state, state
+        if self._on_change is not None:
+            self._on_change(previous, state)
+
+
+class SnapshotStore:
+    def __init__(self, max_entries=5000, clock=time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return ``(value, age_seconds)`` for the last good value, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        return value, max(0.0, self._clock() - stored_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,102 @@
+"""Response compression and cacheable static delivery.
+
+``python compression.py index.html`` writes ``index.html.gz`` (and ``index.html.br``
+when the ``brotli`` package is installed) next to the source at deploy time.
+``load_static_asset`` serves a variant only when it decompresses to the current
+source, so a stale file is never served (mtimes survive copies and checkouts), and
+otherwise gzips once in memory. JSON responses of ``COMPRESS_MIN_BYTES``
+or more are gzipped on the fly when the client accepts it.
+"""
+
+import gzip
+import hashlib
+import os
+import sys
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("ROUTINE_COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.environ.get("ROUTINE_COMPRESS_LEVEL", "6"))
+COMPRESSIBLE_MIMETYPES = frozenset({"application/json", "text/plain"})
+# Preference order when the client accepts several.
+_VARIANT_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+_DECOMPRESSORS = {"gzip": gzip.decompress, "br": brotli.decompress if brotli is not None else None}
+# gzip.BadGzipFile is an OSError; a truncated stream raises EOFError.
+_DECOMPRESS_ERRORS = (OSError, EOFError, zlib.error) + ((brotli.error,) if brotli is not None else ())
+_ASSETS = {}
+
+
+class StaticAsset:
+    def __init__(self, key, etag, variants):
+        self.key = key
+        self.etag = etag
+        self.variants = variants
+
+    def select(self, accept_encodings):
+        for encoding, _ in _VARIANT_SUFFIXES:
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding, self.variants[encoding]
+        return "identity", self.variants["identity"]
+
+
+def gzip_body(data, level=None):
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL if level is None else level, mtime=0)
+
+
+def load_static_asset(path):
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _ASSETS.get(path)
+    if cached is not None and cached.key == key:
+        return cached
+    with open(path, "rb") as handle:
+        body = handle.read()
+    variants = {"identity": body}
+    for encoding, suffix in _VARIANT_SUFFIXES:
+        decompress = _DECOMPRESSORS[encoding]
+        if decompress is None:
+            continue
+        try:
+            with open(path + suffix, "rb") as handle:
+                data = handle.read()
+            # Checked once per source change; a variant left over from an older deploy
+            # would otherwise be served under the new ETag.
+            if decompress(data) != body:
+                continue
+        except _DECOMPRESS_ERRORS:
+            continue
+        variants[encoding] = data
+    if "gzip" not in variants:
+        variants["gzip"] = gzip_body(body, 9)
+    asset = StaticAsset(key, hashlib.sha256(body).hexdigest()[:20], variants)
+    _ASSETS[path] = asset
+    return asset
+
+
+def precompress(path):
+    with open(path, "rb") as handle:
+        body = handle.read()
+    written = []
+    with open(path + ".gz", "wb") as handle:
+        handle.write(gzip_body(body, 9))
+    written.append(path + ".gz")
+    if brotli is not None:
+        with open(path + ".br", "wb") as handle:
+            handle.write(brotli.compress(body, quality=11))
+        written.append(path + ".br")
+    return written
+
+
+def main(paths):
+    for path in paths:
+        source_size = os.path.getsize(path)
+        for variant in precompress(path):
+            print(f"{variant}: {source_size} -> {os.path.getsize(variant)} bytes")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or [os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.html")])
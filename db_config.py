@@ -13,6 +13,13 @@ DB_DATABASE = "routine"
 DB_USER = "bi"
 DB_PASSWORD = "bi"
 TRUST_SERVER_CERTIFICATE = True
+# "sqlserver" (default) or "sqlite" for the embedded offline backend (see storage.py).
+DB_BACKEND = os.environ.get("ROUTINE_DB_BACKEND", "sqlserver").strip().lower()
+SQLITE_PATH = os.environ.get(
+    "ROUTINE_SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "routine_local.sqlite3")
+)
+# Optional read replica for GET helpers (see docs/read_replica.md). Empty means none.
+SQLITE_READ_PATH = os.environ.get("ROUTINE_SQLITE_READ_PATH", "").strip()
 
 
 def get_connection_string():
@@ -33,3 +40,19 @@ def get_connection_string():
         f"Pwd={DB_PASSWORD};"
         f"TrustServerCertificate={trust_flag};"
     )
+
+
+def get_read_connection_string():
+    """Connection string for read-only traffic, or None when no replica is configured.
+
+    ``ROUTINE_DB_READ_CONN`` names a separate server. ``ROUTINE_DB_READ_INTENT=1``
+    keeps the primary's string and adds ``ApplicationIntent=ReadOnly``, which an
+    Availability Group listener routes to a readable secondary.
+    """
+    env_conn = os.environ.get("ROUTINE_DB_READ_CONN", "").strip()
+    if env_conn:
+        return env_conn
+    if os.environ.get("ROUTINE_DB_READ_INTENT", "0") == "1":
+        base = get_connection_string().rstrip(";")
+        return f"{base};ApplicationIntent=ReadOnly;"
+    return None
@@ -0,0 +1,116 @@
+"""In-process fan-out of routine change events to Server-Sent Events streams.
+
+Write helpers append rows to the change table inside their own transaction. One
+poller thread per process tails that table and hands new events to every open
+stream in the process, so a change made by any worker process reaches every tab.
+``wake`` makes the poller run at once, which is used right after a local commit.
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# Put on a subscriber's queue when it fell behind and lost events.
+RESYNC = object()
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        if self.overflowed:
+            self.overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return RESYNC
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeEventBus:
+    def __init__(self, fetch, interval=1.0, max_clients=20, queue_size=1000, remember=5000):
+        # fetch(after_id) -> [(event_id, payload), ...] in event_id order; it may return
+        # ids it returned before (it re-reads a short window), which are dropped here.
+        self._fetch = fetch
+        self.interval = interval
+        self.max_clients = max_clients
+        self._queue_size = queue_size
+        self._remember = remember
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._seen = OrderedDict()
+        self._last_id = None
+        self._floor = 0
+        self._thread = None
+        self.errors = 0
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            subscription = Subscription(self._queue_size)
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="change-event-poller", daemon=True)
+                self._thread.start()
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def wake(self):
+        self._wake.set()
+
+    def publish(self, event_id, payload):
+        # A None payload only moves the read position (the first poll of a process).
+        if event_id in self._seen:
+            return
+        self._seen[event_id] = None
+        while len(self._seen) > self._remember:
+            self._seen.popitem(last=False)
+        if self._last_id is None or event_id > self._last_id:
+            self._last_id = event_id
+        if payload is None:
+            self._floor = event_id
+            return
+        if event_id <= self._floor:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer((event_id, payload))
+
+    def poll_once(self):
+        for event_id, payload in self._fetch(self._last_id):
+            self.publish(event_id, payload)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.poll_once()
+            except Exception:  # noqa: BLE001 - keep polling through DB hiccups
+                self.errors += 1
+                time.sleep(self.interval)
+            self._wake.wait(self.interval)
+            self._wake.clear()
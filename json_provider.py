@@ -0,0 +1,97 @@
+"""Flask JSON provider backed by orjson when it is installed.
+
+``date``/``datetime`` values are written as ISO 8601 strings (Flask's default
+provider writes HTTP dates), so row mappers can hand them to ``jsonify`` as they
+come from the driver. ``Decimal`` is written as a number. Output is compact unless
+``compact`` is False, the app runs in debug mode or the request has ``?pretty=1``.
+``stream`` encodes a large list one item at a time instead of building one string.
+"""
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+
+from flask import has_request_context, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RoutineJSONProvider(DefaultJSONProvider):
+    def backend(self):
+        return "orjson" if orjson is not None else "json"
+
+    def _pretty(self):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return True
+        return has_request_context() and request.args.get("pretty") == "1"
+
+    def encode(self, obj, pretty=False):
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if pretty:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_default, option=option)
+        layout = {"indent": 2} if pretty else {"separators": (",", ":")}
+        return json.dumps(
+            obj, default=_default, ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys, **layout
+        ).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            return self.encode(obj).decode("utf-8")
+        kwargs.setdefault("default", _default)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj, self._pretty()) + b"\n", mimetype=self.mimetype)
+
+    def stream(self, key, items, **envelope):
+        """Stream ``{key: [items...], **envelope}`` without holding the whole body."""
+
+        def generate():
+            chunk = [b"{", self.encode(key), b":["]
+            size = 0
+            for index, item in enumerate(items):
+                encoded = self.encode(item)
+                chunk.append(b"," + encoded if index else encoded)
+                size += len(encoded)
+                if size >= STREAM_CHUNK_BYTES:
+                    yield b"".join(chunk)
+                    chunk, size = [], 0
+            chunk.append(b"]")
+            for name, value in envelope.items():
+                chunk.append(b"," + self.encode(name) + b":" + self.encode(value))
+            chunk.append(b"}\n")
+            yield b"".join(chunk)
+
+        return self._app.response_class(stream_with_context(generate()), mimetype=self.mimetype)
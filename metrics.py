@@ -0,0 +1,420 @@
+"""Prometheus text-format metrics shared across FastCGI worker processes.
+
+Each process appends its samples to its own memory-mapped file in the metrics
+directory, so writers never contend across processes. A scrape reads every file in
+the directory and sums counters and histogram buckets; gauges are reported per pid.
+
+A process holds a lock on ``metrics_<pid>.lock`` for as long as it lives. A scrape
+that can take the lock of a file knows its process is gone: it folds the file's
+counters and histograms into ``metrics_folded.db``, drops its gauges and deletes it,
+so the directory stays small and the sums never go down.
+"""
+
+import glob
+import json
+import math
+import mmap
+import os
+import random
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_INITIAL_FILE_SIZE = 64 * 1024
+_HEADER = struct.Struct("<I4x")
+_KEY_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+_FOLDED_NAME = "metrics_folded"
+# Bookkeeping entries, never rendered: which file this is, and which files were folded.
+_INSTANCE_KEY = json.dumps(["__instance__", []])
+_FOLDED_MARKER = "__folded__"
+
+
+def _padded(length):
+    return length + (8 - (_KEY_LENGTH.size + length) % 8) % 8
+
+
+class _MmapValues:
+    """Append-only key/float64 store laid out as [used][len|key|pad|value]..."""
+
+    def __init__(self, path):
+        self._path = path
+        exists = os.path.exists(path)
+        self._file = open(path, "r+b" if exists else "w+b")
+        if not exists or os.path.getsize(path) < _HEADER.size:
+            self._file.truncate(_INITIAL_FILE_SIZE)
+        self._capacity = os.path.getsize(path)
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        self._offsets = {key: offset for key, _, offset in _read_entries(self._map, self._used)}
+
+    def _grow(self, needed):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self._map.close()
+        self._file.truncate(capacity)
+        self._capacity = capacity
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+
+    def _offset(self, key):
+        offset = self._offsets.get(key)
+        if offset is not None:
+            return offset
+        encoded = key.encode("utf-8")
+        entry_size = _KEY_LENGTH.size + _padded(len(encoded)) + _VALUE.size
+        if self._used + entry_size > self._capacity:
+            self._grow(self._used + entry_size)
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + _KEY_LENGTH.size:self._used + _KEY_LENGTH.size + len(encoded)] = encoded
+        offset = self._used + _KEY_LENGTH.size + _padded(len(encoded))
+        _VALUE.pack_into(self._map, offset, 0.0)
+        self._used += entry_size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._offsets[key] = offset
+        return offset
+
+    def add(self, key, amount):
+        offset = self._offset(key)
+        _VALUE.pack_into(self._map, offset, _VALUE.unpack_from(self._map, offset)[0] + amount)
+
+    def set(self, key, value):
+        _VALUE.pack_into(self._map, self._offset(key), value)
+
+
+class _MemoryValues:
+    def __init__(self):
+        self.values = {}
+
+    def add(self, key, amount):
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def _read_entries(buffer, used):
+    position = _HEADER.size
+    while position + _KEY_LENGTH.size <= used:
+        length = _KEY_LENGTH.unpack_from(buffer, position)[0]
+        key_start = position + _KEY_LENGTH.size
+        offset = key_start + _padded(length)
+        if offset + _VALUE.size > used:
+            break
+        key = bytes(buffer[key_start:key_start + length]).decode("utf-8")
+        yield key, _VALUE.unpack_from(buffer, offset)[0], offset
+        position = offset + _VALUE.size
+
+
+def _read_file(path):
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except OSError:
+        return []
+    if len(data) < _HEADER.size:
+        return []
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    return [(key, value) for key, value, _ in _read_entries(data, used)]
+
+
+def _write_file(path, entries):
+    """Replace ``path`` with the given (key, value) entries in the _MmapValues layout."""
+    chunks = []
+    for key, value in entries:
+        encoded = key.encode("utf-8")
+        chunks.append(_KEY_LENGTH.pack(len(encoded)) + encoded.ljust(_padded(len(encoded)), b"\0") + _VALUE.pack(value))
+    body = b"".join(chunks)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(_HEADER.pack(_HEADER.size + len(body)) + body)
+    try:
+        os.replace(temporary, path)
+    except OSError:
+        os.remove(temporary)
+        raise
+
+
+def _lock(handle, blocking):
+    try:
+        if msvcrt is not None:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        elif fcntl is not None:
+            # lockf locks belong to the process and are not inherited across fork.
+            fcntl.lockf(handle.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except OSError:
+        return False
+    return True
+
+
+def _open_locked(path, blocking):
+    """Open and lock ``path``; None when another process holds the lock."""
+    while True:
+        try:
+            handle = open(path, "a+b")
+        except OSError:
+            return None
+        if not _lock(handle, blocking):
+            handle.close()
+            return None
+        try:
+            current = os.path.samestat(os.fstat(handle.fileno()), os.stat(path))
+        except OSError:
+            current = False
+        if current:
+            return handle
+        # Deleted by a scrape while this process waited for it; lock the new file.
+        handle.close()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _read_instance(path):
+    return dict(_read_file(path)).get(_INSTANCE_KEY)
+
+
+def _marker_instance(key):
+    return float(dict(json.loads(key)[1])["instance"])
+
+
+def _sample_key(name, labels):
+    return json.dumps([name, sorted((labels or {}).items())], ensure_ascii=False)
+
+
+def _format_labels(items):
+    if not items:
+        return ""
+    escaped = []
+    for key, value in items:
+        text = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{key}="{text}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class MetricsRegistry:
+    def __init__(self, directory=None):
+        self._lock = threading.Lock()
+        self._metadata = {}
+        self._directory = directory
+        self._pid = None
+        self._values = None
+        self._pid_lock = None
+        # lockf and msvcrt locks do not exclude threads of one process; this does.
+        self._fold_lock = threading.RLock()
+
+    def _path(self, name, suffix=".db"):
+        return os.path.join(self._directory, name + suffix)
+
+    def _store(self):
+        pid = os.getpid()
+        if self._values is not None and self._pid == pid:
+            return self._values
+        self._pid = pid
+        self._values = _MemoryValues()
+        if self._directory:
+            try:
+                os.makedirs(self._directory, exist_ok=True)
+                self._pid_lock = _open_locked(self._path(f"metrics_{pid}", ".lock"), blocking=True)
+                if self._pid_lock is None:
+                    return self._values
+                path = self._path(f"metrics_{pid}")
+                if os.path.exists(path):
+                    # Left by an earlier process with the same pid: keep its counters, not its values.
+                    self._fold(path)
+                    _remove(path)
+                self._values = _MmapValues(path)
+                self._values.set(_INSTANCE_KEY, float(random.getrandbits(48)))
+            except OSError:
+                self._values = _MemoryValues()
+        return self._values
+
+    def _metadata_for(self, name):
+        """(base name, metadata) of a sample name, resolving histogram suffixes."""
+        for suffix in ("_bucket", "_sum", "_count"):
+            if name.endswith(suffix) and name[: -len(suffix)] in self._metadata:
+                return name[: -len(suffix)], self._metadata[name[: -len(suffix)]]
+        return name, self._metadata.get(name)
+
+    def _fold(self, path):
+        """Add the counters and histograms of a dead process's file to the folded file.
+
+        The caller holds the file's pid lock. Returns False when the folded file could
+        not be replaced (for example while a scrape on Windows has it open).
+        """
+        entries = dict(_read_file(path))
+        instance = entries.pop(_INSTANCE_KEY, None)
+        with self._fold_lock:
+            folded_lock = _open_locked(self._path(_FOLDED_NAME, ".lock"), blocking=True)
+            if folded_lock is None:
+                return False
+            try:
+                folded = dict(_read_file(self._path(_FOLDED_NAME)))
+                marker = None if instance is None else _sample_key(_FOLDED_MARKER, {"instance": _format_value(instance)})
+                if marker not in folded:
+                    for key, value in entries.items():
+                        metadata = self._metadata_for(json.loads(key)[0])[1]
+                        if metadata is None or metadata["kind"] != "gauge":
+                            folded[key] = folded.get(key, 0.0) + value
+                    if marker is not None:
+                        folded[marker] = 1.0
+                # A marker only matters while its file can still be read.
+                live = {_read_instance(other) for other in glob.glob(self._path("metrics_*"))}
+                folded = {
+                    key: value
+                    for key, value in folded.items()
+                    if json.loads(key)[0] != _FOLDED_MARKER or key == marker or _marker_instance(key) in live
+                }
+                _write_file(self._path(_FOLDED_NAME), list(folded.items()))
+                return True
+            except OSError:
+                return False
+            finally:
+                folded_lock.close()
+
+    def _fold_if_dead(self, pid, path):
+        """Fold and delete the file of ``pid`` if its process is gone; True when it is gone."""
+        lock_path = self._path(f"metrics_{pid}", ".lock")
+        with self._fold_lock:
+            pid_lock = _open_locked(lock_path, blocking=False)
+            if pid_lock is None:
+                return False
+            try:
+                if self._fold(path):
+                    _remove(path)
+            finally:
+                pid_lock.close()
+                _remove(lock_path)
+            return True
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._metadata[name] = {
+            "kind": kind,
+            "help": help_text,
+            "buckets": tuple(buckets or DEFAULT_BUCKETS) if kind == "histogram" else None,
+        }
+
+    def inc(self, name, labels=None, amount=1.0):
+        with self._lock:
+            self._store().add(_sample_key(name, labels), amount)
+
+    def set_gauge(self, name, value, labels=None):
+        with self._lock:
+            self._store().set(_sample_key(name, labels), value)
+
+    def add_gauge(self, name, amount, labels=None):
+        self.inc(name, labels, amount)
+
+    def observe(self, name, value, labels=None):
+        buckets = self._metadata[name]["buckets"]
+        index = len(buckets)
+        for position, bound in enumerate(buckets):
+            if value <= bound:
+                index = position
+                break
+        bucket_labels = dict(labels or {})
+        bucket_labels["le"] = _format_value(buckets[index]) if index < len(buckets) else "+Inf"
+        with self._lock:
+            store = self._store()
+            store.add(_sample_key(f"{name}_bucket", bucket_labels), 1.0)
+            store.add(_sample_key(f"{name}_sum", labels), value)
+            store.add(_sample_key(f"{name}_count", labels), 1.0)
+
+    def _collect(self):
+        """(pid, entries, alive) per file; entries of folded files come from the folded file."""
+        with self._lock:
+            store = self._store()
+            if isinstance(store, _MemoryValues):
+                return [(str(self._pid), list(store.values.items()), True)]
+        per_process = []
+        for path in glob.glob(self._path("metrics_*")):
+            pid = os.path.basename(path)[len("metrics_"):-len(".db")]
+            if pid == _FOLDED_NAME[len("metrics_"):]:
+                continue
+            alive = pid == str(self._pid) or not self._fold_if_dead(pid, path)
+            if alive or os.path.exists(path):
+                per_process.append((pid, _read_file(path), alive))
+        # Read after the process files: a file folded in between is counted only once.
+        folded = _read_file(self._path(_FOLDED_NAME))
+        folded_instances = {_marker_instance(key) for key, _ in folded if json.loads(key)[0] == _FOLDED_MARKER}
+        per_process = [
+            (pid, entries, alive)
+            for pid, entries, alive in per_process
+            if dict(entries).get(_INSTANCE_KEY) not in folded_instances
+        ]
+        per_process.append((_FOLDED_NAME, folded, False))
+        return per_process
+
+    def render(self):
+        samples = {}
+        for pid, entries, alive in self._collect():
+            for key, value in entries:
+                name, label_items = json.loads(key)
+                base, metadata = self._metadata_for(name)
+                if metadata is None:
+                    continue
+                label_items = [tuple(item) for item in label_items]
+                if metadata["kind"] == "gauge":
+                    if not alive:
+                        continue
+                    label_items.append(("pid", pid))
+                sample = (name, tuple(label_items))
+                samples.setdefault(base, {})
+                samples[base][sample] = samples[base].get(sample, 0.0) + value
+        lines = []
+        for base in sorted(samples):
+            metadata = self._metadata[base]
+            lines.append(f"# HELP {base} {metadata['help']}")
+            lines.append(f"# TYPE {base} {metadata['kind']}")
+            if metadata["kind"] == "histogram":
+                lines.extend(self._render_histogram(base, metadata["buckets"], samples[base]))
+                continue
+            for (name, label_items), value in sorted(samples[base].items()):
+                lines.append(f"{name}{_format_labels(label_items)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _render_histogram(self, base, buckets, samples):
+        series = {}
+        for (name, label_items), value in samples.items():
+            labels = tuple(item for item in label_items if item[0] != "le")
+            entry = series.setdefault(labels, {"buckets": {}, "sum": 0.0, "count": 0.0})
+            if name.endswith("_bucket"):
+                le = dict(label_items)["le"]
+                entry["buckets"][le] = entry["buckets"].get(le, 0.0) + value
+            elif name.endswith("_sum"):
+                entry["sum"] += value
+            else:
+                entry["count"] += value
+        lines = []
+        bounds = [_format_value(bound) for bound in buckets] + ["+Inf"]
+        for labels in sorted(series):
+            entry = series[labels]
+            cumulative = 0.0
+            for bound in bounds:
+                cumulative += entry["buckets"].get(bound, 0.0)
+                lines.append(f"{base}_bucket{_format_labels(list(labels) + [('le', bound)])} {_format_value(cumulative)}")
+            lines.append(f"{base}_sum{_format_labels(labels)} {_format_value(entry['sum'])}")
+            lines.append(f"{base}_count{_format_labels(labels)} {_format_value(entry['count'])}")
+        return lines
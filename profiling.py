@@ -0,0 +1,123 @@
+"""Opt-in per-request profiling.
+
+A profiled request runs under ``cProfile`` (written as ``.pstats``) while a
+sampler thread records the request thread's stack every few milliseconds (written
+as collapsed stacks, one ``frame;frame;frame count`` line per stack, ready for
+flamegraph.pl or speedscope). Only one request is profiled at a time, and the
+directory keeps the newest ``keep`` profiles.
+"""
+
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self.stacks = {}
+
+    def run(self):
+        while not self._stop_event.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                key = ";".join(reversed(names))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileSession:
+    def __init__(self, profiler, interval):
+        self._profiler = profiler
+        self._started = time.perf_counter()
+        self._profile = cProfile.Profile()
+        self._sampler = _Sampler(threading.get_ident(), interval)
+        self._sampler.start()
+        self._profile.enable()
+
+    def stop(self, metadata):
+        self._profile.disable()
+        self._sampler.stop()
+        duration_ms = (time.perf_counter() - self._started) * 1000
+        try:
+            return self._profiler.save(self._profile, self._sampler.stacks, duration_ms, metadata)
+        finally:
+            self._profiler.release()
+
+
+class RequestProfiler:
+    def __init__(self, directory, keep=50, sample_rate=0.0, interval=0.005):
+        self.directory = directory
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            return ProfileSession(self, self.interval)
+        except Exception:
+            self._busy.release()
+            raise
+
+    def release(self):
+        self._busy.release()
+
+    def save(self, profile, stacks, duration_ms, metadata):
+        os.makedirs(self.directory, exist_ok=True)
+        name = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f") + f"_{os.getpid()}"
+        base = os.path.join(self.directory, name)
+        profile.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w", encoding="utf-8") as handle:
+            for stack, count in sorted(stacks.items()):
+                handle.write(f"{stack} {count}\n")
+        info = {"name": name, "duration_ms": round(duration_ms, 1), "samples": sum(stacks.values()), **metadata}
+        with open(base + ".json", "w", encoding="utf-8") as handle:
+            json.dump(info, handle, ensure_ascii=False)
+        self._prune()
+        return info
+
+    def _prune(self):
+        names = sorted({entry.rsplit(".", 1)[0] for entry in os.listdir(self.directory) if entry.endswith(".json")})
+        for stale in names[: max(0, len(names) - self.keep)]:
+            for suffix in (".json", ".pstats", ".collapsed"):
+                try:
+                    os.remove(os.path.join(self.directory, stale + suffix))
+                except OSError:
+                    pass
+
+    def recent(self, limit=20):
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(
+            (entry for entry in os.listdir(self.directory) if entry.endswith(".json")), reverse=True
+        )[:limit]
+        profiles = []
+        for entry in names:
+            try:
+                with open(os.path.join(self.directory, entry), encoding="utf-8") as handle:
+                    profiles.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+        return profiles
@@ -0,0 +1,79 @@
+"""Canonical, memoized SQL text per query shape.
+
+A shape builder is a function from a hashable signature (which filters are
+present, which optional columns exist) to SQL text. ``QueryShapes.shape`` wraps
+it so each signature is built once and always returns the same string, with
+whitespace normalized. Parameter values never reach the builder. The driver then
+sends byte-identical text for a shape, so SQL Server compiles and caches one plan
+per shape rather than one per formatting variant. ``QueryShapes.shapes()`` lists
+every shape built so far, with its use count, so it is easy to see which ones need
+an index.
+"""
+
+import functools
+import hashlib
+import threading
+
+
+def canonical_sql(sql):
+    """Strip every line, drop blank ones and join with newlines."""
+    return "\n".join(line.strip() for line in sql.splitlines() if line.strip())
+
+
+class _Shape:
+    __slots__ = ("name", "signature", "sql", "uses")
+
+    def __init__(self, name, signature, sql):
+        self.name = name
+        self.signature = signature
+        self.sql = sql
+        self.uses = 0
+
+
+class QueryShapes:
+    def __init__(self):
+        self._shapes = {}
+        self._lock = threading.Lock()
+
+    def shape(self, name):
+        def decorate(build):
+            @functools.wraps(build)
+            def cached(signature):
+                key = (name, signature)
+                shape = self._shapes.get(key)
+                if shape is None:
+                    built = _Shape(name, signature, canonical_sql(build(signature)))
+                    with self._lock:
+                        shape = self._shapes.setdefault(key, built)
+                shape.uses += 1
+                return shape.sql
+
+            return cached
+
+        return decorate
+
+    def shapes(self, name=None):
+        with self._lock:
+            shapes = [shape for shape in self._shapes.values() if name is None or shape.name == name]
+        return [
+            {
+                "name": shape.name,
+                "signature": _describe(shape.signature),
+                "sql_hash": hashlib.sha1(shape.sql.encode("utf-8")).hexdigest()[:16],
+                "uses": shape.uses,
+                "sql": shape.sql,
+            }
+            for shape in sorted(shapes, key=lambda item: (item.name, -item.uses))
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+def _describe(signature):
+    if hasattr(signature, "_asdict"):
+        return {key: _describe(value) for key, value in signature._asdict().items()}
+    if isinstance(signature, tuple):
+        return [_describe(value) for value in signature]
+    return signature
@@ -1,3 +1,15 @@
+IF OBJECT_ID('dbo.routine_task_child_archive', 'U') IS NOT NULL
+    DROP TABLE dbo.routine_task_child_archive;
+
+IF OBJECT_ID('dbo.routine_task_archive', 'U') IS NOT NULL
+    DROP TABLE dbo.routine_task_archive;
+
+IF OBJECT_ID('dbo.routine_idempotency_key', 'U') IS NOT NULL
+    DROP TABLE dbo.routine_idempotency_key;
+
+IF OBJECT_ID('dbo.routine_change_event', 'U') IS NOT NULL
+    DROP TABLE dbo.routine_change_event;
+
 IF OBJECT_ID('dbo.routine_task_child', 'U') IS NOT NULL
     DROP TABLE dbo.routine_task_child;
 
@@ -27,6 +39,7 @@ CREATE TABLE dbo.routine_task (
     deleted_at DATETIME2(3) NULL,
     created_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
     updated_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
+    row_version ROWVERSION,
     CONSTRAINT PK_routine_task PRIMARY KEY CLUSTERED (task_no),
     CONSTRAINT CK_routine_task_task_kind CHECK (task_kind IN (N'グループ', N'個人'))
 );
@@ -44,9 +57,107 @@ CREATE TABLE dbo.routine_task_child (
     deleted_at DATETIME2(3) NULL,
     created_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
     updated_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
+    row_version ROWVERSION,
     CONSTRAINT PK_routine_task_child PRIMARY KEY CLUSTERED (record_no),
     CONSTRAINT FK_routine_child_parent FOREIGN KEY (task_no) REFERENCES dbo.routine_task(task_no)
 );
 
+-- Change feed (GET /api.py/changes) reads by row_version, and by updated_at for the
+-- read replica's look-back. updated_at is stamped when a statement runs, not when its
+-- transaction commits; the token is MIN_ACTIVE_ROWVERSION(), so rows of transactions
+-- still open when it was issued are read next time. On an existing database:
+--   ALTER TABLE dbo.routine_task ADD row_version ROWVERSION;
+--   ALTER TABLE dbo.routine_task_child ADD row_version ROWVERSION;
+-- and create the two row_version indexes below. The archive tables do not get it.
+CREATE INDEX IX_routine_task_updated_at ON dbo.routine_task (updated_at);
+CREATE INDEX IX_routine_task_child_updated_at ON dbo.routine_task_child (updated_at);
+CREATE INDEX IX_routine_task_row_version ON dbo.routine_task (row_version);
+CREATE INDEX IX_routine_task_child_row_version ON dbo.routine_task_child (row_version);
+
+-- Month views (_build_task_query): every branch seeks on is_deleted plus a due_date range.
+CREATE INDEX IX_routine_task_child_is_deleted_due_date ON dbo.routine_task_child (is_deleted, due_date, task_no, routine_no);
+
+-- Archive tier (archive.py): completed rows older than the retention window move
+-- here. Same columns as the hot tables, without IDENTITY, plus archived_at. On a
+-- database created earlier, add the child's optional columns before archiving:
+--   ALTER TABLE dbo.routine_task_child_archive ADD planned_date DATE NULL, task_kind NVARCHAR(16) NULL;
+CREATE TABLE dbo.routine_task_archive (
+    task_no INT NOT NULL,
+    frequency NVARCHAR(16) NOT NULL,
+    half_year TINYINT NULL,
+    due_date DATE NULL,
+    start_month CHAR(7) NOT NULL,
+    department_cd NVARCHAR(10) NULL,
+    end_month CHAR(7) NOT NULL,
+    [year] INT NOT NULL,
+    quarter CHAR(2) NOT NULL,
+    [month] INT NOT NULL,
+    week_num INT NULL,
+    assignee NVARCHAR(256) NULL,
+    task_kind NVARCHAR(16) NOT NULL,
+    registrant NVARCHAR(64) NULL,
+    status NVARCHAR(16) NOT NULL,
+    title NVARCHAR(128) NOT NULL,
+    attachment_link NVARCHAR(256) NULL,
+    summary NVARCHAR(MAX) NULL,
+    is_deleted BIT NOT NULL,
+    deleted_at DATETIME2(3) NULL,
+    created_at DATETIME2(3) NOT NULL,
+    updated_at DATETIME2(3) NOT NULL,
+    archived_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
+    CONSTRAINT PK_routine_task_archive PRIMARY KEY CLUSTERED (task_no)
+);
+
+CREATE TABLE dbo.routine_task_child_archive (
+    record_no INT NOT NULL,
+    task_no INT NOT NULL,
+    routine_no INT NOT NULL,
+    due_date DATE NULL,
+    title NVARCHAR(128) NULL,
+    assignee NVARCHAR(256) NULL,
+    status NVARCHAR(16) NOT NULL,
+    summary NVARCHAR(MAX) NULL,
+    -- Optional on the hot table (added by later migrations); kept nullable here so
+    -- archive.py can copy them whenever the hot table has them.
+    planned_date DATE NULL,
+    task_kind NVARCHAR(16) NULL,
+    is_deleted BIT NOT NULL,
+    deleted_at DATETIME2(3) NULL,
+    created_at DATETIME2(3) NOT NULL,
+    updated_at DATETIME2(3) NOT NULL,
+    archived_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
+    CONSTRAINT PK_routine_task_child_archive PRIMARY KEY CLUSTERED (record_no)
+);
+CREATE INDEX IX_routine_task_child_archive_due_date ON dbo.routine_task_child_archive (due_date, task_no, routine_no);
+CREATE INDEX IX_routine_task_child_archive_task_no ON dbo.routine_task_child_archive (task_no, routine_no);
+CREATE INDEX IX_routine_task_child_deleted_at ON dbo.routine_task_child (is_deleted, deleted_at);
+
+-- Server-Sent Events (GET /api.py/events): write helpers append one row per change
+-- in their own transaction; every app process tails this table.
+CREATE TABLE dbo.routine_change_event (
+    event_id BIGINT IDENTITY(1,1) NOT NULL,
+    kind NVARCHAR(32) NOT NULL,
+    task_no INT NOT NULL,
+    record_no INT NULL,
+    created_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
+    CONSTRAINT PK_routine_change_event PRIMARY KEY CLUSTERED (event_id)
+);
+CREATE INDEX IX_routine_change_event_created_at ON dbo.routine_change_event (created_at);
+
+-- Idempotency-Key of POST /api.py/routines: the first result per user and key,
+-- replayed to retries until expires_at (see docs/idempotency.md).
+CREATE TABLE dbo.routine_idempotency_key (
+    upn NVARCHAR(100) NOT NULL,
+    idempotency_key NVARCHAR(100) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    task_no INT NOT NULL,
+    status_code SMALLINT NOT NULL,
+    response_body NVARCHAR(4000) NOT NULL,
+    created_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
+    expires_at DATETIME2(3) NOT NULL,
+    CONSTRAINT PK_routine_idempotency_key PRIMARY KEY CLUSTERED (upn, idempotency_key)
+);
+CREATE INDEX IX_routine_idempotency_key_expires_at ON dbo.routine_idempotency_key (expires_at);
+
 DBCC CHECKIDENT ('dbo.routine_task', RESEED, 0);
 DBCC CHECKIDENT ('dbo.routine_task_child', RESEED, 0);
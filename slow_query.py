@@ -0,0 +1,146 @@
+"""Slow-query recorder keyed by normalized statement fingerprints.
+
+Statements slower than the threshold are appended as JSON lines to a rotating log,
+one file per worker process (``slow_query.<pid>.log`` next to the configured path),
+written by the logging listener thread rather than the request. Only the shape of
+bound parameters (type names and batch size) is written, never their values.
+``top_fingerprints`` reads every process's files back, so every worker contributes
+to the report.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import app_logging
+
+_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint_sql(sql):
+    normalized = _STRING_LITERAL.sub("?", sql)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    normalized = _PLACEHOLDER_LIST.sub("?+", normalized)
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+    return digest, normalized
+
+
+def param_shape(params, many=False):
+    if params is None:
+        return []
+    if many:
+        rows = list(params)
+        return {"batch": len(rows), "types": param_shape(rows[0]) if rows else []}
+    return [type(value).__name__ for value in params]
+
+
+class SlowQueryLog:
+    def __init__(self, path, threshold_ms, max_bytes=5 * 1024 * 1024, backup_count=3, retention_days=7):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._retention_seconds = retention_days * 86400
+        self._logger = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def process_path(self, pid=None):
+        root, extension = os.path.splitext(self.path)
+        return f"{root}.{pid or os.getpid()}{extension}"
+
+    def _paths(self):
+        root, extension = os.path.splitext(self.path)
+        # Per-process files, plus the single shared file older versions wrote.
+        return sorted(set(glob.glob(f"{root}.*{extension}*")) | set(glob.glob(self.path + "*")))
+
+    def _remove_stale_files(self):
+        # Pids of recycled processes never come back to rotate their files.
+        cutoff = time.time() - self._retention_seconds
+        for path in self._paths():
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def _get_logger(self):
+        """The routed logger of this process, or None when its file cannot be opened."""
+        if self._pid == os.getpid():
+            return self._logger
+        with self._lock:
+            if self._pid != os.getpid():
+                # Each process rotates only its own file: with one shared file, a rename
+                # fails on Windows while another process holds it open.
+                self._remove_stale_files()
+                logger = logging.getLogger("routine_app.slow_query")
+                routed = app_logging.route_to_file(logger.name, self.process_path(), self._max_bytes, self._backup_count)
+                self._logger = logger if routed is not None else None
+                self._pid = os.getpid()
+        return self._logger
+
+    def record(self, sql, params, duration_ms, rows, many=False):
+        if self.threshold_ms is None or duration_ms < self.threshold_ms:
+            return
+        fingerprint, normalized = fingerprint_sql(sql)
+        entry = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "fingerprint": fingerprint,
+            "statement": normalized,
+            "duration_ms": round(duration_ms, 1),
+            "rows": rows,
+            "params": param_shape(params, many=many),
+        }
+        logger = self._get_logger()
+        if logger is not None:
+            logger.info(json.dumps(entry, ensure_ascii=False))
+
+    def top_fingerprints(self, limit=20):
+        summary = {}
+        for path in self._paths():
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    lines = handle.readlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                item = summary.setdefault(
+                    entry["fingerprint"],
+                    {
+                        "fingerprint": entry["fingerprint"],
+                        "statement": entry["statement"],
+                        "count": 0,
+                        "total_ms": 0.0,
+                        "max_ms": 0.0,
+                        "rows": 0,
+                        "param_shapes": [],
+                        "last_seen": None,
+                    },
+                )
+                item["count"] += 1
+                item["total_ms"] += entry["duration_ms"]
+                item["max_ms"] = max(item["max_ms"], entry["duration_ms"])
+                item["rows"] += entry.get("rows") or 0
+                if entry.get("params") not in item["param_shapes"] and len(item["param_shapes"]) < 5:
+                    item["param_shapes"].append(entry.get("params"))
+                if item["last_seen"] is None or entry["ts"] > item["last_seen"]:
+                    item["last_seen"] = entry["ts"]
+        ranked = sorted(summary.values(), key=lambda item: item["total_ms"], reverse=True)[:limit]
+        for item in ranked:
+            item["total_ms"] = round(item["total_ms"], 1)
+            item["avg_ms"] = round(item["total_ms"] / item["count"], 1)
+        return ranked
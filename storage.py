@@ -0,0 +1,94 @@
+"""Backend selection for the DB helpers in api.py.
+
+``ROUTINE_DB_BACKEND=sqlserver`` (default) connects through pyodbc with
+``db_config.get_connection_string``. ``ROUTINE_DB_BACKEND=sqlite`` uses the
+embedded emulation in ``storage_sqlite`` so the API, benchmarks and load tests run
+without SQL Server (and without an ODBC driver manager installed).
+"""
+
+import math
+import sqlite3
+
+import db_config
+import storage_sqlite
+
+try:
+    import pyodbc
+except ImportError:  # pragma: no cover - depends on the host's ODBC libraries
+    pyodbc = None
+
+DB_ERRORS = tuple(error for error in ((pyodbc.Error if pyodbc else None), sqlite3.Error) if error)
+
+
+def backend_name():
+    return db_config.DB_BACKEND
+
+
+def connect(timeout=None):
+    """Open a connection to the primary.
+
+    ``timeout`` (seconds) bounds the login and then every statement on the
+    connection. The driver cancels a statement that runs past it and raises an
+    error that ``is_timeout_error`` recognizes.
+    """
+    if db_config.DB_BACKEND == "sqlite":
+        return storage_sqlite.connect(db_config.SQLITE_PATH, statement_timeout=timeout)
+    return _pyodbc_connect(db_config.get_connection_string(), timeout)
+
+
+def read_replica_configured():
+    if db_config.DB_BACKEND == "sqlite":
+        return bool(db_config.SQLITE_READ_PATH)
+    return db_config.get_read_connection_string() is not None
+
+
+def connect_read_replica(timeout=None):
+    if db_config.DB_BACKEND == "sqlite":
+        return storage_sqlite.connect(db_config.SQLITE_READ_PATH, statement_timeout=timeout)
+    return _pyodbc_connect(db_config.get_read_connection_string(), timeout)
+
+
+def _pyodbc_connect(connection_string, timeout):
+    if pyodbc is None:
+        raise RuntimeError("pyodbc is not available; set ROUTINE_DB_BACKEND=sqlite to run without SQL Server.")
+    if not timeout:
+        return pyodbc.connect(connection_string)
+    seconds = _timeout_seconds(timeout)
+    conn = pyodbc.connect(connection_string, timeout=seconds)
+    # SQL_ATTR_QUERY_TIMEOUT: the driver cancels the statement (HYT00) once it runs this long.
+    conn.timeout = seconds
+    return conn
+
+
+def _timeout_seconds(timeout):
+    return max(1, math.ceil(timeout)) if timeout else 0
+
+
+def cursor_with_timeout(conn, cursor, timeout):
+    """Return a cursor of ``conn`` whose next statement is cancelled after ``timeout`` seconds.
+
+    pyodbc copies ``Connection.timeout`` into a cursor when the cursor is created, so
+    when the whole-second value changes the open cursor is swapped for a new one.
+    Call it only before ``execute``, when the old cursor has no rows left to read.
+    """
+    if db_config.DB_BACKEND == "sqlite":
+        conn.set_statement_timeout(timeout)
+        return cursor
+    seconds = _timeout_seconds(timeout)
+    if conn.timeout == seconds:
+        return cursor
+    conn.timeout = seconds
+    fresh = conn.cursor()
+    fresh.fast_executemany = cursor.fast_executemany
+    cursor.close()
+    return fresh
+
+
+def is_timeout_error(exc):
+    if isinstance(exc, sqlite3.Error):
+        return storage_sqlite.is_timeout_error(exc)
+    return bool(exc.args) and exc.args[0] in ("HYT00", "HYT01")
+
+
+def is_transient_error(exc):
+    return isinstance(exc, sqlite3.Error) and storage_sqlite.is_transient_error(exc)
@@ -0,0 +1,376 @@
+"""Embedded SQLite backend that emulates the SQL Server tables used by api.py.
+
+The helpers in api.py keep issuing their T-SQL; ``connect`` returns a DB-API
+connection whose cursors rewrite the dialect pieces we use (``dbo.`` prefixes,
+``OUTPUT INSERTED``, ``OFFSET ... FETCH``, ``SYSUTCDATETIME()``, ``YEAR``/``MONTH``,
+``COL_LENGTH``, ``MIN_ACTIVE_ROWVERSION()`` and the catalog probes) before handing
+them to sqlite3.
+"""
+
+import functools
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS routine_task (
+    task_no INTEGER PRIMARY KEY AUTOINCREMENT,
+    frequency TEXT NOT NULL,
+    half_year INTEGER NULL,
+    due_date DATE NULL,
+    start_month TEXT NOT NULL,
+    department_cd TEXT NULL,
+    end_month TEXT NOT NULL,
+    [year] INTEGER NOT NULL,
+    quarter TEXT NOT NULL,
+    [month] INTEGER NOT NULL,
+    week_num INTEGER NULL,
+    assignee TEXT NULL,
+    task_kind TEXT NOT NULL DEFAULT '個人',
+    registrant TEXT NULL,
+    status TEXT NOT NULL,
+    title TEXT NOT NULL,
+    attachment_link TEXT NULL,
+    summary TEXT NULL,
+    is_deleted INTEGER NOT NULL DEFAULT 0,
+    deleted_at DATETIME2 NULL,
+    created_at DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    updated_at DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    row_version INTEGER NULL
+);
+CREATE TABLE IF NOT EXISTS routine_task_child (
+    record_no INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_no INTEGER NOT NULL REFERENCES routine_task(task_no),
+    routine_no INTEGER NOT NULL,
+    due_date DATE NULL,
+    planned_date DATE NULL,
+    title TEXT NULL,
+    assignee TEXT NULL,
+    task_kind TEXT NULL,
+    status TEXT NOT NULL,
+    summary TEXT NULL,
+    is_deleted INTEGER NOT NULL DEFAULT 0,
+    deleted_at DATETIME2 NULL,
+    created_at DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    updated_at DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    row_version INTEGER NULL
+);
+CREATE INDEX IF NOT EXISTS ix_routine_task_child_task_no ON routine_task_child (task_no, routine_no);
+CREATE INDEX IF NOT EXISTS ix_routine_task_child_due_date ON routine_task_child (is_deleted, due_date);
+CREATE INDEX IF NOT EXISTS ix_routine_task_updated_at ON routine_task (updated_at);
+CREATE INDEX IF NOT EXISTS ix_routine_task_child_updated_at ON routine_task_child (updated_at);
+CREATE TABLE IF NOT EXISTS routine_task_archive (
+    task_no INTEGER PRIMARY KEY,
+    frequency TEXT NOT NULL,
+    half_year INTEGER NULL,
+    due_date DATE NULL,
+    start_month TEXT NOT NULL,
+    department_cd TEXT NULL,
+    end_month TEXT NOT NULL,
+    [year] INTEGER NOT NULL,
+    quarter TEXT NOT NULL,
+    [month] INTEGER NOT NULL,
+    week_num INTEGER NULL,
+    assignee TEXT NULL,
+    task_kind TEXT NOT NULL DEFAULT '個人',
+    registrant TEXT NULL,
+    status TEXT NOT NULL,
+    title TEXT NOT NULL,
+    attachment_link TEXT NULL,
+    summary TEXT NULL,
+    is_deleted INTEGER NOT NULL,
+    deleted_at DATETIME2 NULL,
+    created_at DATETIME2 NOT NULL,
+    updated_at DATETIME2 NOT NULL,
+    archived_at DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS routine_task_child_archive (
+    record_no INTEGER PRIMARY KEY,
+    task_no INTEGER NOT NULL,
+    routine_no INTEGER NOT NULL,
+    due_date DATE NULL,
+    planned_date DATE NULL,
+    title TEXT NULL,
+    assignee TEXT NULL,
+    task_kind TEXT NULL,
+    status TEXT NOT NULL,
+    summary TEXT NULL,
+    is_deleted INTEGER NOT NULL,
+    deleted_at DATETIME2 NULL,
+    created_at DATETIME2 NOT NULL,
+    updated_at DATETIME2 NOT NULL,
+    archived_at DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS ix_routine_task_child_archive_due_date ON routine_task_child_archive (due_date, task_no, routine_no);
+CREATE INDEX IF NOT EXISTS ix_routine_task_child_archive_task_no ON routine_task_child_archive (task_no, routine_no);
+CREATE INDEX IF NOT EXISTS ix_routine_task_child_deleted_at ON routine_task_child (is_deleted, deleted_at);
+CREATE TABLE IF NOT EXISTS routine_change_event (
+    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    task_no INTEGER NOT NULL,
+    record_no INTEGER NULL,
+    created_at DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+CREATE INDEX IF NOT EXISTS ix_routine_change_event_created_at ON routine_change_event (created_at);
+CREATE TABLE IF NOT EXISTS routine_idempotency_key (
+    upn TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    task_no INTEGER NOT NULL,
+    status_code INTEGER NOT NULL,
+    response_body TEXT NOT NULL,
+    created_at DATETIME2 NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    expires_at DATETIME2 NOT NULL,
+    PRIMARY KEY (upn, idempotency_key)
+);
+CREATE INDEX IF NOT EXISTS ix_routine_idempotency_key_expires_at ON routine_idempotency_key (expires_at);
+CREATE TABLE IF NOT EXISTS Department (
+    DepartmentCD TEXT PRIMARY KEY,
+    DepartmentName TEXT NOT NULL,
+    IsApprovalDept INTEGER NOT NULL DEFAULT 0,
+    DeleteDt DATETIME2 NULL
+);
+CREATE TABLE IF NOT EXISTS Employee (
+    UserID INTEGER PRIMARY KEY AUTOINCREMENT,
+    EmployeeName TEXT NOT NULL,
+    AD TEXT NULL,
+    DepartmentCD TEXT NULL,
+    EmployeeType INTEGER NOT NULL DEFAULT 0,
+    RetirementDate DATE NULL,
+    LastWorkDate DATE NULL
+);
+CREATE INDEX IF NOT EXISTS ix_employee_department ON Employee (DepartmentCD, EmployeeName);
+"""
+
+# Emulates ROWVERSION: one database-wide counter, stamped on every insert and update.
+# Writers are serialized, so the value after the last committed write plus one is
+# what SQL Server's MIN_ACTIVE_ROWVERSION() would return.
+ROW_VERSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS row_version_clock (value INTEGER NOT NULL);
+INSERT INTO row_version_clock (value) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM row_version_clock);
+CREATE INDEX IF NOT EXISTS ix_routine_task_row_version ON routine_task (row_version);
+CREATE INDEX IF NOT EXISTS ix_routine_task_child_row_version ON routine_task_child (row_version);
+CREATE TRIGGER IF NOT EXISTS routine_task_row_version_insert AFTER INSERT ON routine_task
+BEGIN
+    UPDATE row_version_clock SET value = value + 1;
+    UPDATE routine_task SET row_version = (SELECT value FROM row_version_clock) WHERE task_no = NEW.task_no;
+END;
+CREATE TRIGGER IF NOT EXISTS routine_task_row_version_update AFTER UPDATE ON routine_task
+WHEN NEW.row_version IS OLD.row_version
+BEGIN
+    UPDATE row_version_clock SET value = value + 1;
+    UPDATE routine_task SET row_version = (SELECT value FROM row_version_clock) WHERE task_no = NEW.task_no;
+END;
+CREATE TRIGGER IF NOT EXISTS routine_task_child_row_version_insert AFTER INSERT ON routine_task_child
+BEGIN
+    UPDATE row_version_clock SET value = value + 1;
+    UPDATE routine_task_child SET row_version = (SELECT value FROM row_version_clock) WHERE record_no = NEW.record_no;
+END;
+CREATE TRIGGER IF NOT EXISTS routine_task_child_row_version_update AFTER UPDATE ON routine_task_child
+WHEN NEW.row_version IS OLD.row_version
+BEGIN
+    UPDATE row_version_clock SET value = value + 1;
+    UPDATE routine_task_child SET row_version = (SELECT value FROM row_version_clock) WHERE record_no = NEW.record_no;
+END;
+"""
+
+_UTC_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_SCHEMA_PREFIX = re.compile(r"\b(?:\w+\.)?dbo\.", re.IGNORECASE)
+_OFFSET_FETCH = re.compile(
+    r"OFFSET\s+\?\s+ROWS\s+FETCH\s+NEXT\s+\?\s+ROWS\s+ONLY", re.IGNORECASE
+)
+_OUTPUT_INSERTED = re.compile(r"\bOUTPUT\s+((?:INSERTED\.\w+\s*,?\s*)+)", re.IGNORECASE)
+_SYSUTCDATETIME = re.compile(r"SYSUTCDATETIME\(\)", re.IGNORECASE)
+_MIN_ACTIVE_ROWVERSION = re.compile(r"MIN_ACTIVE_ROWVERSION\(\)", re.IGNORECASE)
+_SET_ISOLATION = re.compile(r"^\s*SET\s+TRANSACTION\s+ISOLATION\s+LEVEL\b", re.IGNORECASE)
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def _adapt_date(value):
+    return value.isoformat()
+
+
+def _adapt_datetime(value):
+    return value.isoformat(sep=" ")
+
+
+def _convert_date(raw):
+    return date.fromisoformat(raw.decode("utf-8")[:10])
+
+
+def _convert_datetime(raw):
+    return datetime.fromisoformat(raw.decode("utf-8"))
+
+
+sqlite3.register_adapter(date, _adapt_date)
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("DATETIME2", _convert_datetime)
+
+
+@functools.lru_cache(maxsize=512)
+def translate(sql):
+    """Return (sqlite_sql, swap_index) for a T-SQL statement.
+
+    ``swap_index`` is the position of the OFFSET parameter when the paging clause
+    was rewritten to ``LIMIT ? OFFSET ?`` (the two parameters trade places).
+    """
+    if "sys.databases" in sql:
+        # WAL readers never wait on writers; report it like RCSI.
+        return "SELECT 0, 1", None
+    if "sys.dm_exec_session_wait_stats" in sql:
+        return "SELECT 0", None
+    if _SET_ISOLATION.match(sql):
+        return "SELECT 1", None
+    translated = _SCHEMA_PREFIX.sub("", sql)
+    translated = _SYSUTCDATETIME.sub(_UTC_NOW_SQL, translated)
+    translated = _MIN_ACTIVE_ROWVERSION.sub("(SELECT value + 1 FROM row_version_clock)", translated)
+    swap_index = None
+    paging = _OFFSET_FETCH.search(translated)
+    if paging:
+        swap_index = translated[: paging.start()].count("?")
+        translated = translated[: paging.start()] + "LIMIT ? OFFSET ?" + translated[paging.end():]
+    output = _OUTPUT_INSERTED.search(translated)
+    if output:
+        columns = ", ".join(
+            part.strip().split(".", 1)[1] for part in output.group(1).split(",") if part.strip()
+        )
+        translated = translated[: output.start()] + translated[output.end():]
+        translated = translated.rstrip().rstrip(";") + f" RETURNING {columns}"
+    return translated, swap_index
+
+
+def _bind(params, swap_index):
+    if swap_index is None:
+        return params
+    params = list(params)
+    params[swap_index], params[swap_index + 1] = params[swap_index + 1], params[swap_index]
+    return params
+
+
+class _Cursor:
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    def execute(self, sql, params=()):
+        translated, swap_index = translate(sql)
+        self._connection.start_statement()
+        self._cursor.execute(translated, _bind(params, swap_index))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        translated, swap_index = translate(sql)
+        self._connection.start_statement()
+        self._cursor.executemany(translated, [_bind(params, swap_index) for params in seq_of_params])
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _Connection:
+    def __init__(self, conn, statement_timeout=None, busy_timeout=30):
+        self._conn = conn
+        self.statement_timeout = None
+        self._busy_timeout = busy_timeout
+        self._deadline = None
+        self.set_statement_timeout(statement_timeout)
+
+    def _past_deadline(self):
+        return self._deadline is not None and time.monotonic() > self._deadline
+
+    def set_statement_timeout(self, seconds):
+        """Bound the following statements to ``seconds``, like assigning pyodbc's ``Connection.timeout``."""
+        if seconds == self.statement_timeout:
+            return
+        if seconds and not self.statement_timeout:
+            # Stands in for pyodbc's Connection.timeout: a statement still running at its
+            # deadline is interrupted and raises OperationalError("interrupted").
+            self._conn.set_progress_handler(self._past_deadline, 1000)
+        # A lock wait counts against the same limit.
+        busy_timeout = min(seconds, self._busy_timeout) if seconds else self._busy_timeout
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+        self.statement_timeout = seconds
+
+    def start_statement(self):
+        self._deadline = time.monotonic() + self.statement_timeout if self.statement_timeout else None
+
+    def cursor(self):
+        return _Cursor(self._conn.cursor(), self)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _date_part(index):
+    def extract(value):
+        if value is None:
+            return None
+        text = value.isoformat() if hasattr(value, "isoformat") else str(value)
+        return int(text[:10].split("-")[index])
+
+    return extract
+
+
+def _table_columns(conn):
+    columns = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        columns[table.lower()] = {row[1].lower() for row in conn.execute(f"PRAGMA table_info([{table}])")}
+    return columns
+
+
+def initialize(path):
+    with _init_lock:
+        if path in _initialized:
+            return
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            for table in ("routine_task", "routine_task_child"):
+                # Databases created before the change feed read by row version.
+                if "row_version" not in _table_columns(conn)[table]:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN row_version INTEGER NULL")
+            conn.executescript(ROW_VERSION_SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+        _initialized.add(path)
+
+
+def connect(path, timeout=30, statement_timeout=None):
+    initialize(path)
+    conn = sqlite3.connect(path, timeout=timeout, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.execute("PRAGMA foreign_keys=ON")
+    columns = _table_columns(conn)
+
+    def col_length(table, column):
+        table_name = str(table).split(".")[-1].strip("[]").lower()
+        return 1 if str(column).lower() in columns.get(table_name, ()) else None
+
+    conn.create_function("YEAR", 1, _date_part(0), deterministic=True)
+    conn.create_function("MONTH", 1, _date_part(1), deterministic=True)
+    conn.create_function("COL_LENGTH", 2, col_length)
+    conn.create_function("DB_ID", 0, lambda: 1)
+    return _Connection(conn, statement_timeout, busy_timeout=timeout)
+
+
+def is_timeout_error(exc):
+    return isinstance(exc, sqlite3.OperationalError) and "interrupted" in str(exc).lower()
+
+
+def is_transient_error(exc):
+    message = str(exc).lower()
+    return isinstance(exc, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
@@ -0,0 +1,213 @@
+"""Checks for the admission primitives in ``admission.py``.
+
+- ``RateLimiter``: refill and ``Retry-After`` math on a fake clock, the cost cap, the
+  off switch, a shared ``FileBucketStore``, and a broken store admitting requests;
+- ``ConcurrencyGate``: ``queue_full``, ``queue_timeout`` and hand-over on release;
+- ``FileConcurrencyGate``: the same across real processes (oldest waiter first),
+  lease expiry on a fake clock, and no waiting row left behind after a file error.
+
+Usage:
+    python tests/api/check_admission.py     # exit 1 on any failure
+"""
+
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from admission import (  # noqa: E402
+    ConcurrencyGate,
+    FileBucketStore,
+    FileConcurrencyGate,
+    RateLimiter,
+    retry_after_header,
+)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def rate_limiter_refill(workdir):
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=40, clock=clock)
+    problems = []
+    results = [limiter.take("u", 10) for _ in range(5)]
+    if results[:4] != [(True, 0.0)] * 4 or results[4] != (False, 5.0):
+        problems.append(f"burst of 40 at cost 10 gave {results}")
+    clock.now += 2.5
+    if limiter.take("u", 10) != (False, 2.5):
+        problems.append("refill after 2.5 s is not 5 tokens")
+    if limiter.take("u", 5) != (True, 0.0):
+        problems.append("5 refilled tokens could not be spent")
+    if limiter.take("other", 10) != (True, 0.0):
+        problems.append("buckets are not per key")
+    clock.now += 3600
+    if limiter.take("u", 100) != (True, 0.0) or limiter.take("u", 1) != (False, 0.5):
+        problems.append("a cost above the burst is not charged as the whole bucket")
+    if RateLimiter(rate=0, burst=1, clock=clock).take("u", 100) != (True, 0.0):
+        problems.append("rate 0 does not turn the limiter off")
+    if retry_after_header(0.2) != "1" or retry_after_header(2.5) != "3":
+        problems.append("Retry-After is not rounded up to whole seconds")
+    return problems
+
+
+def rate_limiter_shared_file(workdir):
+    clock = FakeClock()
+    path = os.path.join(workdir, "buckets.sqlite3")
+    first = RateLimiter(rate=1, burst=10, store=FileBucketStore(path), clock=clock)
+    second = RateLimiter(rate=1, burst=10, store=FileBucketStore(path), clock=clock)
+    problems = []
+    if first.take("u", 6) != (True, 0.0) or second.take("u", 6) != (False, 2.0):
+        problems.append("two limiters on one file do not share the bucket")
+
+    class BrokenStore:
+        def update(self, key, apply):
+            raise sqlite3.OperationalError("database is locked")
+
+    if RateLimiter(rate=1, burst=1, store=BrokenStore(), clock=clock).take("u", 1) != (True, 0.0):
+        problems.append("a broken store rejected the request")
+    return problems
+
+
+def concurrency_gate(workdir):
+    gate = ConcurrencyGate(limit=1, max_queue=1, queue_timeout=2.0)
+    problems = []
+    if gate.acquire() != (True, None):
+        problems.append("the first request did not get the slot")
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(gate.acquire()))
+    waiter.start()
+    deadline = time.monotonic() + 2
+    while not gate._waiting and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if gate.acquire() != (False, "queue_full"):
+        problems.append("a full queue did not reject at once")
+    gate.release()
+    waiter.join(2)
+    if waited != [(True, None)] or gate.in_flight != 1:
+        problems.append(f"release did not hand the slot to the waiter: {waited}")
+    gate.release()
+
+    gate = ConcurrencyGate(limit=1, max_queue=4, queue_timeout=0.1)
+    gate.acquire()
+    started = time.monotonic()
+    if gate.acquire() != (False, "queue_timeout") or time.monotonic() - started < 0.1:
+        problems.append("a waiter was not rejected when its wait ran out")
+    if ConcurrencyGate(limit=0, max_queue=0, queue_timeout=0).acquire() != (True, None):
+        problems.append("limit 0 does not turn the gate off")
+    return problems
+
+
+def _file_gate_worker(path, name, hold, log):
+    gate = FileConcurrencyGate(path, limit=1, max_queue=4, queue_timeout=5.0, poll_interval=0.01)
+    acquired, _ = gate.acquire()
+    log.put((name, acquired, time.time()))
+    time.sleep(hold)
+    gate.release()
+
+
+def file_gate_across_processes(workdir):
+    path = os.path.join(workdir, "slots.sqlite3")
+    gate = FileConcurrencyGate(path, limit=1, max_queue=2, queue_timeout=0.05, poll_interval=0.01)
+    problems = []
+    log = multiprocessing.Queue()
+    holder = multiprocessing.Process(target=_file_gate_worker, args=(path, "holder", 0.6, log))
+    holder.start()
+    log.get(timeout=10)
+    waiters = []
+    for name in ("first", "second"):
+        process = multiprocessing.Process(target=_file_gate_worker, args=(path, name, 0.05, log))
+        process.start()
+        waiters.append(process)
+        time.sleep(0.15)
+    if gate.acquire() != (False, "queue_full"):
+        problems.append("two waiters in other processes did not fill a queue of 2")
+    holder.join(10)
+    for process in waiters:
+        process.join(10)
+    order = sorted((log.get(timeout=5) for _ in waiters), key=lambda entry: entry[2])
+    if [(name, acquired) for name, acquired, _ in order] != [("first", True), ("second", True)]:
+        problems.append(f"slots were not handed out oldest waiter first: {order}")
+    if gate.in_flight != 0:
+        problems.append("rows were left in the slot table")
+    return problems
+
+
+def file_gate_lease(workdir):
+    path = os.path.join(workdir, "lease.sqlite3")
+    clock = FakeClock()
+    gate = FileConcurrencyGate(path, limit=1, max_queue=0, queue_timeout=0.05, lease_seconds=120.0, clock=clock)
+    problems = []
+    gate._connect().execute("INSERT INTO heavy_slot VALUES ('9999:1', 1, ?)", (clock.now,))
+    clock.now += 119.0
+    if gate.acquire() != (False, "queue_full"):
+        problems.append("a live lease did not hold its slot")
+    clock.now += 2.0
+    if gate.acquire() != (True, None):
+        problems.append("the slot of a dead worker was not reclaimed after its lease")
+    gate.release()
+    return problems
+
+
+def file_gate_error_while_waiting(workdir):
+    path = os.path.join(workdir, "error.sqlite3")
+    gate = FileConcurrencyGate(path, limit=1, max_queue=4, queue_timeout=1.0, poll_interval=0.01)
+    gate._connect().execute("INSERT INTO heavy_slot VALUES ('9999:1', 1, ?)", (time.time(),))
+    original = gate._transaction
+    calls = []
+
+    def failing(step):
+        calls.append(step)
+        if len(calls) > 1:
+            raise sqlite3.OperationalError("disk I/O error")
+        return original(step)
+
+    gate._transaction = failing
+    problems = []
+    if gate.acquire() != (True, None):
+        problems.append("a file error while waiting did not admit the request")
+    gate._transaction = original
+    waiting = gate._connect().execute("SELECT COUNT(*) FROM heavy_slot WHERE running = 0").fetchone()[0]
+    if waiting:
+        problems.append("the waiting row was left behind after the error")
+    return problems
+
+
+CASES = [
+    rate_limiter_refill,
+    rate_limiter_shared_file,
+    concurrency_gate,
+    file_gate_across_processes,
+    file_gate_lease,
+    file_gate_error_while_waiting,
+]
+
+
+def main():
+    # The broken-file cases log their expected warnings.
+    logging.getLogger("routine_app.admission").setLevel(logging.ERROR)
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        for case in CASES:
+            problems = case(workdir)
+            print(f"{'ok  ' if not problems else 'FAIL'} {case.__name__}")
+            for problem in problems:
+                print(f"     {problem}")
+            failures += bool(problems)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Checks for ``breaker.CircuitBreaker`` and ``breaker.SnapshotStore``.
+
+Both take a ``clock``, so every case runs on a fake clock and no case sleeps.
+
+Usage:
+    python tests/api/check_breaker.py     # exit 1 on any failure
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, SnapshotStore  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def opens_after_threshold():
+    clock = FakeClock()
+    changes = []
+    breaker = CircuitBreaker(3, 30.0, on_change=lambda old, new: changes.append((old, new)), clock=clock)
+    problems = []
+    breaker.record_failure()
+    breaker.record_failure()
+    if breaker.state != CLOSED or not breaker.allow():
+        problems.append("opened before the threshold")
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    if breaker.state != CLOSED:
+        problems.append("a success did not reset the failure count")
+    breaker.record_failure()
+    if breaker.state != OPEN or breaker.allow():
+        problems.append(f"not open after 3 consecutive failures: {breaker.state}")
+    if changes != [(CLOSED, OPEN)]:
+        problems.append(f"on_change saw {changes}")
+    return problems
+
+
+def half_open_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(1, 30.0, clock=clock)
+    problems = []
+    breaker.record_failure()
+    clock.now += 29.9
+    if breaker.allow():
+        problems.append("let a call through before reset_timeout")
+    clock.now += 0.1
+    if not breaker.allow() or breaker.state != HALF_OPEN:
+        problems.append("no probe after reset_timeout")
+    if breaker.allow():
+        problems.append("let a second call through while the probe runs")
+    breaker.record_failure()
+    if breaker.state != OPEN:
+        problems.append("a failed probe did not reopen the breaker")
+    clock.now += 30.0
+    breaker.allow()
+    breaker.record_success()
+    if breaker.state != CLOSED or not breaker.allow():
+        problems.append("a successful probe did not close the breaker")
+    return problems
+
+
+def lost_probe_does_not_pin():
+    clock = FakeClock()
+    breaker = CircuitBreaker(1, 30.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 30.0
+    breaker.allow()  # the probe's caller dies and never reports back
+    clock.now += 10.0
+    problems = ["a second probe was allowed too early"] if breaker.allow() else []
+    clock.now += 20.0
+    if not breaker.allow():
+        problems.append("a lost probe pinned the breaker half-open")
+    return problems
+
+
+def snapshot_age_and_eviction():
+    clock = FakeClock()
+    store = SnapshotStore(max_entries=2, clock=clock)
+    problems = []
+    store.put("a", 1)
+    clock.now += 5.0
+    store.put("b", 2)
+    if store.get("a") != (1, 5.0):
+        problems.append(f"age of 'a' is {store.get('a')}")
+    store.put("c", 3)
+    if store.get("a") is not None or store.get("b") != (2, 0.0):
+        problems.append("the oldest entry was not the one evicted")
+    store.put("b", 4)
+    if store.get("b") != (4, 0.0):
+        problems.append("put did not replace the value")
+    store.clear()
+    if store.get("c") is not None:
+        problems.append("clear kept entries")
+    return problems
+
+
+CASES = [opens_after_threshold, half_open_probe, lost_probe_does_not_pin, snapshot_age_and_eviction]
+
+
+def main():
+    failures = 0
+    for case in CASES:
+        problems = case()
+        print(f"{'ok  ' if not problems else 'FAIL'} {case.__name__}")
+        for problem in problems:
+            print(f"     {problem}")
+        failures += bool(problems)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Run ``POST /routines`` with ``Idempotency-Key`` against the SQLite backend.
+
+Each case counts the parents and routines in the database, not only the responses:
+
+- the same key and body replays the stored response with ``Idempotent-Replayed: true``;
+- the same key with another body is answered with ``422`` and writes nothing;
+- once the key row has expired, the same key creates the routine again;
+- a ``COMMIT`` whose acknowledgement is lost is looked up through the key row: a
+  landed insert answers ``201`` once, with or without a client key, and a rolled
+  back one answers ``500`` so that the client's retry with the key creates it.
+
+Usage:
+    python tests/api/check_idempotency.py     # exit 1 on any failure
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+WORKDIR = tempfile.TemporaryDirectory()
+os.environ["ROUTINE_DB_BACKEND"] = "sqlite"
+os.environ["ROUTINE_SQLITE_PATH"] = os.path.join(WORKDIR.name, "idempotency.sqlite3")
+os.environ["ROUTINE_E2E_BYPASS_AUTH"] = "1"
+os.environ["ROUTINE_RATE_LIMIT_PER_SECOND"] = "0"
+os.environ.setdefault("ROUTINE_METRICS_DIR", "")
+os.environ.setdefault("ROUTINE_LOG_LEVEL", "CRITICAL")
+sys.path.insert(0, str(REPO_DIR))
+
+import api  # noqa: E402
+import storage  # noqa: E402
+import storage_sqlite  # noqa: E402
+
+ROUTES = "/routine_app/api.py/routines"
+
+
+def body(title):
+    return {"frequency": "週次", "start_month": "2026-01", "end_month": "2026-02", "title": title, "assignee": "社員00001"}
+
+
+def counts(title):
+    with storage.connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM dbo.routine_task WHERE title = ?", [title])
+        parents = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT COUNT(*) FROM dbo.routine_task_child c "
+            "INNER JOIN dbo.routine_task p ON c.task_no = p.task_no WHERE p.title = ?",
+            [title],
+        )
+        return parents, cursor.fetchone()[0]
+
+
+class _CommitFault:
+    """Wraps ``api._get_db_connection`` so the next COMMIT fails before or after it lands."""
+
+    def __init__(self):
+        self.mode = None
+        self._connect = api._get_db_connection
+
+    def __enter__(self):
+        fault = self
+
+        class Connection:
+            def __init__(self, conn):
+                self._conn = conn
+
+            def __enter__(self):
+                self._conn.__enter__()
+                return self
+
+            def __exit__(self, *exc_info):
+                return self._conn.__exit__(*exc_info)
+
+            def commit(self):
+                mode, fault.mode = fault.mode, None
+                if mode == "lost_ack":
+                    self._conn.commit()
+                if mode:
+                    raise storage_sqlite.sqlite3.OperationalError("disk I/O error")
+                return self._conn.commit()
+
+            def __getattr__(self, name):
+                return getattr(self._conn, name)
+
+        api._get_db_connection = lambda *args, **kwargs: Connection(fault._connect(*args, **kwargs))
+        return self
+
+    def __exit__(self, *exc_info):
+        api._get_db_connection = self._connect
+
+
+def replayed(client):
+    problems = []
+    first = client.post(ROUTES, json=body("replay"), headers={"Idempotency-Key": "replay-1"})
+    created = counts("replay")
+    second = client.post(ROUTES, json=body("replay"), headers={"Idempotency-Key": "replay-1"})
+    if first.status_code != 201 or first.headers.get("Idempotent-Replayed"):
+        problems.append(f"first request: {first.status_code} {dict(first.headers)}")
+    if second.status_code != 201 or second.headers.get("Idempotent-Replayed") != "true":
+        problems.append(f"repeat was not replayed: {second.status_code} {second.headers.get('Idempotent-Replayed')}")
+    if second.get_json() != first.get_json():
+        problems.append("the replayed body differs from the first response")
+    if counts("replay") != created or created[0] != 1:
+        problems.append(f"rows after the repeat: {counts('replay')}, after the first: {created}")
+    return problems
+
+
+def conflict(client):
+    problems = []
+    client.post(ROUTES, json=body("conflict"), headers={"Idempotency-Key": "conflict-1"})
+    other = client.post(ROUTES, json=body("conflict, edited"), headers={"Idempotency-Key": "conflict-1"})
+    if other.status_code != 422:
+        problems.append(f"another body with the same key got {other.status_code}")
+    if counts("conflict, edited") != (0, 0):
+        problems.append("the conflicting request wrote rows")
+    return problems
+
+
+def expired(client):
+    problems = []
+    client.post(ROUTES, json=body("expired"), headers={"Idempotency-Key": "expired-1"})
+    with storage.connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE dbo.routine_idempotency_key SET expires_at = '2000-01-01 00:00:00' WHERE idempotency_key = ?",
+            ["expired-1"],
+        )
+        conn.commit()
+    again = client.post(ROUTES, json=body("expired"), headers={"Idempotency-Key": "expired-1"})
+    if again.status_code != 201 or again.headers.get("Idempotent-Replayed"):
+        problems.append(f"an expired key was replayed: {again.status_code}")
+    if counts("expired")[0] != 2:
+        problems.append(f"{counts('expired')[0]} parents after the key expired, expected 2")
+    third = client.post(ROUTES, json=body("expired"), headers={"Idempotency-Key": "expired-1"})
+    if third.headers.get("Idempotent-Replayed") != "true" or counts("expired")[0] != 2:
+        problems.append("the key was not remembered again after the new creation")
+    return problems
+
+
+def lost_commit(client):
+    problems = []
+    with _CommitFault() as fault:
+        fault.mode = "lost_ack"
+        landed = client.post(ROUTES, json=body("lost ack"), headers={"Idempotency-Key": "lost-1"})
+        if landed.status_code != 201 or counts("lost ack")[0] != 1:
+            problems.append(f"landed commit with a key: {landed.status_code}, {counts('lost ack')[0]} parents")
+        retry = client.post(ROUTES, json=body("lost ack"), headers={"Idempotency-Key": "lost-1"})
+        if retry.headers.get("Idempotent-Replayed") != "true" or counts("lost ack")[0] != 1:
+            problems.append("the client's retry after a landed commit created the routine again")
+
+        fault.mode = "lost_ack"
+        keyless = client.post(ROUTES, json=body("lost ack, no key"))
+        if keyless.status_code != 201 or counts("lost ack, no key")[0] != 1:
+            problems.append(f"landed commit without a key: {keyless.status_code}, {counts('lost ack, no key')}")
+
+        fault.mode = "rolled_back"
+        failed = client.post(ROUTES, json=body("rolled back"), headers={"Idempotency-Key": "lost-2"})
+        if failed.status_code != 500 or counts("rolled back") != (0, 0):
+            problems.append(f"rolled back commit: {failed.status_code}, rows {counts('rolled back')}")
+        retry = client.post(ROUTES, json=body("rolled back"), headers={"Idempotency-Key": "lost-2"})
+        if retry.status_code != 201 or retry.headers.get("Idempotent-Replayed") or counts("rolled back")[0] != 1:
+            problems.append(f"the retry after a rolled back commit: {retry.status_code}, {counts('rolled back')}")
+    return problems
+
+
+CASES = [replayed, conflict, expired, lost_commit]
+
+
+def main():
+    client = api.create_app().test_client()
+    failures = 0
+    try:
+        for case in CASES:
+            problems = case(client)
+            print(f"{'ok  ' if not problems else 'FAIL'} {case.__name__}")
+            for problem in problems:
+                print(f"     {problem}")
+            failures += bool(problems)
+    finally:
+        WORKDIR.cleanup()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
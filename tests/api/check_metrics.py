@@ -0,0 +1,126 @@
+"""Checks for the multi-process collection in ``metrics.MetricsRegistry``.
+
+Worker processes write to one metrics directory, as FastCGI processes do:
+
+- counters and histograms of exited processes are folded into ``metrics_folded.db``
+  once, their files are deleted, and the sums never go down;
+- gauges are reported only for processes that are still alive;
+- a process that gets the pid of an exited one does not inherit its values.
+
+Usage:
+    python tests/api/check_metrics.py     # exit 1 on any failure
+"""
+
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import metrics  # noqa: E402
+from metrics import MetricsRegistry  # noqa: E402
+
+
+def make_registry(directory):
+    registry = MetricsRegistry(directory)
+    registry.describe("requests_total", "counter", "Requests.")
+    registry.describe("in_use", "gauge", "In use.")
+    registry.describe("latency_seconds", "histogram", "Latency.", buckets=(0.1, 1.0))
+    return registry
+
+
+def _worker(directory, started, stop):
+    registry = make_registry(directory)
+    registry.inc("requests_total", {"route": "a"}, 3)
+    registry.set_gauge("in_use", 2)
+    registry.observe("latency_seconds", 0.05)
+    started.set()
+    stop.wait(10)
+
+
+def sample(text, line_start):
+    values = [float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(line_start)]
+    return sum(values) if values else None
+
+
+def run_workers(directory, count):
+    started = [multiprocessing.Event() for _ in range(count)]
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=_worker, args=(directory, event, stop)) for event in started]
+    for process in processes:
+        process.start()
+    for event in started:
+        event.wait(10)
+    return processes, stop
+
+
+def dead_processes_folded(workdir):
+    directory = os.path.join(workdir, "dead")
+    processes, stop = run_workers(directory, 2)
+    scraper = make_registry(directory)
+    problems = []
+    live = scraper.render()
+    if len(re.findall(r"^in_use\{pid=", live, re.M)) != 2:
+        problems.append("the gauges of two live workers are not both reported")
+    stop.set()
+    for process in processes:
+        process.join(10)
+    for attempt in range(2):
+        text = scraper.render()
+        if sample(text, 'requests_total{route="a"}') != 6:
+            problems.append(f"scrape {attempt + 1}: counter is {sample(text, 'requests_total')} instead of 6")
+        if sample(text, 'latency_seconds_count') != 2 or sample(text, 'latency_seconds_bucket{le="0.1"}') != 2:
+            problems.append(f"scrape {attempt + 1}: histogram of the exited workers was lost")
+        if "in_use{" in text:
+            problems.append(f"scrape {attempt + 1}: gauges of exited workers are still reported")
+    leftovers = sorted(
+        name for name in os.listdir(directory) if not name.startswith(("metrics_folded", f"metrics_{os.getpid()}."))
+    )
+    if leftovers:
+        problems.append(f"files of exited workers were left behind: {leftovers}")
+    return problems
+
+
+def reused_pid(workdir):
+    directory = os.path.join(workdir, "reused")
+    os.makedirs(directory)
+    # An exited process that had this process's pid.
+    metrics._write_file(
+        os.path.join(directory, f"metrics_{os.getpid()}.db"),
+        [
+            (metrics._INSTANCE_KEY, 1.0),
+            (metrics._sample_key("requests_total", {"route": "a"}), 5.0),
+            (metrics._sample_key("in_use", None), 7.0),
+        ],
+    )
+    registry = make_registry(directory)
+    registry.inc("requests_total", {"route": "a"})
+    text = registry.render()
+    problems = []
+    if sample(text, 'requests_total{route="a"}') != 6:
+        problems.append(f"counter is {sample(text, 'requests_total')}: the old counts were not kept once")
+    if sample(text, "in_use{") is not None:
+        problems.append("the new process reports the gauge of the old one")
+    return problems
+
+
+CASES = [dead_processes_folded, reused_pid]
+
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        for case in CASES:
+            problems = case(workdir)
+            print(f"{'ok  ' if not problems else 'FAIL'} {case.__name__}")
+            for problem in problems:
+                print(f"     {problem}")
+            failures += bool(problems)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
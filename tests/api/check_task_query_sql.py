@@ -0,0 +1,94 @@
+"""Golden-SQL check for the query shapes ``_fetch_tasks`` sends to the database.
+
+Each case builds the statement with ``api._build_task_query`` (no connection is
+made; the schema probes are pinned to the full schema) and compares it with
+``tests/api/golden/<case>.sql``. A changed shape fails the check until the golden
+file is regenerated on purpose and reviewed in the diff.
+
+Usage:
+    python tests/api/check_task_query_sql.py            # exit 1 on any difference
+    python tests/api/check_task_query_sql.py --update   # rewrite the golden files
+"""
+
+import argparse
+import difflib
+import json
+import os
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+os.environ.setdefault("ROUTINE_METRICS_DIR", "")
+os.environ.setdefault("ROUTINE_LOG_LEVEL", "WARNING")
+sys.path.insert(0, str(REPO_DIR))
+
+import api  # noqa: E402
+
+CASES = [
+    ("month_active", {"year": 2026, "month": 1}, False),
+    ("month_active_exact", {"year": 2026, "month": 1, "include_past_incomplete": False}, False),
+    ("month_include_completed", {"year": 2026, "month": 1, "include_completed": True}, False),
+    ("month_include_completed_archive", {"year": 2024, "month": 6, "include_completed": True}, True),
+    # An archive created before planned_date/task_kind existed (archive columns pinned below).
+    ("month_include_completed_archive_legacy", {"year": 2024, "month": 6, "include_completed": True}, True),
+    ("year_include_completed", {"year": 2026, "include_completed": True}, False),
+    ("month_only_active", {"month": 4}, False),
+    ("parent_children_include_completed", {"task_no": 42, "include_completed": True}, True),
+    (
+        "filtered_include_completed",
+        {"year": 2026, "month": 2, "include_completed": True, "task_kind": "グループ", "assignee": "山田", "title": "締め"},
+        False,
+    ),
+]
+
+
+def _pin_schema_probes():
+    api._ROUTINE_CHILD_HAS_ASSIGNEE_COLUMN = True
+    api._ROUTINE_CHILD_HAS_TITLE_COLUMN = True
+    api._ROUTINE_CHILD_HAS_STATUS_COLUMN = True
+    api._ROUTINE_CHILD_HAS_PLANNED_DATE_COLUMN = True
+    api._ROUTINE_CHILD_HAS_TASK_KIND_COLUMN = True
+
+
+def _pin_archive_columns(name):
+    legacy = name.endswith("_legacy")
+    api._ARCHIVE_CHILD_COLUMNS = api.ChildColumns(True, True, True, not legacy, not legacy)
+
+
+def render(filters, include_archive):
+    sql, params = api._build_task_query(filters, 0, 21, include_archive)
+    return f"-- params: {json.dumps(params, default=str, ensure_ascii=False)}\n{sql}\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="rewrite the golden files from the current code")
+    args = parser.parse_args()
+    _pin_schema_probes()
+    GOLDEN_DIR.mkdir(exist_ok=True)
+    failures = 0
+    for name, filters, include_archive in CASES:
+        path = GOLDEN_DIR / f"{name}.sql"
+        _pin_archive_columns(name)
+        actual = render(filters, include_archive)
+        if args.update:
+            path.write_text(actual, encoding="utf-8")
+            print(f"wrote {path.relative_to(REPO_DIR)}")
+            continue
+        expected = path.read_text(encoding="utf-8") if path.exists() else ""
+        if actual == expected:
+            print(f"ok   {name}")
+            continue
+        failures += 1
+        print(f"FAIL {name}")
+        sys.stdout.writelines(
+            difflib.unified_diff(
+                expected.splitlines(keepends=True), actual.splitlines(keepends=True), str(path), "current"
+            )
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+-- params: ["完了", "完了", "グループ", "%山田%", "%山田%", "%締め%", "2026-03-01", "2026-02-01", "完了", "完了", "完了", "完了", "グループ", "%山田%", "%山田%", "%締め%", "2026-02-01", "2026-03-01", 0, 21]
+SELECT *
+FROM (
+SELECT
+c.record_no,
+c.task_no,
+c.routine_no,
+p.frequency,
+p.half_year,
+p.start_month,
+p.end_month,
+p.year AS parent_year,
+p.quarter AS parent_quarter,
+p.month AS parent_month,
+p.week_num AS parent_week_num,
+c.due_date,
+c.planned_date AS planned_date,
+c.assignee AS assignee,
+COALESCE(c.task_kind, p.task_kind) AS task_kind,
+p.registrant,
+c.status AS status,
+p.status AS parent_status,
+c.title AS title,
+p.attachment_link,
+p.summary AS parent_summary,
+c.summary AS child_summary
+FROM dbo.routine_task_child c
+INNER JOIN dbo.routine_task p ON c.task_no = p.task_no
+WHERE c.is_deleted = 0 AND (p.status = ? OR (p.is_deleted = 0 AND (p.deleted_at IS NULL OR p.deleted_at > SYSUTCDATETIME()) AND ((c.deleted_at IS NULL OR c.deleted_at > SYSUTCDATETIME()) OR COALESCE(c.status, '') = ?))) AND COALESCE(c.task_kind, p.task_kind) = ? AND (COALESCE(c.assignee, p.assignee, '') LIKE ? OR COALESCE(p.registrant, '') LIKE ?) AND COALESCE(c.title, p.title, '') LIKE ? AND c.due_date < ? AND (c.due_date >= ? OR (COALESCE(c.status, '') <> ? AND COALESCE(p.status, '') <> ?))
+UNION ALL
+SELECT
+c.record_no,
+c.task_no,
+c.routine_no,
+p.frequency,
+p.half_year,
+p.start_month,
+p.end_month,
+p.year AS parent_year,
+p.quarter AS parent_quarter,
+p.month AS parent_month,
+p.week_num AS parent_week_num,
+c.due_date,
+c.planned_date AS planned_date,
+c.assignee AS assignee,
+COALESCE(c.task_kind, p.task_kind) AS task_kind,
+p.registrant,
+c.status AS status,
+p.status AS parent_status,
+c.title AS title,
+p.attachment_link,
+p.summary AS parent_summary,
+c.summary AS child_summary
+FROM dbo.routine_task_child c
+INNER JOIN dbo.routine_task p ON c.task_no = p.task_no
+WHERE c.is_deleted = 1 AND (p.status = ? OR (p.is_deleted = 0 AND (p.deleted_at IS NULL OR p.deleted_at > SYSUTCDATETIME()) AND COALESCE(c.status, '') = ?)) AND COALESCE(c.task_kind, p.task_kind) = ? AND (COALESCE(c.assignee, p.assignee, '') LIKE ? OR COALESCE(p.registrant, '') LIKE ?) AND COALESCE(c.title, p.title, '') LIKE ? AND c.due_date >= ? AND c.due_date < ?
+) t
+ORDER BY t.due_date ASC, t.task_no ASC, t.routine_no ASC
+OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
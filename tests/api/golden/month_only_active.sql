@@ -0,0 +1,29 @@
+-- params: ["完了", 4, 0, 21]
+SELECT
+c.record_no,
+c.task_no,
+c.routine_no,
+p.frequency,
+p.half_year,
+p.start_month,
+p.end_month,
+p.year AS parent_year,
+p.quarter AS parent_quarter,
+p.month AS parent_month,
+p.week_num AS parent_week_num,
+c.due_date,
+c.planned_date AS planned_date,
+c.assignee AS assignee,
+COALESCE(c.task_kind, p.task_kind) AS task_kind,
+p.registrant,
+c.status AS status,
+p.status AS parent_status,
+c.title AS title,
+p.attachment_link,
+p.summary AS parent_summary,
+c.summary AS child_summary
+FROM dbo.routine_task_child c
+INNER JOIN dbo.routine_task p ON c.task_no = p.task_no
+WHERE c.is_deleted = 0 AND p.is_deleted = 0 AND (p.deleted_at IS NULL OR p.deleted_at > SYSUTCDATETIME()) AND (c.deleted_at IS NULL OR c.deleted_at > SYSUTCDATETIME()) AND COALESCE(c.status, '') <> ? AND MONTH(c.due_date) = ?
+ORDER BY c.due_date ASC, c.task_no ASC, c.routine_no ASC
+OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
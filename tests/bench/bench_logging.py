@@ -0,0 +1,84 @@
+"""Compare request-thread logging cost: DEBUG basicConfig file logging vs the queue pipeline.
+
+Usage: python tests/bench/bench_logging.py [--calls 20000] [--output result.json]
+"""
+
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app_logging import JsonFormatter, SamplingFilter, _NonBlockingQueueHandler, sampled  # noqa: E402
+
+ROW = (12345, "山田 太郎", "t-yamada", "D000013", "システム", True)
+COLUMNS = ["UserID", "EmployeeName", "AD", "DepartmentCD", "DepartmentName", "IsApprovalDept"]
+
+
+def _isolated_logger(name, handler, level):
+    logger = logging.getLogger(f"bench.{name}")
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def _legacy_call(logger):
+    # What _fetch_employee_profile logged on every request before the change.
+    logger.debug("fetched employee profile row=%s columns=%s for upn=%s", ROW, COLUMNS, "t-yamada")
+
+
+def _pipeline_call(logger):
+    logger.debug("fetched employee profile upn=%s found=%s", "t-yamada", True, extra=sampled())
+
+
+def run(calls, directory):
+    results = {}
+
+    legacy_handler = logging.FileHandler(os.path.join(directory, "legacy.log"), encoding="utf-8")
+    legacy_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    legacy = _isolated_logger("legacy", legacy_handler, logging.DEBUG)
+    results["legacy_debug_file"] = timeit.timeit(lambda: _legacy_call(legacy), number=calls)
+    legacy_handler.close()
+
+    for name, level in (("queue_info", logging.INFO), ("queue_debug_sampled", logging.DEBUG)):
+        file_handler = logging.FileHandler(os.path.join(directory, f"{name}.log"), encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        log_queue = queue.Queue(maxsize=calls + 1)
+        queue_handler = _NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+        listener = logging.handlers.QueueListener(log_queue, file_handler)
+        listener.start()
+        logger = _isolated_logger(name, queue_handler, level)
+        results[name] = timeit.timeit(lambda: _pipeline_call(logger), number=calls)
+        listener.stop()
+        file_handler.close()
+
+    return {
+        name: {"total_s": round(seconds, 4), "per_call_us": round(seconds / calls * 1e6, 2)}
+        for name, seconds in results.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(args.calls, directory)
+    text = json.dumps({"calls": args.calls, "results": results}, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Offline microbenchmarks for the pure-Python hot paths in api.py.
+
+No database connection is made. The row-mapping benchmarks run on synthetic
+pyodbc-like tuples from ``synthetic.py``.
+
+Usage:
+    python tests/bench/run_benchmarks.py [--filter build_entries] [--output out.json]
+    python tests/bench/run_benchmarks.py --save-baseline           # writes baseline.json
+    python tests/bench/run_benchmarks.py --compare --tolerance 0.2 # exit 1 on regression
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+from flask import Flask
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parents[1]
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+# Keep benchmark runs from writing metrics/slow-query files into the app directory.
+os.environ["ROUTINE_METRICS_DIR"] = ""
+os.environ["ROUTINE_SLOW_QUERY_MS"] = "0"
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+import api  # noqa: E402
+import json_provider  # noqa: E402
+from synthetic import PARENT_COLUMNS, TASK_COLUMNS, make_parent_rows, make_task_rows  # noqa: E402
+
+BENCHMARKS = []
+
+
+def benchmark(name, number):
+    def register(func):
+        BENCHMARKS.append((name, func, number))
+        return func
+
+    return register
+
+
+SPAN_MONTHS = {"1m": ("2026-01", "2026-01"), "12m": ("2026-01", "2026-12"), "60m": ("2026-01", "2030-12")}
+
+
+def _build_entries_case(frequency, start_month, end_month):
+    data = {
+        "frequency": frequency,
+        "start_month": start_month,
+        "end_month": end_month,
+        "week": "2",
+        "title": "bench",
+        "assignee": "山田 太郎; 佐藤 花子",
+        "status": "未着手",
+    }
+    if frequency == "隔月":
+        data["month"] = "2"
+    if frequency == "スポット":
+        data["due_date"] = "2026-03-13"
+    return lambda: api._build_entries(data, "bench", "D000013")
+
+
+for _frequency in ("週次", "月次", "四半期", "半期", "年次", "隔月"):
+    for _span, (_start, _end) in SPAN_MONTHS.items():
+        benchmark(f"build_entries[{_frequency}-{_span}]", 200)(_build_entries_case(_frequency, _start, _end))
+benchmark("build_entries[スポット]", 2000)(_build_entries_case("スポット", None, None))
+
+
+def _extension_case(frequency, new_end):
+    current = {
+        "frequency": frequency,
+        "start_month": "2026-01",
+        "end_month": "2026-12",
+        "month": 1,
+        "week_num": 2,
+        "assignee": "山田 太郎",
+        "status": "未着手",
+        "summary": None,
+        "title": "bench",
+        "task_kind": "個人",
+    }
+    update = {"end_month": new_end}
+    return lambda: api._build_extension_child_entries(current, update)
+
+
+for _frequency in ("週次", "月次", "四半期", "年次"):
+    benchmark(f"build_extension_child_entries[{_frequency}-+48m]", 200)(_extension_case(_frequency, "2030-12"))
+
+
+@benchmark("nth_friday[12 months x 4 weeks]", 500)
+def _nth_friday_year():
+    for month in range(1, 13):
+        for week in (1, 2, 3, 4):
+            api._nth_friday(2026, month, week)
+
+
+_STATUS_VALUES = ["未着手", "進行中", "完了", "未対応", "作業中", "pending", "done", "completed", None, "", " 完了 "]
+
+
+@benchmark("normalize_status[11 values]", 5000)
+def _normalize_status_mix():
+    for value in _STATUS_VALUES:
+        api._normalize_status(value)
+
+
+@benchmark("parse_assignees[str]", 20000)
+def _parse_assignees_str():
+    api._parse_assignees("山田 太郎; 佐藤 花子 ;; 鈴木 一郎")
+
+
+@benchmark("parse_assignees[list]", 20000)
+def _parse_assignees_list():
+    api._parse_assignees(["山田 太郎", " 佐藤 花子", ""])
+
+
+_PAGE_ROWS = make_task_rows(100)
+_EXPORT_ROWS = make_task_rows(10000)
+
+
+@benchmark("map_task_rows[100]", 50)
+def _map_page():
+    api._map_task_rows(TASK_COLUMNS, _PAGE_ROWS)
+
+
+@benchmark("map_task_rows[10000]", 2)
+def _map_export():
+    api._map_task_rows(TASK_COLUMNS, _EXPORT_ROWS)
+
+
+_PARENT_EXPORT_ROWS = make_parent_rows(10000)
+
+
+@benchmark("map_parent_rows[10000]", 2)
+def _map_parent_export():
+    api._map_parent_rows(PARENT_COLUMNS, _PARENT_EXPORT_ROWS)
+
+
+_JSON_PROVIDER = json_provider.RoutineJSONProvider(Flask("bench"))
+_EXPORT_PAYLOAD = {"routines": api._map_task_rows(TASK_COLUMNS, _EXPORT_ROWS)}
+
+
+def _encode_case(use_orjson):
+    def encode():
+        saved = json_provider.orjson
+        if not use_orjson:
+            json_provider.orjson = None
+        try:
+            _JSON_PROVIDER.encode(_EXPORT_PAYLOAD)
+        finally:
+            json_provider.orjson = saved
+
+    return encode
+
+
+benchmark("encode_json[10000 tasks, json]", 2)(_encode_case(False))
+if json_provider.orjson is not None:
+    benchmark("encode_json[10000 tasks, orjson]", 2)(_encode_case(True))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(name_filter=None, repeat=5):
+    results = {}
+    for name, func, number in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        timings = timeit.Timer(func).repeat(repeat=repeat, number=number)
+        per_call = [seconds / number * 1e6 for seconds in timings]
+        results[name] = {
+            "number": number,
+            "best_us": round(min(per_call), 3),
+            "median_us": round(statistics.median(per_call), 3),
+        }
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    regressions = []
+    for name, result in current["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference or not reference.get("best_us"):
+            continue
+        ratio = result["best_us"] / reference["best_us"]
+        result["baseline_best_us"] = reference["best_us"]
+        result["ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append((name, reference["best_us"], result["best_us"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON result to this path")
+    parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE), metavar="PATH")
+    parser.add_argument("--compare", nargs="?", const=str(DEFAULT_BASELINE), metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown ratio (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    current = run(args.filter, args.repeat)
+    regressions = []
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(current, baseline, args.tolerance)
+    text = json.dumps(current, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(text + "\n", encoding="utf-8")
+    if regressions:
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.3f}us -> {after:.3f}us (x{ratio:.2f})", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Synthetic pyodbc-like rows for the offline benchmarks."""
+
+import random
+from datetime import date, timedelta
+
+TASK_COLUMNS = [
+    "record_no",
+    "task_no",
+    "routine_no",
+    "frequency",
+    "half_year",
+    "start_month",
+    "end_month",
+    "parent_year",
+    "parent_quarter",
+    "parent_month",
+    "parent_week_num",
+    "due_date",
+    "planned_date",
+    "assignee",
+    "task_kind",
+    "registrant",
+    "status",
+    "parent_status",
+    "title",
+    "attachment_link",
+    "parent_summary",
+    "child_summary",
+]
+
+PARENT_COLUMNS = [
+    "task_no",
+    "frequency",
+    "half_year",
+    "start_month",
+    "department_cd",
+    "end_month",
+    "due_date",
+    "year",
+    "quarter",
+    "month",
+    "week_num",
+    "assignee",
+    "task_kind",
+    "registrant",
+    "status",
+    "title",
+    "summary",
+]
+
+FREQUENCIES = ["週次", "月次", "四半期", "半期", "年次", "隔月", "スポット"]
+STATUSES = ["未着手", "進行中", "完了", "未対応", "作業中", "pending", "done", None, ""]
+ASSIGNEES = ["山田 太郎", "佐藤 花子; 鈴木 一郎", "田中 次郎; 高橋 三郎; 伊藤 四郎", None]
+
+
+def make_task_rows(count, seed=1):
+    rng = random.Random(seed)
+    base = date(2026, 1, 2)
+    rows = []
+    for index in range(count):
+        due = base + timedelta(days=rng.randrange(0, 365))
+        planned = due - timedelta(days=rng.randrange(0, 3)) if rng.random() < 0.8 else None
+        rows.append(
+            (
+                index + 1,
+                index // 12 + 1,
+                index % 12 + 1,
+                rng.choice(FREQUENCIES),
+                None,
+                "2026-01",
+                "2026-12",
+                2026,
+                str(rng.randrange(1, 5)),
+                rng.randrange(1, 13),
+                rng.randrange(1, 5),
+                due if rng.random() < 0.97 else None,
+                planned,
+                rng.choice(ASSIGNEES),
+                rng.choice(["個人", "グループ"]),
+                "山田 太郎",
+                rng.choice(STATUSES),
+                rng.choice(STATUSES),
+                f"定例タスク {index}",
+                None,
+                "親の概要",
+                "子の概要" if rng.random() < 0.3 else None,
+            )
+        )
+    return rows
+
+
+def make_parent_rows(count, seed=1):
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        frequency = rng.choice(FREQUENCIES)
+        rows.append(
+            (
+                index + 1,
+                frequency,
+                rng.choice([1, 2, None]),
+                "2026-01",
+                "D000013",
+                "2026-12",
+                date(2026, rng.randrange(1, 13), 1) if frequency == "スポット" else None,
+                2026,
+                str(rng.randrange(1, 5)),
+                rng.randrange(1, 13),
+                rng.randrange(1, 5),
+                rng.choice(ASSIGNEES),
+                rng.choice(["個人", "グループ"]),
+                "山田 太郎",
+                rng.choice(STATUSES),
+                f"定例タスク {index}",
+                "親の概要",
+            )
+        )
+    return rows
@@ -0,0 +1,103 @@
+"""Latency of the ``/routines`` month-view query shapes on the seeded dataset.
+
+Times page 1 of the month view with and without ``include_completed`` as
+``api._build_task_query`` writes it, next to the OR-chained ``include_completed``
+predicate it replaced (kept here only as the comparison point). Run it against
+whichever backend ``ROUTINE_DB_BACKEND`` selects, after ``seed_dataset.py``.
+
+Usage:
+    ROUTINE_DB_BACKEND=sqlite python tests/load/bench_query_shapes.py [--months 2025-03,2026-01] [--plan]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+os.environ.setdefault("ROUTINE_METRICS_DIR", "")
+os.environ.setdefault("ROUTINE_SLOW_QUERY_MS", "0")
+os.environ.setdefault("ROUTINE_LOG_LEVEL", "WARNING")
+sys.path.insert(0, str(REPO_DIR))
+
+import api  # noqa: E402
+import storage  # noqa: E402
+
+
+def legacy_include_completed_query(year, month, offset, limit):
+    done = api.STATUS_DONE
+    sql = f"""
+        SELECT {api._task_select_columns_sql()}
+        FROM dbo.routine_task_child c
+        INNER JOIN dbo.routine_task p ON c.task_no = p.task_no
+        WHERE (p.is_deleted = 0 OR p.status = ?)
+          AND (c.is_deleted = 0 OR COALESCE(c.status, '') = ? OR p.status = ?)
+          AND (p.deleted_at IS NULL OR p.deleted_at > SYSUTCDATETIME() OR p.status = ?)
+          AND (c.deleted_at IS NULL OR c.deleted_at > SYSUTCDATETIME() OR COALESCE(c.status, '') = ? OR p.status = ?)
+          AND (
+                (YEAR(c.due_date) = ? AND MONTH(c.due_date) = ?)
+                OR (c.due_date < ? AND COALESCE(c.status, '') <> ? AND COALESCE(p.status, '') <> ?)
+          )
+        ORDER BY c.due_date ASC, c.task_no ASC, c.routine_no ASC
+        OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+    """
+    month_start = api.date(year, month, 1)
+    return sql, [done] * 6 + [year, month, month_start, done, done, offset, limit]
+
+
+def shapes(year, month, page_size):
+    month_view = {"year": year, "month": month}
+    completed_view = {"year": year, "month": month, "include_completed": True}
+    return {
+        "active": api._build_task_query(month_view, 0, page_size + 1),
+        "include_completed": api._build_task_query(completed_view, 0, page_size + 1),
+        "include_completed[legacy OR]": legacy_include_completed_query(year, month, 0, page_size + 1),
+    }
+
+
+def time_query(sql, params, repeat):
+    durations = []
+    rows = 0
+    for _ in range(repeat):
+        with storage.connect() as conn:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            rows = len(cursor.fetchall())
+            durations.append((time.perf_counter() - started) * 1000)
+    return {"rows": rows, "median_ms": round(statistics.median(durations), 2), "min_ms": round(min(durations), 2)}
+
+
+def query_plan(sql, params):
+    if storage.backend_name() != "sqlite":
+        return None
+    with storage.connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", default="2025-03,2026-01,2026-06", help="comma-separated YYYY-MM month views")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--plan", action="store_true", help="include EXPLAIN QUERY PLAN (SQLite only)")
+    args = parser.parse_args()
+
+    report = {"backend": storage.backend_name(), "results": {}}
+    for value in args.months.split(","):
+        year, month = (int(part) for part in value.split("-"))
+        for name, (sql, params) in shapes(year, month, args.page_size).items():
+            result = time_query(sql, params, args.repeat)
+            if args.plan:
+                result["plan"] = query_plan(sql, params)
+            report["results"][f"{value} {name}"] = result
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Bytes transferred per page load and per ``/routines`` call, with and without compression.
+
+Runs in-process through the Flask test client against whichever backend
+``ROUTINE_DB_BACKEND`` selects (seed it first with ``seed_dataset.py``).
+
+Usage:
+    ROUTINE_DB_BACKEND=sqlite python tests/load/measure_transfer.py [--year 2026 --month 1]
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+os.environ.setdefault("ROUTINE_E2E_BYPASS_AUTH", "1")
+os.environ.setdefault("ROUTINE_METRICS_DIR", "")
+os.environ.setdefault("ROUTINE_LOG_LEVEL", "WARNING")
+sys.path.insert(0, str(REPO_DIR))
+
+from api import create_app  # noqa: E402
+
+ENCODINGS = [("identity", None), ("gzip", "gzip"), ("br, gzip", "br, gzip")]
+
+
+def measure(client, path, params=None):
+    results = {}
+    for label, accept in ENCODINGS:
+        headers = {"Accept-Encoding": accept} if accept else {"Accept-Encoding": "identity"}
+        response = client.get(path, query_string=params, headers=headers)
+        body = response.get_data()
+        results[label] = {
+            "status": response.status_code,
+            "encoding": response.headers.get("Content-Encoding", "identity"),
+            "bytes": len(body),
+        }
+        etag = response.headers.get("ETag")
+        if etag:
+            revalidated = client.get(path, query_string=params, headers={**headers, "If-None-Match": etag})
+            results[label]["revalidate_status"] = revalidated.status_code
+            results[label]["revalidate_bytes"] = len(revalidated.get_data())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--year", type=int, default=2026)
+    parser.add_argument("--month", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    client = create_app().test_client()
+    report = {
+        "index.html": measure(client, "/routine_app/index.html"),
+        "GET /routines": measure(
+            client,
+            "/routine_app/api.py/routines",
+            {"year": args.year, "month": args.month, "page": 1, "page_size": args.page_size},
+        ),
+        "GET /parents": measure(client, "/routine_app/api.py/parents", {"page": 1, "page_size": args.page_size}),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Reproducible HTTP load generator for the routine API.
+
+Replays a weighted mix of month-view ``/routines`` GETs with filters, ``/parents``
+paging, child PATCH/complete and weekly routine creation from a thread pool, then
+reports p50/p95/p99 latency, throughput and error rate per endpoint.
+
+Targets:
+    --target client    Flask test client in this process (default)
+    --target serve     threaded werkzeug server started in this process
+    --base-url URL     an already running server, e.g. http://localhost:5000/routine_app/
+
+Usage:
+    ROUTINE_DB_BACKEND=sqlite python tests/load/run_load_test.py --duration 30 --concurrency 8 \
+        --output tests/load/results/run.json [--compare tests/load/results/previous.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_DIR))
+
+# (label, weight)
+TRAFFIC_MIX = [
+    ("GET /routines month", 45),
+    ("GET /routines filtered", 10),
+    ("GET /parents", 20),
+    ("PATCH /child", 10),
+    ("POST /child/complete", 5),
+    ("POST /routines weekly", 5),
+    ("GET /current-user", 5),
+]
+TITLE_TERMS = ["月次", "請求", "確認", "報告", "定例"]
+
+
+class _ClientTarget:
+    def __init__(self, app):
+        self._app = app
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        return client
+
+    def request(self, method, path, params=None, body=None):
+        response = self._client().open(
+            "/routine_app/api.py/" + path, method=method, query_string=params, json=body
+        )
+        return response.status_code, response.get_json(silent=True), len(response.get_data())
+
+
+class _HttpTarget:
+    def __init__(self, base_url, session_cookie=None):
+        self._base_url = base_url.rstrip("/") + "/api.py/"
+        self._headers = {"Content-Type": "application/json"}
+        if session_cookie:
+            self._headers["Cookie"] = f"session={session_cookie}"
+
+    def request(self, method, path, params=None, body=None):
+        url = self._base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode({key: value for key, value in params.items() if value is not None})
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(url, data=data, headers=self._headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                raw = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as exc:
+            raw = exc.read()
+            status = exc.code
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            payload = None
+        return status, payload, len(raw)
+
+
+class LoadRun:
+    def __init__(self, target, args):
+        self.target = target
+        self.args = args
+        self.samples = {label: [] for label, _ in TRAFFIC_MIX}
+        self.errors = {label: 0 for label, _ in TRAFFIC_MIX}
+        self.bytes = {label: 0 for label, _ in TRAFFIC_MIX}
+        self.record_nos = []
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        for page in range(1, 4):
+            status, payload, _ = self.target.request("GET", "routines", {"page": page, "page_size": 100})
+            if status == 200 and payload:
+                self.record_nos.extend(item["record_no"] for item in payload.get("routines", []))
+
+    def _month_params(self, rng):
+        anchor = date.fromisoformat(self.args.anchor)
+        offset = rng.randrange(-3, 4)
+        month = (anchor.month - 1 + offset) % 12 + 1
+        year = anchor.year + (anchor.month - 1 + offset) // 12
+        return {"year": year, "month": month, "page": 1, "page_size": rng.choice([20, 50, 100])}
+
+    def _action(self, label, rng):
+        if label == "GET /routines month":
+            params = self._month_params(rng)
+            params["include_completed"] = "1" if rng.random() < 0.2 else "0"
+            return self.target.request("GET", "routines", params)
+        if label == "GET /routines filtered":
+            params = self._month_params(rng)
+            params[rng.choice(["title", "assignee", "task_kind"])] = rng.choice(
+                TITLE_TERMS if rng.random() < 0.5 else ["社員0", "個人", "グループ"]
+            )
+            return self.target.request("GET", "routines", params)
+        if label == "GET /parents":
+            return self.target.request("GET", "parents", {"page": rng.randrange(1, 6), "page_size": 20})
+        if label == "PATCH /child":
+            if not self.record_nos:
+                return None
+            record_no = rng.choice(self.record_nos)
+            return self.target.request("PATCH", f"child/{record_no}", body={"summary": f"load {rng.randrange(10**6)}"})
+        if label == "POST /child/complete":
+            with self._lock:
+                if not self.record_nos:
+                    return None
+                record_no = self.record_nos.pop(rng.randrange(len(self.record_nos)))
+            return self.target.request("POST", f"child/{record_no}/complete")
+        if label == "POST /routines weekly":
+            start = date.fromisoformat(self.args.anchor)
+            span = rng.choice([1, 3, 6, 12])
+            end_month = (start.month - 1 + span - 1) % 12 + 1
+            end_year = start.year + (start.month - 1 + span - 1) // 12
+            body = {
+                "frequency": "週次",
+                "start_month": f"{start.year:04d}-{start.month:02d}",
+                "end_month": f"{end_year:04d}-{end_month:02d}",
+                "title": f"負荷試験 {rng.randrange(10**6)}",
+                "assignee": "社員00001",
+            }
+            return self.target.request("POST", "routines", body=body)
+        return self.target.request("GET", "current-user")
+
+    def worker(self, index, deadline):
+        rng = random.Random(self.args.seed + index)
+        labels = [label for label, _ in TRAFFIC_MIX]
+        weights = [weight for _, weight in TRAFFIC_MIX]
+        while time.perf_counter() < deadline:
+            label = rng.choices(labels, weights)[0]
+            started = time.perf_counter()
+            try:
+                result = self._action(label, rng)
+            except Exception:  # noqa: BLE001 - count transport failures as errors
+                result = (599, None, 0)
+            if result is None:
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            status, _, size = result
+            with self._lock:
+                self.samples[label].append(elapsed_ms)
+                self.bytes[label] += size
+                if status >= 400:
+                    self.errors[label] += 1
+
+    def run(self):
+        self.warm_up()
+        started = time.perf_counter()
+        deadline = started + self.args.duration
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            for future in [pool.submit(self.worker, index, deadline) for index in range(self.args.concurrency)]:
+                future.result()
+        return time.perf_counter() - started
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return round(sorted_values[index], 2)
+
+
+def summarize(run, elapsed):
+    endpoints = {}
+    total = errors = 0
+    for label, samples in run.samples.items():
+        ordered = sorted(samples)
+        total += len(ordered)
+        errors += run.errors[label]
+        endpoints[label] = {
+            "requests": len(ordered),
+            "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else None,
+            "error_rate": round(run.errors[label] / len(ordered), 4) if ordered else 0.0,
+            "p50_ms": _percentile(ordered, 0.50),
+            "p95_ms": _percentile(ordered, 0.95),
+            "p99_ms": _percentile(ordered, 0.99),
+            "max_ms": round(ordered[-1], 2) if ordered else None,
+            "avg_bytes": round(run.bytes[label] / len(ordered)) if ordered else None,
+        }
+    return {
+        "total": {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "elapsed_s": round(elapsed, 2),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_table(result, previous=None):
+    header = f"{'endpoint':<24}{'req':>7}{'rps':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    for label, stats in result["endpoints"].items():
+        line = (
+            f"{label:<24}{stats['requests']:>7}{stats['throughput_rps'] or 0:>9.1f}"
+            f"{stats['error_rate'] * 100:>7.1f}{stats['p50_ms'] or 0:>9.1f}{stats['p95_ms'] or 0:>9.1f}"
+            f"{stats['p99_ms'] or 0:>9.1f}"
+        )
+        before = (previous or {}).get("endpoints", {}).get(label)
+        if before and before.get("p95_ms") and stats.get("p95_ms"):
+            line += f"   p95 x{stats['p95_ms'] / before['p95_ms']:.2f} vs {previous['meta'].get('commit')}"
+        print(line)
+
+
+def _build_target(args):
+    if args.base_url:
+        return _HttpTarget(args.base_url, args.session_cookie), None
+    os.environ.setdefault("ROUTINE_E2E_BYPASS_AUTH", "1")
+    # One synthetic user drives all the traffic; measure the app, not the per-user limiter.
+    os.environ.setdefault("ROUTINE_RATE_LIMIT_PER_SECOND", "0")
+    os.environ.setdefault("ROUTINE_LOG_LEVEL", "WARNING")
+    from api import create_app
+
+    app = create_app()
+    if args.target == "client":
+        return _ClientTarget(app), None
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return _HttpTarget(f"http://127.0.0.1:{server.server_port}/routine_app/"), server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["client", "serve"], default="client")
+    parser.add_argument("--base-url")
+    parser.add_argument("--session-cookie", default=os.environ.get("ROUTINE_SESSION_COOKIE"))
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--anchor", default="2026-01-01", help="month the month-view traffic centres on")
+    parser.add_argument("--output", help="write JSON results here")
+    parser.add_argument("--compare", help="previous JSON result to compare p95 against")
+    args = parser.parse_args()
+
+    target, server = _build_target(args)
+    run = LoadRun(target, args)
+    try:
+        elapsed = run.run()
+    finally:
+        if server is not None:
+            server.shutdown()
+    result = summarize(run, elapsed)
+    result["meta"] = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "target": args.base_url or args.target,
+        "backend": os.environ.get("ROUTINE_DB_BACKEND", "sqlserver"),
+        "duration_s": args.duration,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }
+    previous = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    _print_table(result, previous)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
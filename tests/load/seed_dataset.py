@@ -0,0 +1,203 @@
+"""Deterministic synthetic dataset for large-volume benchmarks and load tests.
+
+Routine definitions are generated with a production-like mix of frequencies, spans,
+assignees and completion states, expanded by ``api._build_entries`` and written
+through ``api._insert_entries`` into whichever backend ``ROUTINE_DB_BACKEND``
+selects. The same ``--seed`` always produces the same dataset.
+
+Usage:
+    ROUTINE_DB_BACKEND=sqlite python tests/load/seed_dataset.py --children 1000000 --with-directory
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+os.environ.setdefault("ROUTINE_METRICS_DIR", "")
+os.environ.setdefault("ROUTINE_SLOW_QUERY_MS", "0")
+os.environ.setdefault("ROUTINE_LOG_LEVEL", "WARNING")
+sys.path.insert(0, str(REPO_DIR))
+
+import api  # noqa: E402
+import storage  # noqa: E402
+
+# (frequency, weight, min span months, max span months)
+FREQUENCY_MIX = [
+    ("月次", 35, 6, 36),
+    ("週次", 20, 3, 24),
+    ("四半期", 15, 12, 48),
+    ("半期", 5, 12, 60),
+    ("年次", 10, 12, 120),
+    ("隔月", 5, 6, 36),
+    ("スポット", 10, 0, 0),
+]
+TITLE_WORDS = ["月次締め", "請求書発行", "在庫確認", "バックアップ検証", "権限棚卸", "定例報告", "経費精算", "契約更新"]
+
+
+def _month_add(year, month, delta):
+    month += delta
+    return year + (month - 1) // 12, (month - 1) % 12 + 1
+
+
+def build_directory(rng, departments, employees):
+    department_rows = [
+        (f"D{index:06d}", f"部署{index:03d}", 1 if index % 7 == 0 else 0) for index in range(1, departments + 1)
+    ]
+    employee_rows = []
+    for index in range(1, employees + 1):
+        department_cd = department_rows[rng.randrange(departments)][0]
+        employee_rows.append((f"社員{index:05d}", f"user{index:05d}", department_cd, 0 if rng.random() < 0.85 else 1))
+    return department_rows, employee_rows
+
+
+def write_directory(department_rows, employee_rows):
+    if storage.backend_name() != "sqlite":
+        raise SystemExit("--with-directory only writes the SQLite backend; the account DB is never seeded.")
+    with api._get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO Department (DepartmentCD, DepartmentName, IsApprovalDept) VALUES (?, ?, ?)",
+            department_rows,
+        )
+        cursor.executemany(
+            "INSERT INTO Employee (EmployeeName, AD, DepartmentCD, EmployeeType) VALUES (?, ?, ?, ?)",
+            employee_rows,
+        )
+        conn.commit()
+
+
+def generate_definition(rng, anchor, employee_names):
+    frequencies = [item[0] for item in FREQUENCY_MIX]
+    weights = [item[1] for item in FREQUENCY_MIX]
+    frequency = rng.choices(frequencies, weights)[0]
+    _, _, min_span, max_span = next(item for item in FREQUENCY_MIX if item[0] == frequency)
+    start_year, start_month = _month_add(anchor.year, anchor.month, rng.randrange(-24, 6))
+    assignee_count = rng.choices([1, 2, 3], [75, 20, 5])[0]
+    data = {
+        "frequency": frequency,
+        "title": f"{rng.choice(TITLE_WORDS)} {rng.randrange(1, 10000):04d}",
+        "assignee": "; ".join(rng.sample(employee_names, assignee_count)),
+        "status": rng.choices(["未着手", "進行中"], [85, 15])[0],
+        "week": str(rng.randrange(1, 5)),
+        "summary": None if rng.random() < 0.7 else "手順書を参照",
+    }
+    if frequency == "スポット":
+        data["due_date"] = date(start_year, start_month, rng.randrange(1, 29)).isoformat()
+        return data
+    end_year, end_month = _month_add(start_year, start_month, rng.randrange(min_span, max_span + 1) - 1)
+    data["start_month"] = f"{start_year:04d}-{start_month:02d}"
+    data["end_month"] = f"{end_year:04d}-{end_month:02d}"
+    if frequency == "隔月":
+        data["month"] = str(rng.choice([2, 3, 4, 6]))
+    elif frequency in {"四半期", "半期", "年次"}:
+        data["month"] = str(rng.randrange(1, 13))
+    return data
+
+
+def _complete_children_sql():
+    status_sql = ", status = ?" if api._routine_child_has_status_column() else ""
+    return f"UPDATE dbo.routine_task_child SET is_deleted = 1, deleted_at = SYSUTCDATETIME(){status_sql} WHERE task_no = ?"
+
+
+def apply_completion(cursor, task_no, child_entries, anchor, rng):
+    # Most occurrences before the anchor date are done; a few parents are finished outright.
+    status_params = [api.STATUS_DONE] if api._routine_child_has_status_column() else []
+    if rng.random() < 0.05:
+        cursor.execute(
+            "UPDATE dbo.routine_task SET is_deleted = 1, deleted_at = SYSUTCDATETIME(), status = ? WHERE task_no = ?",
+            [api.STATUS_DONE, task_no],
+        )
+        cursor.execute(_complete_children_sql(), [*status_params, task_no])
+        return len(child_entries)
+    past = [entry for entry in child_entries if entry["due_date"] < anchor]
+    done_count = sum(1 for _ in past if rng.random() < 0.9)
+    if not done_count:
+        return 0
+    cursor.execute(_complete_children_sql() + " AND routine_no <= ?", [*status_params, task_no, done_count])
+    return done_count
+
+
+def seed(args):
+    rng = random.Random(args.seed)
+    # Separate stream so --batch does not change which definitions are generated.
+    completion_rng = random.Random(args.seed + 1)
+    anchor = date.fromisoformat(args.anchor)
+    department_rows, employee_rows = build_directory(rng, args.departments, args.employees)
+    if args.with_directory:
+        write_directory(department_rows, employee_rows)
+    employee_names = [row[0] for row in employee_rows]
+    department_codes = [row[0] for row in department_rows]
+
+    started = time.perf_counter()
+    parents = children = completed = 0
+    pending_completion = []
+    while (args.parents and parents < args.parents) or (not args.parents and children < args.children):
+        data = generate_definition(rng, anchor, employee_names)
+        registrant = rng.choice(employee_names)
+        parent_entry, child_entries = api._build_entries(data, registrant, rng.choice(department_codes))
+        task_no = api._insert_entries(parent_entry, child_entries)
+        pending_completion.append((task_no, child_entries))
+        parents += 1
+        children += len(child_entries)
+        if len(pending_completion) >= args.batch:
+            completed += _flush_completion(pending_completion, anchor, completion_rng)
+        if args.progress and parents % args.progress == 0:
+            elapsed = time.perf_counter() - started
+            print(f"{parents} parents / {children} children in {elapsed:.1f}s", file=sys.stderr)
+    completed += _flush_completion(pending_completion, anchor, completion_rng)
+    if storage.backend_name() == "sqlite":
+        # SQL Server keeps statistics itself; without them SQLite prefers the due_date
+        # index even for single-parent lookups.
+        with api._get_db_connection() as conn:
+            conn.cursor().execute("ANALYZE")
+            conn.commit()
+    elapsed = time.perf_counter() - started
+    return {
+        "backend": storage.backend_name(),
+        "seed": args.seed,
+        "parents": parents,
+        "children": children,
+        "completed_children": completed,
+        "departments": len(department_rows) if args.with_directory else 0,
+        "employees": len(employee_rows) if args.with_directory else 0,
+        "elapsed_s": round(elapsed, 2),
+        "children_per_s": round(children / elapsed) if elapsed else None,
+    }
+
+
+def _flush_completion(pending, anchor, rng):
+    if not pending:
+        return 0
+    completed = 0
+    with api._get_db_connection() as conn:
+        cursor = conn.cursor()
+        for task_no, child_entries in pending:
+            completed += apply_completion(cursor, task_no, child_entries, anchor, rng)
+        conn.commit()
+    pending.clear()
+    return completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--children", type=int, default=100000, help="stop once this many child rows exist")
+    parser.add_argument("--parents", type=int, default=0, help="generate exactly this many parents instead")
+    parser.add_argument("--departments", type=int, default=40)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--anchor", default="2026-01-01", help="'today' for completion states (keeps runs deterministic)")
+    parser.add_argument("--batch", type=int, default=500, help="parents per completion-update transaction")
+    parser.add_argument("--with-directory", action="store_true", help="also seed Employee/Department (SQLite only)")
+    parser.add_argument("--progress", type=int, default=1000, help="print progress every N parents (0 = quiet)")
+    args = parser.parse_args()
+    print(json.dumps(seed(args), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()